@@ -0,0 +1,122 @@
+"""
+Whisper 转写基准：默认流水线 vs 辅助解码（speculative decoding）
+
+用本地的一段音频分别运行：
+- default:  当前的转写方式（大模型，batch_size=BATCH_SIZE）
+- assisted: 小模型起草、大模型验证（batch_size=1）
+大模型只加载一次，两种方式使用同一个 pipeline。报告实时率（转写耗时 / 音频时长，越小越快）
+和与 default 结果的一致程度（字符级相似度，1.0 为完全相同）。
+
+需要 ffmpeg、torch、transformers，以及本地的大模型和辅助模型。
+
+用法:
+    python bench/asr_bench.py listen/audio/sample.mp3 --assistant listen/distil-large-v3
+    python bench/asr_bench.py sample.mp3 --assistant listen/distil-large-v3 --seconds 120 --runs 2 --json asr.json
+"""
+import os
+import sys
+import json
+import time
+import difflib
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from common.config import WHISPER_MODEL_PATH, WHISPER_ASSISTANT_MODEL_PATH
+from listen import asr_cache, preprocess
+from listen import main as listen_main
+
+
+def agreement(reference, text):
+    """字符级相似度（忽略空白）"""
+    reference, text = "".join(reference.split()), "".join(text.split())
+    if not reference and not text:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference, text, autojunk=False).ratio()
+
+
+def run_mode(pipe, audio, assistant, runs):
+    """返回 (最快一次的耗时, 转写结果)；第一次运行前先预热一小段"""
+    pipe({"raw": audio["raw"][:asr_cache.SAMPLE_RATE * 5], "sampling_rate": audio["sampling_rate"]},
+         **listen_main.call_kwargs(assistant))
+    best, text = None, ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = pipe(dict(audio), **listen_main.call_kwargs(assistant))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best, text = elapsed, result["text"]
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper 辅助解码基准")
+    parser.add_argument("audio", help="本地音频文件（mp3 等 ffmpeg 能解码的格式）")
+    parser.add_argument("--model", default=WHISPER_MODEL_PATH, help=f"大模型（默认 {WHISPER_MODEL_PATH}）")
+    parser.add_argument("--assistant", default=WHISPER_ASSISTANT_MODEL_PATH or None,
+                        help="辅助模型（默认 WHISPER_ASSISTANT_MODEL_PATH）")
+    parser.add_argument("--seconds", type=float, default=0, help="只使用开头的多少秒（0 = 全部）")
+    parser.add_argument("--runs", type=int, default=1, help="每种方式运行几次，取最快的一次")
+    parser.add_argument("--json", help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    if not args.assistant:
+        parser.error("需要指定辅助模型：--assistant 或 WHISPER_ASSISTANT_MODEL_PATH")
+    if not preprocess.can_decode():
+        parser.error("未找到 ffmpeg，无法解码音频")
+
+    import numpy as np
+
+    decoded = preprocess.decode_to_pcm(args.audio)
+    samples = np.array(preprocess.load_pcm(decoded["pcm_path"]))
+    preprocess.remove_pcm(decoded["pcm_path"])
+    if args.seconds:
+        samples = samples[:int(args.seconds * asr_cache.SAMPLE_RATE)]
+    audio = {"raw": samples, "sampling_rate": asr_cache.SAMPLE_RATE}
+    audio_seconds = len(samples) / asr_cache.SAMPLE_RATE
+    print(f"🎧 {args.audio}: {audio_seconds:.1f} 秒")
+
+    load_start = time.perf_counter()
+    pipe, assistant = listen_main.load_pipeline(args.model, args.assistant)
+    load_seconds = time.perf_counter() - load_start
+
+    results = []
+    reference = None
+    for mode, model in [("default", None), ("assisted", assistant)]:
+        print(f"⏱️ {mode} ...")
+        elapsed, text = run_mode(pipe, audio, model, args.runs)
+        reference = text if reference is None else reference
+        results.append({
+            "mode": mode,
+            "seconds": round(elapsed, 3),
+            "rtf": round(elapsed / audio_seconds, 4) if audio_seconds else None,
+            "agreement": round(agreement(reference, text), 4),
+            "chars": len(text),
+            "text": text,
+        })
+
+    print(f"\n模型: {args.model}  辅助模型: {args.assistant}  加载耗时 {load_seconds:.1f} 秒")
+    header = f"{'mode':<10} {'seconds':>9} {'RTF':>7} {'speedup':>8} {'agreement':>10} {'chars':>7}"
+    print(header)
+    print("-" * len(header))
+    baseline = results[0]["seconds"]
+    for r in results:
+        speedup = baseline / r["seconds"] if r["seconds"] else 0
+        print(f"{r['mode']:<10} {r['seconds']:>9.2f} {r['rtf']:>7.3f} {speedup:>7.2f}x {r['agreement']:>10.4f} {r['chars']:>7}")
+    if results[1]["text"] != results[0]["text"]:
+        print("\n⚠️ 两种方式的结果不完全相同（通常只是数值精度导致的个别字差异）")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "audio": args.audio, "audio_seconds": round(audio_seconds, 2), "model": args.model,
+                "assistant": args.assistant, "load_seconds": round(load_seconds, 2), "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+合成测试数据
+
+生成与 vocab/vocab.db 结构相同的单词库，以及阅读 / 听力阶段所需的文件，
+全部放在一个临时工作目录里，不会改动仓库中的真实数据。
+"""
+import os
+import json
+import random
+import shutil
+import sqlite3
+import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VOCAB_SCHEMA = """
+CREATE TABLE vocab_progress (
+    word TEXT PRIMARY KEY,
+    stage INTEGER,
+    first_seen TEXT,
+    last_review TEXT,
+    next_review TEXT,
+    reading TEXT,
+    definitions TEXT,
+    part_of_speech TEXT,
+    is_common INTEGER,
+    jlpt TEXT
+)
+"""
+
+POS_CHOICES = [["Noun"], ["Godan verb with 'u' ending", "Transitive verb"], ["Ichidan verb", "Intransitive verb"],
+               ["I-adjective (keiyoushi)"], ["Na-adjective (keiyodoshi)", "Noun"]]
+
+
+def make_vocab_db(path, n_words, due_ratio=0.02, new_ratio=0.3, seed=0):
+    """
+    生成 n_words 个合成单词：
+    - new_ratio 比例为未学习 (stage=0)
+    - due_ratio 比例今天到期复习
+    - 其余安排在未来复习
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    rows = []
+    for i in range(n_words):
+        r = rng.random()
+        if r < new_ratio:
+            stage, first_seen, last_review, next_review = 0, "", "", ""
+        else:
+            stage = rng.randint(1, 8)
+            first_seen = (today - datetime.timedelta(days=rng.randint(30, 400))).isoformat()
+            last_review = (today - datetime.timedelta(days=rng.randint(1, 30))).isoformat()
+            if r < new_ratio + due_ratio:
+                next_review = (today - datetime.timedelta(days=rng.randint(0, 3))).isoformat()
+            else:
+                next_review = (today + datetime.timedelta(days=rng.randint(1, 180))).isoformat()
+        level = rng.randint(1, 5)
+        rows.append((
+            f"単語{i:06d}", stage, first_seen, last_review, next_review,
+            f"たんご{i}", json.dumps([f"word {i}", f"meaning {i}"]),
+            json.dumps(rng.choice(POS_CHOICES)), rng.randint(0, 1), json.dumps([f"jlpt-n{level}"]),
+        ))
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute(VOCAB_SCHEMA)
+    with conn:
+        conn.executemany("INSERT INTO vocab_progress VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.close()
+    return path
+
+
+def make_workspace(root, n_words, due_ratio=0.02, seed=0):
+    """
+    在 root 下生成与仓库相同的目录结构：
+    vocab/vocab.db、read/topic.txt、read/template_reference.html、listen/audio/*.mp3|txt
+    """
+    os.makedirs(os.path.join(root, "vocab"), exist_ok=True)
+    os.makedirs(os.path.join(root, "read"), exist_ok=True)
+    os.makedirs(os.path.join(root, "listen", "audio"), exist_ok=True)
+
+    make_vocab_db(os.path.join(root, "vocab", "vocab.db"), n_words, due_ratio=due_ratio, seed=seed)
+
+    with open(os.path.join(root, "read", "topic.txt"), "w", encoding="utf-8") as f:
+        f.writelines(f"ベンチマーク話題{i}\n" for i in range(10))
+    shutil.copy(os.path.join(REPO_ROOT, "read", "template_reference.html"), os.path.join(root, "read"))
+
+    # 听力阶段只测试 sender（整理 + 发信），音频内容本身无关紧要
+    with open(os.path.join(root, "listen", "audio", "sample.mp3"), "wb") as f:
+        f.write(os.urandom(256 * 1024))
+    with open(os.path.join(root, "listen", "audio", "sample.txt"), "w", encoding="utf-8") as f:
+        f.write("今日はいい天気です散歩に行きましょう" * 50)
+    return root
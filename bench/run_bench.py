@@ -0,0 +1,204 @@
+"""
+端到端性能基准（完全离线）
+
+每个规模在独立的子进程中运行一次完整流水线：
+- LLM 使用本地 mock 服务（可配置延迟和失败率）
+- 邮件发送到本地 SMTP sink
+- 单词库使用合成数据（默认 1k / 10k / 100k 词）
+
+报告每个阶段的耗时、内存峰值、LLM 调用次数 / token、邮件数量和大小。
+
+用法:
+    python bench/run_bench.py
+    python bench/run_bench.py --sizes 1000 10000 --latency 0.05 --failure-rate 0.02
+    python bench/run_bench.py --json before.json      # 保存结果，便于前后对比
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from bench.fixtures import make_workspace
+
+# 可以离线运行的阶段（listen 转写依赖本地 Whisper 模型，不在这里测试）
+BENCH_STAGES = ["vocab", "read", "listen-send"]
+RESULT_MARKER = "BENCH_RESULT "
+
+
+# ---------- 子进程：实际运行各阶段 ----------
+
+def run_worker(args):
+    import tracemalloc
+    import resource
+    from bench.smtp_sink import start_smtp_sink
+
+    sink, smtp_port = start_smtp_sink()
+    os.environ.update({
+        "LLM_BACKEND": "mock",
+        "MOCK_LLM_LATENCY": str(args.latency),
+        "MOCK_LLM_FAILURE_RATE": str(args.failure_rate),
+        "LLM_RATE_PER_SEC": str(args.rate),
+        "LLM_RETRY_BASE_DELAY": "0.01",
+        "DEEPSEEK_APIKEY": "bench",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USE_SSL": "0",
+        "SENDER_EMAIL": "bench@localhost",
+        "SENDER_PASSWORD": "bench",
+        "RECEIVER_EMAIL": "learner@localhost",
+        "VOCAB_DB_PATH": "vocab/vocab.db",
+        "JOURNAL_DB_PATH": os.path.join(args.workspace, "journal.db"),
+        "AUDIO_DIR": "listen/audio",
+    })
+    os.chdir(args.workspace)
+
+    import importlib
+    import pipeline
+    from common import clients
+
+    def llm_totals():
+        llm = clients.peek_llm()
+        totals = {"calls": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0, "cache_hit_tokens": 0}
+        if llm is not None:
+            for s in llm.stats.values():
+                for key in totals:
+                    totals[key] += s[key]
+        return totals
+
+    results = []
+    for name in args.stages:
+        import_start = time.perf_counter()
+        module = importlib.import_module(pipeline.STAGES[name])
+        import_time = time.perf_counter() - import_start
+
+        llm_before, mail_before = llm_totals(), sink.stats()
+        if args.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        error = None
+        try:
+            module.main()
+        except Exception as e:
+            error = repr(e)
+        wall = time.perf_counter() - start
+        peak = 0
+        if args.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        llm_after, mail_after = llm_totals(), sink.stats()
+
+        results.append({
+            "stage": name,
+            "import_s": round(import_time, 4),
+            "wall_s": round(wall, 4),
+            "peak_mb": round(peak / 1024 / 1024, 2),
+            "llm_calls": llm_after["calls"] - llm_before["calls"],
+            "llm_retries": llm_after["retries"] - llm_before["retries"],
+            "tokens": (llm_after["prompt_tokens"] + llm_after["completion_tokens"])
+                      - (llm_before["prompt_tokens"] + llm_before["completion_tokens"]),
+            "cache_hit_tokens": llm_after["cache_hit_tokens"] - llm_before["cache_hit_tokens"],
+            "emails": mail_after["messages"] - mail_before["messages"],
+            "email_kb": round((mail_after["bytes"] - mail_before["bytes"]) / 1024, 1),
+            "error": error,
+        })
+
+    clients.close_clients()
+    summary = {
+        "stages": results,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    sys.__stdout__.write(RESULT_MARKER + json.dumps(summary, ensure_ascii=False) + "\n")
+
+
+# ---------- 主进程：准备数据并汇总 ----------
+
+def run_size(size, args):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{size}-") as workspace:
+        start = time.perf_counter()
+        make_workspace(workspace, size, due_ratio=args.due_ratio)
+        fixture_time = time.perf_counter() - start
+
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker",
+            "--workspace", workspace,
+            "--latency", str(args.latency),
+            "--failure-rate", str(args.failure_rate),
+            "--rate", str(args.rate),
+            "--stages", *args.stages,
+        ]
+        if not args.memory:
+            cmd.append("--no-memory")
+
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", cwd=REPO_ROOT)
+        process_time = time.perf_counter() - start
+
+        if args.verbose:
+            print(proc.stdout)
+        lines = [line for line in proc.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+        if proc.returncode != 0 or not lines:
+            print(proc.stdout[-2000:])
+            print(proc.stderr[-2000:])
+            raise RuntimeError(f"规模 {size} 的基准运行失败 (exit {proc.returncode})")
+
+        summary = json.loads(lines[-1][len(RESULT_MARKER):])
+        summary.update({"size": size, "fixture_s": round(fixture_time, 3), "process_s": round(process_time, 3)})
+        return summary
+
+
+def print_report(reports):
+    header = f"{'words':>7} {'stage':<12} {'wall(s)':>8} {'import(s)':>9} {'peak(MB)':>9} {'calls':>6} {'retry':>6} {'tokens':>9} {'cached':>9} {'mails':>5} {'mail(KB)':>9}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        for r in report["stages"]:
+            print(
+                f"{report['size']:>7} {r['stage']:<12} {r['wall_s']:>8.3f} {r['import_s']:>9.3f} {r['peak_mb']:>9.2f} "
+                f"{r['llm_calls']:>6} {r['llm_retries']:>6} {r['tokens']:>9} {r['cache_hit_tokens']:>9} {r['emails']:>5} {r['email_kb']:>9.1f}"
+                + (f"  ❌ {r['error']}" if r["error"] else "")
+            )
+        print(f"{'':>7} {'(process)':<12} {report['process_s']:>8.3f}   max RSS {report['max_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="每日日语流水线离线性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="单词库规模")
+    parser.add_argument("--stages", nargs="+", default=BENCH_STAGES, choices=BENCH_STAGES)
+    parser.add_argument("--latency", type=float, default=0.0, help="mock LLM 每次调用的延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="mock LLM 返回 503 的概率")
+    parser.add_argument("--rate", type=float, default=0, help="LLM 令牌桶速率，0 表示不限流")
+    parser.add_argument("--due-ratio", type=float, default=0.02, help="今日到期复习的单词比例")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="关闭 tracemalloc（耗时更准确）")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示各阶段的原始输出")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    reports = []
+    for size in args.sizes:
+        print(f"🏁 正在测试 {size} 词规模...")
+        reports.append(run_size(size, args))
+
+    print()
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
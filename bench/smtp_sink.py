@@ -0,0 +1,105 @@
+"""
+本地 SMTP 接收服务（离线测试用）
+
+只实现发信所需的最小命令集 (EHLO/AUTH/MAIL/RCPT/DATA/NOOP/RSET/QUIT)，
+收到的邮件保存在内存中，不做任何转发。
+
+用法:
+    python bench/smtp_sink.py --port 8025
+    然后设置 SMTP_SERVER=127.0.0.1 SMTP_PORT=8025 SMTP_USE_SSL=0
+"""
+import argparse
+import threading
+import socketserver
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 smtp-sink ready")
+        mail_from, rcpt_to = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self.wfile.write(b"250-smtp-sink\r\n250-AUTH PLAIN\r\n250 8BITMIME\r\n")
+            elif verb == "HELO":
+                self.reply("250 smtp-sink")
+            elif verb == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpt_to = line[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpt_to.append(line[8:].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                self.server.store(mail_from, rcpt_to, data)
+                self.reply("250 OK: queued")
+            elif verb in ("NOOP", "RSET"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def _read_data(self):
+        chunks = []
+        while True:
+            raw = self.rfile.readline()
+            if not raw or raw in (b".\r\n", b".\n"):
+                break
+            # 去掉点号转义
+            if raw.startswith(b".."):
+                raw = raw[1:]
+            chunks.append(raw)
+        return b"".join(chunks)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, SMTPSinkHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+
+    def store(self, mail_from, rcpt_to, data):
+        with self.lock:
+            self.messages.append({"from": mail_from, "to": rcpt_to, "size": len(data), "data": data})
+
+    def stats(self):
+        with self.lock:
+            return {"messages": len(self.messages), "bytes": sum(m["size"] for m in self.messages)}
+
+
+def start_smtp_sink(host="127.0.0.1", port=0):
+    """在后台线程启动 SMTP 接收服务，返回 (server, port)"""
+    server = SMTPSink((host, port))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, server.server_address[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 SMTP 接收服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    server = SMTPSink((args.host, args.port))
+    print(f"📮 SMTP sink 已启动: {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n共收到 {server.stats()['messages']} 封邮件")
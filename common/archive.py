@@ -0,0 +1,396 @@
+"""
+已发送内容的归档
+
+阅读文章（HTML）和听力材料（摘要、整理后的日语、中文翻译、原始转写）发送后都存入 ARCHIVE_DB_PATH：
+    - blobs:  内容按 sha256 寻址、压缩保存（有 zstandard 时用 zstd，否则用 zlib；每个 blob 记录自己的编码），
+              相同的内容只保存一份
+    - items:  每次发送一条，记录各部分对应的 blob、话题、标题，以及 MinHash 签名
+    - items_fts: 标题 + 日语正文的 FTS5 全文索引（trigram 分词），按单词、语法点查找
+      （少于 3 个字的查询 trigram 无法匹配，改为逐条扫描正文）
+
+MinHash（NUM_PERM 个哈希函数的最小值）用来估计两段文字的 Jaccard 相似度，不需要逐对比较全文：
+    - 话题签名（字符 2-gram）：pick_topic 取话题时，与已归档的话题过于相似的先跳过，不再付费生成一篇差不多的文章
+    - 正文签名（字符 3-gram）：归档时与以前的文章比较，记录并提示内容几乎相同的文章
+
+用法:
+    python common/archive.py stats
+    python common/archive.py search 〜にとって
+    python common/archive.py search 食べ --kind read
+    python common/archive.py similar 日本的新年习俗       # 与话题相似的已归档文章
+    python common/archive.py show 12
+    python common/archive.py resend 12                    # 重新发送，不调用 LLM
+"""
+import os
+import re
+import sys
+import json
+import zlib
+import random
+import sqlite3
+import hashlib
+import datetime
+from array import array
+
+# 允许直接运行本脚本时导入项目根目录下的 common 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import (
+    ARCHIVE_DB_PATH, ARCHIVE_AUDIO, ARCHIVE_TOPIC_THRESHOLD, ARCHIVE_ARTICLE_THRESHOLD,
+)
+from common import metrics
+from common.text import japanese_text
+
+try:
+    import zstandard
+except ImportError:     # 可选依赖：pip install zstandard
+    zstandard = None
+
+NUM_PERM = 128
+TOPIC_SHINGLE = 2       # 话题很短，用 2-gram
+TEXT_SHINGLE = 3
+MIN_FTS_LENGTH = 3
+
+_PRIME = (1 << 61) - 1
+# 固定种子：不同进程、不同时间算出的签名可以互相比较
+_rng = random.Random(20240601)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_SPACE = re.compile(r"\s+")
+_ARTICLE = re.compile(r"<article\b.*?</article>", re.IGNORECASE | re.DOTALL)
+_H1 = re.compile(r"<h1\b[^>]*>(.*?)</h1>", re.IGNORECASE | re.DOTALL)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    topic TEXT NOT NULL DEFAULT '',
+    delivered_at TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    parts TEXT NOT NULL,
+    topic_sig BLOB,
+    text_sig BLOB,
+    duplicate_of INTEGER,
+    UNIQUE (kind, content_hash)
+);
+"""
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(title, japanese, tokenize='trigram');
+"""
+
+
+# ---------- MinHash ----------
+
+def shingles(text, k):
+    """去掉空白后的字符 k-gram 集合；比 k 还短的文字整体作为一个"""
+    text = _SPACE.sub("", text)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(text, k):
+    """NUM_PERM 个 (a·x + b) mod p 的最小值，打包为 bytes；没有内容时返回 None"""
+    values = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") % _PRIME
+        for s in shingles(text, k)
+    ]
+    if not values:
+        return None
+    return array("Q", [min((a * x + b) % _PRIME for x in values) for a, b in _PERMS]).tobytes()
+
+
+def jaccard(sig_a, sig_b):
+    """两个签名相同位置相等的比例 ≈ 两段文字 shingle 集合的 Jaccard 相似度"""
+    if not sig_a or not sig_b:
+        return 0.0
+    a, b = array("Q"), array("Q")
+    a.frombytes(sig_a)
+    b.frombytes(sig_b)
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+# ---------- 压缩 ----------
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("该内容用 zstd 压缩，需要安装 zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return data
+
+
+def article_text(html):
+    """阅读邮件中的日语正文（<article> 部分）；找不到时取整页的日语"""
+    match = _ARTICLE.search(html)
+    return japanese_text(match.group(0) if match else html)
+
+
+def article_title(html):
+    match = _H1.search(html)
+    return japanese_text(match.group(1)).strip() if match else ""
+
+
+class Archive:
+    def __init__(self, path=None):
+        self.conn = sqlite3.connect(path or ARCHIVE_DB_PATH, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            # 编译时没有 FTS5 / trigram（SQLite < 3.34）时退化为逐条扫描
+            print(f"⚠️ 无法创建归档全文索引，将使用逐条查找: {e}")
+            self.fts = False
+
+    # ---------- 写入 ----------
+
+    def put_blob(self, content):
+        """保存一段内容（str 或 bytes），返回 sha256；已有相同内容时不重复保存"""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+        if self.conn.execute("SELECT 1 FROM blobs WHERE hash=?", (digest,)).fetchone() is None:
+            codec, packed = _compress(data)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)",
+                    (digest, codec, len(data), packed),
+                )
+        return digest
+
+    def get_blob(self, digest):
+        row = self.conn.execute("SELECT codec, data FROM blobs WHERE hash=?", (digest,)).fetchone()
+        return None if row is None else _decompress(row["codec"], row["data"])
+
+    @metrics.timed("sqlite_query", op="archive_store")
+    def store(self, kind, main, parts, japanese, title="", topic=""):
+        """
+        归档一次发送。main: 主要内容（文章 HTML / 整理后的日语），按它的哈希去重；
+        parts: {名称: 文本或 bytes}（html / japanese / translation / transcript / audio ……）；
+        japanese: 建立索引、计算正文签名用的日语正文。
+        返回 (id, 内容几乎相同的旧文章 id 或 None)；同样的内容已经归档过时返回原来的 id。
+        """
+        content_hash = self.put_blob(main)
+        row = self.conn.execute(
+            "SELECT id, duplicate_of FROM items WHERE kind=? AND content_hash=?", (kind, content_hash),
+        ).fetchone()
+        if row is not None:
+            return row["id"], row["duplicate_of"]
+
+        refs = {name: self.put_blob(value) for name, value in parts.items() if value}
+        text_sig = minhash(japanese, TEXT_SHINGLE)
+        similar = self.similar_articles(text_sig, kind=kind)
+        duplicate_of = similar[0][1] if similar else None
+        with self.conn:
+            cursor = self.conn.execute(
+                """INSERT INTO items (kind, title, topic, delivered_at, content_hash, parts, topic_sig, text_sig, duplicate_of)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (kind, title, topic, datetime.datetime.now().isoformat(timespec="seconds"), content_hash,
+                 json.dumps(refs), minhash(topic, TOPIC_SHINGLE) if topic else None, text_sig, duplicate_of),
+            )
+            item_id = cursor.lastrowid
+            if self.fts:
+                self.conn.execute(
+                    "INSERT INTO items_fts (rowid, title, japanese) VALUES (?, ?, ?)", (item_id, title, japanese),
+                )
+        metrics.incr("archive_items", kind=kind)
+        return item_id, duplicate_of
+
+    def store_read(self, html, topic):
+        japanese = article_text(html)
+        return self.store("read", html, {"html": html}, japanese, title=article_title(html), topic=topic)
+
+    def store_listen(self, summary, japanese, translation, transcript="", audio_path=None):
+        parts = {"summary": summary, "japanese": japanese, "translation": translation, "transcript": transcript}
+        if ARCHIVE_AUDIO and audio_path and os.path.exists(audio_path):
+            with open(audio_path, "rb") as f:
+                parts["audio"] = f.read()
+            parts["audio_name"] = os.path.basename(audio_path)
+        return self.store("listen", japanese, parts, japanese, title=summary)
+
+    # ---------- 查找 ----------
+
+    def similar_topics(self, topic, threshold=None, kind="read"):
+        """与 topic 相似度不低于阈值的已归档内容 [(相似度, id, 话题, 发送时间)]，相似度从高到低"""
+        threshold = ARCHIVE_TOPIC_THRESHOLD if threshold is None else threshold
+        sig = minhash(topic, TOPIC_SHINGLE)
+        rows = self.conn.execute(
+            "SELECT id, topic, delivered_at, topic_sig FROM items WHERE kind=? AND topic_sig IS NOT NULL", (kind,),
+        )
+        matches = [(jaccard(sig, r["topic_sig"]), r["id"], r["topic"], r["delivered_at"]) for r in rows]
+        return sorted((m for m in matches if m[0] >= threshold), reverse=True)
+
+    def similar_articles(self, text_sig, threshold=None, kind="read"):
+        """正文签名与 text_sig 相似度不低于阈值的已归档内容 [(相似度, id, 标题)]"""
+        threshold = ARCHIVE_ARTICLE_THRESHOLD if threshold is None else threshold
+        if not text_sig:
+            return []
+        rows = self.conn.execute("SELECT id, title, text_sig FROM items WHERE kind=? AND text_sig IS NOT NULL", (kind,))
+        matches = [(jaccard(text_sig, r["text_sig"]), r["id"], r["title"]) for r in rows]
+        return sorted((m for m in matches if m[0] >= threshold), reverse=True)
+
+    @metrics.timed("sqlite_query", op="archive_search")
+    def search(self, query, kind=None, limit=20):
+        """日语正文或标题中包含 query 的内容 [{"id", "kind", "title", "topic", "delivered_at", "snippet"}]，新的在前"""
+        query = query.strip()
+        if not query:
+            return []
+        kind_filter = "AND i.kind = ?" if kind else ""
+        params = [kind] if kind else []
+        if self.fts and len(query) >= MIN_FTS_LENGTH:
+            rows = self.conn.execute(f"""
+                SELECT i.id, i.kind, i.title, i.topic, i.delivered_at,
+                       snippet(items_fts, 1, '【', '】', '…', 24) AS snippet
+                FROM items_fts JOIN items i ON i.id = items_fts.rowid
+                WHERE items_fts MATCH ? {kind_filter}
+                ORDER BY i.delivered_at DESC LIMIT ?
+            """, ('"' + query.replace('"', '""') + '"', *params, limit)).fetchall()
+            return [dict(r) for r in rows]
+
+        # 短查询（或没有全文索引）：逐条解压日语正文查找
+        rows = self.conn.execute(f"""
+            SELECT i.id, i.kind, i.title, i.topic, i.delivered_at, i.parts FROM items i
+            WHERE 1 {kind_filter} ORDER BY i.delivered_at DESC
+        """, params)
+        results = []
+        for r in rows:
+            text = self.japanese(r)
+            pos = text.find(query)
+            if pos < 0 and query not in r["title"]:
+                continue
+            snippet = text[max(0, pos - 24):pos] + f"【{query}】" + text[pos + len(query):pos + len(query) + 24] if pos >= 0 else ""
+            results.append({**{k: r[k] for k in ("id", "kind", "title", "topic", "delivered_at")}, "snippet": snippet})
+            if len(results) >= limit:
+                break
+        return results
+
+    def japanese(self, row):
+        """索引中的日语正文（从 blob 重新提取）"""
+        refs = json.loads(row["parts"])
+        if row["kind"] == "read":
+            return article_text(self.get_blob(refs["html"]).decode("utf-8"))
+        return self.get_blob(refs["japanese"]).decode("utf-8") if "japanese" in refs else ""
+
+    def get(self, item_id):
+        """{"id", "kind", "title", "topic", "delivered_at", "duplicate_of", "parts": {名称: 内容}}；没有时返回 None"""
+        row = self.conn.execute("SELECT * FROM items WHERE id=?", (item_id,)).fetchone()
+        if row is None:
+            return None
+        parts = {}
+        for name, digest in json.loads(row["parts"]).items():
+            data = self.get_blob(digest)
+            parts[name] = data if name == "audio" else data.decode("utf-8")
+        item = {k: row[k] for k in ("id", "kind", "title", "topic", "delivered_at", "duplicate_of")}
+        item["parts"] = parts
+        return item
+
+    def stats(self):
+        items = self.conn.execute("SELECT kind, count(*) FROM items GROUP BY kind ORDER BY kind").fetchall()
+        blobs = self.conn.execute("SELECT count(*), coalesce(sum(size), 0), coalesce(sum(length(data)), 0) FROM blobs").fetchone()
+        codecs = self.conn.execute("SELECT codec, count(*) FROM blobs GROUP BY codec").fetchall()
+        return [tuple(r) for r in items], tuple(blobs), [tuple(r) for r in codecs]
+
+    def close(self):
+        self.conn.close()
+
+
+# ---------- 命令行 ----------
+
+def resend(item):
+    """用归档内容重新发送邮件（不调用 LLM）"""
+    parts = item["parts"]
+    if item["kind"] == "read":
+        from read.main import send_email
+        try:
+            send_email(parts["html"])
+        except Exception as e:
+            print(f"⚠️ 重新发送失败: {e}")
+            return False
+        return True
+
+    from listen.sender import send_email
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = os.path.join(tmp, parts.get("audio_name", "audio.mp3"))
+        if "audio" in parts:
+            with open(audio_path, "wb") as f:
+                f.write(parts["audio"])
+        return send_email(parts.get("summary") or item["title"], parts["japanese"], parts["translation"], audio_path)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="已发送内容的归档")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="归档数量和压缩情况")
+    p_search = sub.add_parser("search", help="按单词 / 语法点查找")
+    p_search.add_argument("query")
+    p_search.add_argument("--kind", choices=["read", "listen"])
+    p_search.add_argument("--limit", type=int, default=20)
+    p_similar = sub.add_parser("similar", help="与话题相似的已归档文章")
+    p_similar.add_argument("topic")
+    p_similar.add_argument("--threshold", type=float, default=None)
+    p_show = sub.add_parser("show", help="显示一条归档内容")
+    p_show.add_argument("id", type=int)
+    p_resend = sub.add_parser("resend", help="重新发送一条归档内容")
+    p_resend.add_argument("id", type=int)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(ARCHIVE_DB_PATH):
+        print(f"❌ 未找到归档文件: {ARCHIVE_DB_PATH}")
+        return
+    archive = Archive()
+    try:
+        if args.command == "stats":
+            items, (count, size, stored), codecs = archive.stats()
+            print(f"🗄 归档共 {sum(n for _, n in items)} 条: " + "，".join(f"{kind} {n}" for kind, n in items))
+            ratio = stored / size if size else 0
+            print(f"   {count} 个 blob，原始 {size / 1024:.1f} KB，压缩后 {stored / 1024:.1f} KB（{ratio:.0%}）"
+                  + "，编码: " + "、".join(f"{codec} {n}" for codec, n in codecs))
+        elif args.command == "search":
+            results = archive.search(args.query, args.kind, args.limit)
+            print(f"🔍 找到 {len(results)} 条")
+            for r in results:
+                print(f"   #{r['id']} [{r['kind']}] {r['delivered_at'][:10]} {r['title']}")
+                if r["snippet"]:
+                    print(f"      {' '.join(r['snippet'].split())}")
+        elif args.command == "similar":
+            for score, item_id, topic, delivered_at in archive.similar_topics(args.topic, args.threshold):
+                print(f"   #{item_id} {score:.2f} {delivered_at[:10]} {topic}")
+        else:
+            item = archive.get(args.id)
+            if item is None:
+                print(f"❌ 没有这条归档: {args.id}")
+            elif args.command == "show":
+                print(f"#{item['id']} [{item['kind']}] {item['delivered_at']} {item['title']}")
+                if item["topic"]:
+                    print(f"话题: {item['topic']}")
+                if item["duplicate_of"]:
+                    print(f"⚠️ 与 #{item['duplicate_of']} 内容几乎相同")
+                parts = item["parts"]
+                body = article_text(parts["html"]) if item["kind"] == "read" else parts["japanese"] + "\n\n" + parts["translation"]
+                print("\n" + body)
+            elif resend(item):
+                print(f"📮 已重新发送 #{item['id']}")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+共享客户端
+
+HTTP 会话、LLM 网关和 SMTP 连接在进程内只创建一次，
+流水线中的各个阶段复用同一个连接池，避免重复握手和登录。
+"""
+import smtplib
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import config, metrics
+
+_http_session = None
+_llm = None
+_smtp_idle = []     # 空闲的 SMTP 连接（连接池）
+_smtp_lock = threading.Lock()
+
+
+def get_http_session():
+    """返回进程内共享的 requests.Session（带连接池）"""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http_session = session
+    return _http_session
+
+
+def get_llm():
+    """返回共享的 LLM 网关（限流、重试、统计都在网关内完成）"""
+    global _llm
+    if _llm is None:
+        from common.llm import create_gateway
+        _llm = create_gateway(get_http_session())
+    return _llm
+
+
+def peek_llm():
+    """返回已创建的 LLM 网关；本进程还没有调用过 LLM 时返回 None"""
+    return _llm
+
+
+def _smtp_alive(conn):
+    try:
+        return conn.noop()[0] == 250
+    except smtplib.SMTPException:
+        return False
+    except OSError:
+        return False
+
+
+def _smtp_connect():
+    if config.SMTP_USE_SSL:
+        conn = smtplib.SMTP_SSL(config.SMTP_SERVER, config.SMTP_PORT, timeout=15)
+    else:
+        conn = smtplib.SMTP(config.SMTP_SERVER, config.SMTP_PORT, timeout=15)
+    if config.SENDER_PASSWORD:
+        conn.login(config.SENDER_EMAIL, config.SENDER_PASSWORD)
+    return conn
+
+
+def _acquire_smtp():
+    with _smtp_lock:
+        conn = _smtp_idle.pop() if _smtp_idle else None
+    if conn is not None and _smtp_alive(conn):
+        return conn
+    return _smtp_connect()
+
+
+def _release_smtp(conn):
+    with _smtp_lock:
+        if len(_smtp_idle) < config.SMTP_POOL_SIZE:
+            _smtp_idle.append(conn)
+            return
+    _smtp_quit(conn)
+
+
+def _smtp_quit(conn):
+    try:
+        conn.quit()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+
+def send_mail(from_addr, to_addrs, message_str):
+    """
+    通过 SMTP 连接池发送邮件（线程安全，可并发调用）。
+    连接在第一次使用时建立并登录，之后复用；断线时自动重连一次。
+    发送失败时抛出异常，由调用方决定如何处理。
+    """
+    metrics.observe("email_bytes", len(message_str.encode("utf-8")))
+    with metrics.span("smtp_send"):
+        conn = _acquire_smtp()
+        try:
+            try:
+                conn.sendmail(from_addr, to_addrs, message_str)
+            except smtplib.SMTPServerDisconnected:
+                conn = _smtp_connect()
+                conn.sendmail(from_addr, to_addrs, message_str)
+        except BaseException:
+            _smtp_quit(conn)
+            raise
+        _release_smtp(conn)
+
+
+def close_clients():
+    """关闭所有共享连接（流水线结束时调用）"""
+    global _http_session, _llm
+    with _smtp_lock:
+        idle = list(_smtp_idle)
+        _smtp_idle.clear()
+    for conn in idle:
+        _smtp_quit(conn)
+    if _http_session is not None:
+        _http_session.close()
+        _http_session = None
+    _llm = None
@@ -0,0 +1,105 @@
+"""
+全局配置
+
+整个进程只加载一次 .env，vocab / read / listen 各阶段共用这里的常量。
+"""
+import os
+from dotenv import load_dotenv
+
+# 加载环境变量（模块只会被导入一次，因此只执行一次）
+load_dotenv()
+
+# ---------- 邮件 ----------
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+RECEIVER_EMAIL = os.getenv("RECEIVER_EMAIL")
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.qq.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "1") != "0"   # 本地 SMTP 测试服务使用明文连接
+
+# ---------- DeepSeek ----------
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_APIKEY")
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+
+# ---------- 单词 ----------
+VOCAB_DB_PATH = os.getenv("VOCAB_DB_PATH", "vocab/vocab.db")
+JMDICT_DB_PATH = os.getenv("JMDICT_DB_PATH", "vocab/jmdict.db")
+JISHO_FALLBACK = os.getenv("JISHO_FALLBACK", "1") != "0"     # 本地词典查不到时是否联网查询 Jisho
+NEW_WORDS_PER_DAY = int(os.getenv("NEW_WORDS_PER_DAY", 20))
+MAX_STAGES = int(os.getenv("MAX_REVIEWS", 8))
+# 各 stage 的复习间隔（天）；自动升级、评分、Anki 导入导出都使用这一张表
+REVIEW_INTERVALS = [int(days) for days in os.getenv("REVIEW_INTERVALS", "1,2,4,7,15,30,60,90,180").split(",")]
+TEAM_WORKERS = int(os.getenv("TEAM_WORKERS", 4))   # 多用户模式下并发解析 / 发信的线程数
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", 1))                  # 预取未来几天内到期的单词
+PREFETCH_RATE_PER_SEC = float(os.getenv("PREFETCH_RATE_PER_SEC", 0.5))  # 预取时的限流（低于白天的发送任务）
+PREFETCH_MAX_AGE_DAYS = int(os.getenv("PREFETCH_MAX_AGE_DAYS", 7))   # 超过这个天数的预取结果视为过期
+HARVEST_TOKENIZER = os.getenv("HARVEST_TOKENIZER", "auto")          # auto / fugashi / sudachi
+HARVEST_MAX_WORDS = int(os.getenv("HARVEST_MAX_WORDS", 10))         # 每次从文章 / 转写中最多收几个生词
+HARVEST_MIN_COUNT = int(os.getenv("HARVEST_MIN_COUNT", 1))          # 至少出现几次才收
+HARVEST_JLPT_LIST = os.getenv("HARVEST_JLPT_LIST", "")              # JLPT 词表（单词,等级），收词时同频的词按等级排序
+EXAMPLE_MIN_SENTENCES = int(os.getenv("EXAMPLE_MIN_SENTENCES", 2))   # 例句库中有几句可用时不再让 LLM 写例句（0 = 总是让 LLM 写）
+EXAMPLE_ROTATION_DAYS = int(os.getenv("EXAMPLE_ROTATION_DAYS", 30))  # 同一个单词用过的例句多少天内不再出现
+EMAIL_MAX_BYTES = int(os.getenv("EMAIL_MAX_BYTES", 90000))           # 单封单词邮件的 HTML 上限（Gmail 约 102KB 截断）
+EMAIL_OVERFLOW = os.getenv("EMAIL_OVERFLOW", "paginate")             # 超出上限的单词: paginate 分多封 / table 紧凑表格
+EMAIL_INLINE_STYLES = os.getenv("EMAIL_INLINE_STYLES", "0") == "1"   # 邮箱不支持 <style> 时改为内联样式
+
+# ---------- 复习评分（见 vocab/grading.py） ----------
+GRADE_SECRET = os.getenv("GRADE_SECRET", "")                       # 为空时邮件中不显示评分链接
+GRADE_BASE_URL = os.getenv("GRADE_BASE_URL", "http://127.0.0.1:8766")   # 邮件中链接指向的地址
+GRADE_HOST = os.getenv("GRADE_HOST", "127.0.0.1")
+GRADE_PORT = int(os.getenv("GRADE_PORT", 8766))
+GRADE_FLUSH_INTERVAL = float(os.getenv("GRADE_FLUSH_INTERVAL", 5))     # 评分批量写入数据库的间隔（秒）
+GRADE_BATCH_SIZE = int(os.getenv("GRADE_BATCH_SIZE", 200))             # 积累到这么多条时立即写入
+
+# ---------- 阅读 ----------
+JLPT_LEVEL = os.getenv("JLPT_LEVEL", "N4")
+
+# ---------- 听力 ----------
+AUDIO_DIR = os.getenv("AUDIO_DIR", "listen/audio")
+WHISPER_MODEL_PATH = os.getenv("WHISPER_MODEL_PATH", "listen/whisper-large-v3")
+# 辅助解码（speculative decoding）的小模型，例如 distil-large-v3；为空时不使用
+WHISPER_ASSISTANT_MODEL_PATH = os.getenv("WHISPER_ASSISTANT_MODEL_PATH", "")
+PCM_CACHE_DIR = os.getenv("PCM_CACHE_DIR", "listen/pcm")                 # 预处理后的 16kHz PCM 文件
+PCM_DTYPE = os.getenv("PCM_DTYPE", "float32")                              # float32（零拷贝读取）/ int16（体积减半）
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", min(4, os.cpu_count() or 1)))  # 解码进程数
+ASR_CACHE_PATH = os.getenv("ASR_CACHE_PATH", "listen/asr_cache.db")          # 转写结果缓存（按音频内容）
+ASR_NEAR_DUP_THRESHOLD = float(os.getenv("ASR_NEAR_DUP_THRESHOLD", 0.75))  # 指纹相同比特的比例达到此值视为疑似重复（无关音频约 0.5）
+ASR_REUSE_NEAR_DUP = os.getenv("ASR_REUSE_NEAR_DUP", "0") == "1"          # 疑似重复时直接使用旧的转写结果（默认只提示，仍然转写）
+
+# ---------- 归档（见 common/archive.py） ----------
+ARCHIVE_DB_PATH = os.getenv("ARCHIVE_DB_PATH", "archive.db")              # 已发送的阅读 / 听力内容
+ARCHIVE_AUDIO = os.getenv("ARCHIVE_AUDIO", "0") == "1"                    # 听力的 mp3 也存入归档（体积较大）
+ARCHIVE_TOPIC_DEDUP = os.getenv("ARCHIVE_TOPIC_DEDUP", "skip")            # 话题与已发送的相似时: skip 换下一个话题 / warn 只提示
+ARCHIVE_TOPIC_THRESHOLD = float(os.getenv("ARCHIVE_TOPIC_THRESHOLD", 0.5))      # 话题 MinHash 相似度达到此值视为重复
+ARCHIVE_ARTICLE_THRESHOLD = float(os.getenv("ARCHIVE_ARTICLE_THRESHOLD", 0.6))  # 正文 MinHash 相似度达到此值视为几乎相同
+
+# ---------- 运行日志（断点续跑） ----------
+JOURNAL_DB_PATH = os.getenv("JOURNAL_DB_PATH", "journal.db")
+
+# ---------- 运行指标 ----------
+METRICS_FORMAT = os.getenv("METRICS_FORMAT", "jsonl")   # jsonl / prometheus / both / off
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+
+# ---------- 性能剖析（默认关闭，见 common/profiling.py） ----------
+PROFILE = os.getenv("PROFILE", "")                      # cpu / sample / mem，逗号分隔；1 或 all 为全部
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", 25))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))   # 采样间隔（秒）
+
+# ---------- LLM 网关 ----------
+LLM_BACKEND = os.getenv("LLM_BACKEND", "deepseek")          # deepseek / mock
+LLM_RATE_PER_SEC = float(os.getenv("LLM_RATE_PER_SEC", 2))  # 令牌桶：每秒请求数
+LLM_BURST = int(os.getenv("LLM_BURST", 4))                  # 令牌桶：突发上限
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 1.0))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 10))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 120))
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", 60))   # 流式输出多久没有新数据算超时（秒）
+LLM_REASK_MAX = int(os.getenv("LLM_REASK_MAX", 1))      # 输出缺少字段 / 段落时最多补问几次（见 common/validate.py）
+MOCK_LLM_LATENCY = float(os.getenv("MOCK_LLM_LATENCY", 0))
+MOCK_LLM_FAILURE_RATE = float(os.getenv("MOCK_LLM_FAILURE_RATE", 0))
+MOCK_LLM_CHUNK_DELAY = float(os.getenv("MOCK_LLM_CHUNK_DELAY", 0))           # 流式输出每块之间的间隔（秒）
+MOCK_LLM_STREAM_CUT_RATE = float(os.getenv("MOCK_LLM_STREAM_CUT_RATE", 0))   # 流式输出中途断开的概率
+MOCK_LLM_MALFORMED_RATE = float(os.getenv("MOCK_LLM_MALFORMED_RATE", 0))     # 返回有小毛病的输出的概率
@@ -0,0 +1,100 @@
+"""
+运行日志（断点续跑）
+
+每个阶段每天对应一个 run（run_id = "阶段:日期"）。
+每完成一个步骤（单词解析、渲染、发送、更新数据库……）就写入一条检查点，
+同一天重新运行时直接读取已完成的检查点，不会重复调用付费 API 或重复推进 stage。
+"""
+import json
+import sqlite3
+import datetime
+import threading
+
+from common.config import JOURNAL_DB_PATH
+
+
+class RunJournal:
+    def __init__(self, stage, run_date=None, path=None):
+        self.stage = stage
+        self.run_date = run_date or datetime.date.today().isoformat()
+        self.run_id = f"{stage}:{self.run_date}"
+        # 同一个 run 可能被多个线程并发写入检查点（多用户分发）
+        self.conn = sqlite3.connect(path or JOURNAL_DB_PATH, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                stage TEXT,
+                run_date TEXT,
+                status TEXT,
+                started_at TEXT,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT,
+                step TEXT,
+                key TEXT,
+                value TEXT,
+                created_at TEXT,
+                PRIMARY KEY (run_id, step, key)
+            );
+        """)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, stage, run_date, status, started_at) VALUES (?, ?, ?, 'running', ?)",
+                (self.run_id, stage, self.run_date, _now()),
+            )
+
+    @property
+    def finished(self):
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM runs WHERE run_id=?", (self.run_id,)).fetchone()
+        return row is not None and row[0] == "done"
+
+    def has(self, step, key=""):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM checkpoints WHERE run_id=? AND step=? AND key=?",
+                (self.run_id, step, key),
+            ).fetchone()
+        return row is not None
+
+    def get(self, step, key=""):
+        """返回检查点保存的值；不存在时返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM checkpoints WHERE run_id=? AND step=? AND key=?",
+                (self.run_id, step, key),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def values(self, step):
+        """这个 run 中某个步骤的全部检查点 {key: 值}"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, value FROM checkpoints WHERE run_id=? AND step=? ORDER BY created_at, key",
+                (self.run_id, step),
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def record(self, step, key="", value=True):
+        """写入检查点（立即提交，进程崩溃也不会丢失）"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, step, key, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, step, key, json.dumps(value, ensure_ascii=False), _now()),
+            )
+
+    def finish(self):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE runs SET status='done', finished_at=? WHERE run_id=?",
+                (_now(), self.run_id),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
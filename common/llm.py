@@ -0,0 +1,358 @@
+"""
+LLM 网关
+
+所有 DeepSeek 调用（单词解析、阅读生成、听力整理）都经过这里：
+- 共享的 HTTP 连接池
+- 令牌桶限流
+- 带抖动的指数退避重试（超时 / 连接错误 / 429 / 5xx）
+- 每次调用的耗时与 token 统计
+- 流式输出（SSE）：按空闲时间超时，中断后只重新生成缺失的尾部
+- 可替换的后端（deepseek / mock 本地服务）
+"""
+import json
+import time
+import random
+import threading
+
+import requests
+
+from common import config, metrics
+
+
+class LLMError(Exception):
+    """LLM 调用最终失败"""
+
+
+class RetryableError(LLMError):
+    """可重试的错误（限流、服务端错误、网络问题）"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ---------- 限流 ----------
+
+class TokenBucket:
+    """线程安全的令牌桶：rate 为每秒补充的令牌数，capacity 为突发上限"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ---------- 后端 ----------
+
+class HTTPBackend:
+    """OpenAI 兼容的 /chat/completions 接口（DeepSeek 或本地 mock 服务）"""
+
+    def __init__(self, base_url, api_key, session):
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.api_key = api_key
+        self.session = session
+
+    def _post(self, payload, timeout, stream=False):
+        try:
+            response = self.session.post(
+                self.url,
+                json=payload,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                    "User-Agent": "DailyJapanese/1.0",
+                },
+                timeout=timeout,
+                stream=stream,
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableError(f"网络错误: {e}") from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            response.close()
+            raise RetryableError(
+                f"HTTP {response.status_code}",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        if response.status_code >= 400:
+            raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def complete(self, payload, timeout):
+        return self._post(payload, timeout).json()
+
+    def stream(self, payload, timeout):
+        """
+        逐个返回 SSE 事件（已解析的 JSON）。
+        timeout 的读取超时作用于每次读取，即“多久没有收到任何数据”，而不是总耗时。
+        """
+        response = self._post(payload, timeout, stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    return
+                try:
+                    yield json.loads(data)
+                except json.JSONDecodeError as e:
+                    raise RetryableError(f"流式数据格式异常: {e}") from e
+            # 没有收到 [DONE] 就断开，说明输出不完整
+            raise RetryableError("流式输出提前结束")
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            raise RetryableError(f"流式读取中断: {e}") from e
+        finally:
+            response.close()
+
+
+def _deepseek_backend(session):
+    return HTTPBackend(config.DEEPSEEK_BASE_URL, config.DEEPSEEK_API_KEY, session)
+
+
+def _mock_backend(session):
+    # 延迟导入：只有离线测试时才需要启动本地服务
+    from common.mock_llm_server import start_mock_server
+    _, base_url = start_mock_server(
+        latency=config.MOCK_LLM_LATENCY,
+        failure_rate=config.MOCK_LLM_FAILURE_RATE,
+        chunk_delay=config.MOCK_LLM_CHUNK_DELAY,
+        stream_cut_rate=config.MOCK_LLM_STREAM_CUT_RATE,
+        malformed_rate=config.MOCK_LLM_MALFORMED_RATE,
+    )
+    return HTTPBackend(base_url, "mock-key", session)
+
+
+BACKENDS = {
+    "deepseek": _deepseek_backend,
+    "mock": _mock_backend,
+}
+
+
+def register_backend(name, factory):
+    """注册新的后端；factory(session) 返回带 complete(payload, timeout) 方法的对象"""
+    BACKENDS[name] = factory
+
+
+# ---------- 网关 ----------
+
+class LLMResponse:
+    def __init__(self, content, usage, latency, raw):
+        self.content = content
+        self.usage = usage
+        self.latency = latency
+        self.raw = raw
+
+
+class LLMGateway:
+    def __init__(self, backend, model=None, rate_per_sec=None, burst=None, max_retries=None, timeout=None):
+        self.backend = backend
+        self.model = model or config.DEEPSEEK_MODEL
+        self.bucket = TokenBucket(
+            config.LLM_RATE_PER_SEC if rate_per_sec is None else rate_per_sec,
+            config.LLM_BURST if burst is None else burst,
+        )
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or (config.LLM_CONNECT_TIMEOUT, config.LLM_READ_TIMEOUT)
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def chat(self, messages, temperature=1.0, max_tokens=None, response_format=None, timeout=None, tag="default"):
+        """
+        发送一次对话请求，返回 LLMResponse。
+        timeout 为读取超时（秒），连接超时使用全局配置。
+        重试耗尽或遇到不可重试的错误时抛出 LLMError。
+        """
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if response_format is not None:
+            payload["response_format"] = response_format
+        call_timeout = (self.timeout[0], timeout) if timeout else self.timeout
+
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                data = self.backend.complete(payload, call_timeout)
+            except RetryableError as e:
+                if attempt >= self.max_retries:
+                    self._record(tag, time.perf_counter() - start, None, failed=True)
+                    raise LLMError(f"重试 {attempt} 次后仍失败: {e}") from e
+                delay = e.retry_after if e.retry_after is not None else _backoff(attempt)
+                print(f"⏳ LLM 调用失败 ({e})，{delay:.1f} 秒后重试...")
+                self._record(tag, time.perf_counter() - start, None, retried=True)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except LLMError:
+                self._record(tag, time.perf_counter() - start, None, failed=True)
+                raise
+
+            latency = time.perf_counter() - start
+            usage = data.get("usage") or {}
+            self._record(tag, latency, usage)
+            try:
+                content = data["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError) as e:
+                raise LLMError(f"响应格式异常: {e}") from e
+            return LLMResponse(content, usage, latency, data)
+
+    def stream_chat(self, messages, temperature=1.0, max_tokens=None, idle_timeout=None, tag="default",
+                    on_text=None, parser=None, prefix=""):
+        """
+        流式对话，返回 LLMResponse（content 为 prefix + 新生成的全部文本）。
+
+        idle_timeout: 多少秒没有收到新数据算超时（默认 LLM_STREAM_IDLE_TIMEOUT），生成再久也不会因总耗时失败
+        on_text:      每收到一段文本调用一次
+        parser:       SectionParser；中断重试时丢弃不完整的段落，从完整部分继续
+        prefix:       已有的完整输出（例如从运行日志恢复），只生成后面的部分
+        """
+        call_timeout = (self.timeout[0], idle_timeout or config.LLM_STREAM_IDLE_TIMEOUT)
+        if parser and not prefix:
+            prefix = parser.complete_text
+        if not hasattr(self.backend, "stream"):
+            # 自定义后端不支持流式时退化为普通请求，整段文本一次交给回调
+            response = self.chat(_continue_messages(messages, prefix), temperature, max_tokens,
+                                 timeout=call_timeout[1], tag=tag)
+            if on_text:
+                on_text(response.content)
+            if parser:
+                parser.feed(response.content)
+                parser.finish()
+            response.content = prefix + response.content
+            return response
+
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            payload = {
+                "model": self.model,
+                "messages": _continue_messages(messages, prefix),
+                "temperature": temperature,
+                "stream": True,
+                "stream_options": {"include_usage": True},
+            }
+            if max_tokens is not None:
+                payload["max_tokens"] = max_tokens
+
+            self.bucket.acquire()
+            attempt_start = time.perf_counter()
+            received = []
+            usage = {}
+            try:
+                for event in self.backend.stream(payload, call_timeout):
+                    usage = event.get("usage") or usage
+                    for choice in event.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            received.append(delta)
+                            if on_text:
+                                on_text(delta)
+                            if parser:
+                                parser.feed(delta)
+            except RetryableError as e:
+                if attempt >= self.max_retries:
+                    self._record(tag, time.perf_counter() - attempt_start, usage, failed=True)
+                    raise LLMError(f"重试 {attempt} 次后仍失败: {e}") from e
+                # 只保留完整的部分，下一次请求从这里继续
+                prefix = parser.rewind() if parser else prefix + "".join(received)
+                delay = e.retry_after if e.retry_after is not None else _backoff(attempt)
+                print(f"⏳ 流式输出中断 ({e})，已保留 {len(prefix)} 字，{delay:.1f} 秒后继续生成...")
+                self._record(tag, time.perf_counter() - attempt_start, usage, retried=True)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except LLMError:
+                self._record(tag, time.perf_counter() - attempt_start, usage, failed=True)
+                raise
+
+            latency = time.perf_counter() - start
+            self._record(tag, time.perf_counter() - attempt_start, usage)
+            if parser:
+                parser.finish()
+            return LLMResponse(prefix + "".join(received), usage, latency, None)
+
+    def _record(self, tag, latency, usage, failed=False, retried=False):
+        status = "retried" if retried else "failed" if failed else "ok"
+        metrics.observe("llm_latency_seconds", latency, tag=tag, status=status)
+        if usage:
+            metrics.incr("llm_tokens", usage.get("prompt_tokens", 0), tag=tag, kind="prompt")
+            metrics.incr("llm_tokens", usage.get("completion_tokens", 0), tag=tag, kind="completion")
+            # DeepSeek 的前缀缓存：输入中命中缓存的部分（见 common/prompts.py）
+            metrics.incr("llm_tokens", usage.get("prompt_cache_hit_tokens", 0), tag=tag, kind="cache_hit")
+            metrics.incr("llm_tokens", usage.get("prompt_cache_miss_tokens", 0), tag=tag, kind="cache_miss")
+        with self.stats_lock:
+            s = self.stats.setdefault(tag, {
+                "calls": 0, "failures": 0, "retries": 0, "latency": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cache_hit_tokens": 0, "cache_miss_tokens": 0,
+            })
+            if retried:
+                s["retries"] += 1
+                return
+            s["calls"] += 1
+            s["latency"] += latency
+            if failed:
+                s["failures"] += 1
+            if usage:
+                s["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                s["completion_tokens"] += usage.get("completion_tokens", 0)
+                s["cache_hit_tokens"] += usage.get("prompt_cache_hit_tokens", 0)
+                s["cache_miss_tokens"] += usage.get("prompt_cache_miss_tokens", 0)
+
+    def format_stats(self):
+        lines = ["📈 LLM 调用统计:"]
+        with self.stats_lock:
+            for tag, s in sorted(self.stats.items()):
+                avg = s["latency"] / s["calls"] if s["calls"] else 0
+                cached = s["cache_hit_tokens"] + s["cache_miss_tokens"]
+                cache = f", 缓存命中 {s['cache_hit_tokens'] / cached:.0%}" if cached else ""
+                lines.append(
+                    f"   {tag}: {s['calls']} 次 (失败 {s['failures']}, 重试 {s['retries']}), "
+                    f"平均 {avg:.2f} 秒, tokens 输入 {s['prompt_tokens']} / 输出 {s['completion_tokens']}{cache}"
+                )
+        return "\n".join(lines)
+
+
+CONTINUE_PROMPT = "输出在上面中断了。请从中断处直接继续输出剩余内容，不要重复已经输出的部分，也不要添加任何说明。"
+
+
+def _continue_messages(messages, prefix):
+    """已有部分输出时，把它作为 assistant 消息放回对话，让模型接着写"""
+    if not prefix:
+        return list(messages)
+    return list(messages) + [
+        {"role": "assistant", "content": prefix},
+        {"role": "user", "content": CONTINUE_PROMPT},
+    ]
+
+
+def _backoff(attempt, cap=30.0):
+    """指数退避 + 全抖动"""
+    return random.uniform(0, min(cap, config.LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def create_gateway(session, backend_name=None, **options):
+    """options 原样传给 LLMGateway（例如后台任务使用更低的 rate_per_sec）"""
+    name = backend_name or config.LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 LLM 后端: {name} (可选: {', '.join(BACKENDS)})")
+    return LLMGateway(BACKENDS[name](session), **options)
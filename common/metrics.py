@@ -0,0 +1,271 @@
+"""
+运行指标
+
+各阶段在 metrics.stage(...) 中运行，期间记录的耗时（span）、计数（counter）和数值（value）
+在阶段结束时写出：
+    jsonl       追加到 METRICS_DIR/metrics.jsonl，每个事件一行，供 report 命令统计趋势
+    prometheus  覆盖写入 METRICS_DIR/daily_japanese_<阶段>.prom（node_exporter textfile 格式）
+    both / off
+
+只有在阶段之内的记录才会保留，数据库命令行等交互工具不会积累事件。
+
+用法:
+    python -m common.metrics report [--days 14]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import datetime
+import threading
+from contextlib import contextmanager
+
+# 允许直接运行本脚本时导入项目根目录下的 common 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common import profiling
+from common.config import METRICS_FORMAT, METRICS_DIR
+
+JSONL_NAME = "metrics.jsonl"
+PROM_PREFIX = "daily_japanese"
+
+_lock = threading.Lock()
+_events = []
+_totals = {}            # (阶段, 类型, 名称, 标签) -> [总和, 次数]，用于 Prometheus
+_current_stage = None
+
+
+def enabled():
+    return METRICS_FORMAT != "off" and _current_stage is not None
+
+
+def _record(kind, name, value, labels):
+    if not enabled():
+        return
+    event = {
+        "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+        "date": datetime.date.today().isoformat(),
+        "stage": _current_stage,
+        "kind": kind,
+        "name": name,
+        "value": value,
+        "labels": labels,
+    }
+    key = (_current_stage, kind, name, tuple(sorted(labels.items())))
+    with _lock:
+        _events.append(event)
+        total = _totals.setdefault(key, [0.0, 0])
+        total[0] += value
+        total[1] += 1
+
+
+def incr(name, value=1, **labels):
+    """计数，例如 token 数、失败次数"""
+    _record("counter", name, value, labels)
+
+
+def observe(name, value, **labels):
+    """记录一个数值，例如邮件大小、转写的实时率"""
+    _record("value", name, value, labels)
+
+
+@contextmanager
+def span(name, **labels):
+    """记录一段代码的耗时（秒）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record("span", name, time.perf_counter() - start, labels)
+
+
+def timed(name, **labels):
+    """函数装饰器版本的 span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage(name):
+    """
+    在阶段内运行（也可作为 main() 的装饰器）。阶段结束时写出指标；
+    设置了 PROFILE 时同时剖析整个阶段（见 common/profiling.py）。
+    嵌套调用时（流水线中运行各模块的 main）只有最外层生效。
+    """
+    global _current_stage
+    if _current_stage is not None:
+        yield
+        return
+
+    _current_stage = name
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        with profiling.profiled(name):
+            yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _record("span", "stage", time.perf_counter() - start, {"status": status})
+        try:
+            flush()
+        except OSError as e:
+            print(f"⚠️ 指标写入失败: {e}")
+        _current_stage = None
+
+
+def flush():
+    with _lock:
+        events = list(_events)
+        _events.clear()
+        totals = dict(_totals)
+    if not events or METRICS_FORMAT == "off":
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    if METRICS_FORMAT in ("jsonl", "both"):
+        with open(os.path.join(METRICS_DIR, JSONL_NAME), "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+    if METRICS_FORMAT in ("prometheus", "both"):
+        for stage_name in {e["stage"] for e in events}:
+            write_prometheus(stage_name, {k: v for k, v in totals.items() if k[0] == stage_name})
+
+
+def _prom_labels(stage_name, labels):
+    items = [("stage", stage_name), *labels]
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def write_prometheus(stage_name, totals):
+    """按阶段覆盖写入 textfile；先写临时文件再改名，避免采集到写了一半的文件"""
+    lines = []
+    for (_, kind, name, labels), (total, count) in sorted(totals.items()):
+        base = f"{PROM_PREFIX}_{name}"
+        label_str = _prom_labels(stage_name, labels)
+        if kind == "counter":
+            lines.append(f"{base}_total{label_str} {total}")
+        else:
+            suffix = "_seconds" if kind == "span" else ""
+            lines.append(f"{base}{suffix}_sum{label_str} {total}")
+            lines.append(f"{base}{suffix}_count{label_str} {count}")
+    lines.append(f"{PROM_PREFIX}_last_run_timestamp_seconds{_prom_labels(stage_name, ())} {time.time():.0f}")
+
+    path = os.path.join(METRICS_DIR, f"{PROM_PREFIX}_{stage_name}.prom")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+# ---------- 报表 ----------
+
+def load_events(path=None, days=None):
+    path = path or os.path.join(METRICS_DIR, JSONL_NAME)
+    if not os.path.exists(path):
+        return []
+    since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat() if days else ""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event.get("date", "") >= since:
+                events.append(event)
+    return events
+
+
+def summarize(events):
+    """按日期汇总：{日期: {指标: 值}}"""
+    days = {}
+    for e in events:
+        d = days.setdefault(e["date"], {
+            "stages": {}, "runtime": 0.0, "llm_calls": 0, "llm_latency": 0.0, "tokens_in": 0, "tokens_out": 0,
+            "cache_hit": 0, "cache_miss": 0,
+            "words": 0, "sqlite": 0.0, "smtp": 0.0, "mails": 0, "email_bytes": 0, "rtf": [],
+        })
+        name, value, labels = e["name"], e["value"], e.get("labels") or {}
+        if e["kind"] == "span" and name == "stage":
+            d["stages"][e["stage"]] = d["stages"].get(e["stage"], 0.0) + value
+            d["runtime"] += value
+        elif name == "llm_latency_seconds":
+            d["llm_calls"] += 1
+            d["llm_latency"] += value
+        elif name == "llm_tokens":
+            kind = labels.get("kind")
+            key = {"prompt": "tokens_in", "completion": "tokens_out"}.get(kind, kind)
+            if key in d:
+                d[key] += value
+        elif name == "vocab_words":
+            d["words"] += value
+        elif name == "sqlite_query":
+            d["sqlite"] += value
+        elif name == "smtp_send":
+            d["smtp"] += value
+            d["mails"] += 1
+        elif name == "email_bytes":
+            d["email_bytes"] += value
+        elif name == "whisper_rtf":
+            d["rtf"].append(value)
+    return days
+
+
+def print_report(days):
+    if not days:
+        print("还没有指标数据（METRICS_FORMAT 为 jsonl 或 both 时才会记录）。")
+        return
+
+    print("📊 每日运行指标")
+    print(f"{'日期':<11} {'总耗时':>8} {'LLM次数':>8} {'平均延迟':>8} {'输入tok':>9} {'输出tok':>9} "
+          f"{'tok/词':>7} {'缓存':>5} {'SQLite':>7} {'SMTP':>6} {'邮件KB':>7} {'RTF':>5}")
+    for date in sorted(days):
+        d = days[date]
+        avg_latency = d["llm_latency"] / d["llm_calls"] if d["llm_calls"] else 0
+        per_word = (d["tokens_in"] + d["tokens_out"]) / d["words"] if d["words"] else 0
+        rtf = f"{sum(d['rtf']) / len(d['rtf']):.2f}" if d["rtf"] else "-"
+        cached = d["cache_hit"] + d["cache_miss"]
+        hit_rate = f"{d['cache_hit'] / cached:.0%}" if cached else "-"
+        print(f"{date:<11} {d['runtime']:>7.1f}s {d['llm_calls']:>8} {avg_latency:>7.2f}s {d['tokens_in']:>9.0f} "
+              f"{d['tokens_out']:>9.0f} {per_word:>7.0f} {hit_rate:>5} {d['sqlite']:>6.2f}s {d['smtp']:>5.1f}s "
+              f"{d['email_bytes'] / 1024:>7.1f} {rtf:>5}")
+
+    latest = days[max(days)]
+    print(f"\n⏱️ 最近一次 ({max(days)}) 各阶段耗时:")
+    for name, seconds in sorted(latest["stages"].items(), key=lambda kv: -kv[1]):
+        share = seconds / latest["runtime"] if latest["runtime"] else 0
+        print(f"   {name:<16} {seconds:>7.1f}s  {share:>4.0%}")
+
+    previous = [days[date] for date in sorted(days)[:-1]]
+    if previous:
+        print(f"\n📈 与之前 {len(previous)} 天的平均值相比:")
+        for label, key in [("总耗时", "runtime"), ("LLM 次数", "llm_calls"), ("输入 tokens", "tokens_in"),
+                           ("输出 tokens", "tokens_out"), ("邮件大小", "email_bytes")]:
+            mean = sum(d[key] for d in previous) / len(previous)
+            change = f"{(latest[key] - mean) / mean:+.0%}" if mean else "-"
+            print(f"   {label:<10} {latest[key]:>10.1f}  (平均 {mean:.1f}, {change})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="运行指标报表")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_report = sub.add_parser("report", help="按日期汇总指标趋势")
+    p_report.add_argument("--days", type=int, default=14, help="统计最近几天（默认 14）")
+    p_report.add_argument("--file", help=f"指标文件（默认 {os.path.join(METRICS_DIR, JSONL_NAME)}）")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        print_report(summarize(load_events(args.file, args.days)))
+
+
+if __name__ == "__main__":
+    main()
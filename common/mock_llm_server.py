@@ -0,0 +1,277 @@
+"""
+本地 OpenAI 兼容 mock 服务（离线测试用）
+
+根据请求内容返回固定格式的结果：
+- 要求 JSON 输出 → 单词详情 JSON
+- 包含 [SUMMARY] 标记 → 听力整理格式
+- 其他 → 阅读 HTML
+
+可以配置固定延迟和失败率（随机返回 503，随机数种子固定，结果可复现）。
+请求 stream=true 时按 SSE 分块返回，可以设置每块之间的间隔和中途断开连接的概率；
+续写请求（对话末尾是已输出的部分 + 继续的指令）只返回剩余的部分。
+可以设置返回有小毛病的输出（代码块标记、多余的逗号、缺字段 / 段落、截断）的概率，
+补问（对话末尾是原回复 + 只要部分内容的追问）只返回要求的部分。
+usage 中模拟前缀缓存的命中 / 未命中 token 数（与之前请求相同的开头部分算命中）。
+
+用法:
+    python -m common.mock_llm_server --port 8765 --latency 0.2 --failure-rate 0.05
+    然后设置 DEEPSEEK_BASE_URL=http://127.0.0.1:8765
+"""
+import re
+import json
+import time
+import hashlib
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# DeepSeek 的缓存单位约为 64 token（按 1 token ≈ 2 字估算）
+CACHE_BLOCK_CHARS = 128
+
+
+def _estimate_tokens(text):
+    # 粗略估计：中日文约 1 字 1 token，英文约 4 字符 1 token
+    return max(1, len(text) // 2)
+
+
+def _prompt_text(payload):
+    # 缓存按完整的消息序列计算（角色不同，内容相同也不算同一个前缀）
+    return "".join(f"<{m.get('role', '')}>{m.get('content', '')}" for m in payload.get("messages", []))
+
+
+def _usage(server, prompt_text, content):
+    """
+    模拟 DeepSeek 的前缀缓存：按 CACHE_BLOCK_CHARS 分块，与之前请求相同的最长前缀算作命中，
+    usage 中返回 prompt_cache_hit_tokens / prompt_cache_miss_tokens
+    """
+    prompt_tokens = _estimate_tokens(prompt_text)
+    # 每个完整块结束时前缀的哈希（只保存哈希，不保存前缀本身）
+    digest = hashlib.sha256()
+    blocks = []
+    for end in range(CACHE_BLOCK_CHARS, len(prompt_text) + 1, CACHE_BLOCK_CHARS):
+        digest.update(prompt_text[end - CACHE_BLOCK_CHARS:end].encode("utf-8"))
+        blocks.append(digest.copy().digest())
+    hit_chars = 0
+    with server.lock:
+        for block in blocks:
+            if block not in server.prefix_cache:
+                break
+            hit_chars += CACHE_BLOCK_CHARS
+        server.prefix_cache.update(blocks)
+    hit_tokens = min(prompt_tokens, hit_chars // 2)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": _estimate_tokens(content),
+        "total_tokens": prompt_tokens + _estimate_tokens(content),
+        "prompt_cache_hit_tokens": hit_tokens,
+        "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+    }
+
+
+def _fake_word_details(word, with_reading=False, with_examples=True, untranslated=()):
+    # 与真实 prompt 一致：例句库中已有例句时只返回释义，要求时才返回读音和例句翻译
+    details = {"reading": word} if with_reading else {}
+    if untranslated:
+        details["translations"] = [f"（译）{jp}" for jp in untranslated]
+    meaning = {"meaning": f"{word}的释义"}
+    if with_examples:
+        meaning.update(example_jp=f"これは{word}です。", example_cn=f"这是{word}。")
+    details["meanings"] = [meaning]
+    return details
+
+
+MOCK_SECTIONS = {
+    "[SUMMARY]": "模拟听力摘要",
+    "[JAPANESE]": "これはテストです。\n\n今日はいい天気です。",
+    "[TRANSLATION]": "这是测试。\n\n今天天气很好。",
+}
+MOCK_ARTICLE_PARTS = {
+    "中文翻译": "<section><h3>📖 中文翻译</h3><p>这是模拟文章。</p></section>",
+    "模拟试题": "<section><h2>📝 模拟试题</h2><h4>問題1：テスト</h4></section>",
+    "核心词汇": "<section><h2>📚 核心词汇</h2><table><tr><td>記事</td><td>きじ</td><td>文章</td></tr></table></section>",
+    "核心语法": "<section><h2>📖 核心语法</h2><h4>1. ～について</h4></section>",
+}
+
+
+def build_reply(payload):
+    """根据请求内容生成确定性的回复文本"""
+    messages = payload.get("messages", [])
+    if len(messages) >= 2 and messages[-2].get("role") == "assistant":
+        original = {**payload, "messages": messages[:-2]}
+        ask = messages[-1].get("content", "")
+        if "中断" not in ask:
+            return _reask_reply(original, ask)
+        # 续写：按原始对话生成完整回复，返回已输出部分之后的内容
+        full = build_reply(original)
+        done = messages[-2].get("content", "")
+        return full[len(done):] if full.startswith(done) else full
+    prompt = "\n".join(m.get("content", "") for m in messages)
+
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        match = re.search(r"^- 单词: (.+)$", prompt, re.MULTILINE) or re.search(r"「(.+?)」", prompt)
+        word = match.group(1) if match else "単語"
+        match = re.search(r"^- 任务: (.+)$", prompt, re.MULTILINE)
+        tasks = match.group(1).split("、") if match else ["释义", "例句"]
+        details = _fake_word_details(
+            word, "读音" in tasks, "例句" in tasks, re.findall(r"^例句\d+: (.+)$", prompt, re.MULTILINE),
+        )
+        return json.dumps(details, ensure_ascii=False)
+
+    if "[SUMMARY]" in prompt:
+        return "\n".join(f"{marker}\n{text}" for marker, text in MOCK_SECTIONS.items())
+
+    return (
+        "<!DOCTYPE html>\n<html lang=\"ja\">\n<head><meta charset=\"UTF-8\"><title>mock</title></head>\n"
+        "<body><h1>テスト記事</h1><main><article><p>これはモックの記事です。</p></article></main>\n"
+        + "\n".join(MOCK_ARTICLE_PARTS.values()) + "\n<footer>mock</footer></body>\n</html>"
+    )
+
+
+def _reask_reply(original, ask):
+    """补问（见 common/validate.py）：只返回要求的字段 / 段落 / HTML 部分"""
+    match = re.search(r"请只返回包含以下字段的 JSON 对象：(.+?)。", ask)
+    if match:
+        full = json.loads(build_reply(original))
+        return json.dumps({name: full[name] for name in match.group(1).split("、") if name in full}, ensure_ascii=False)
+    match = re.search(r"请只输出缺少的部分的 HTML：(.+?)。", ask)
+    if match:
+        return "\n".join(MOCK_ARTICLE_PARTS.get(name, "") for name in match.group(1).split("、"))
+    match = re.search(r"请只输出缺少的部分：(.+?)，", ask)
+    if match:
+        return "\n".join(f"{m}\n{MOCK_SECTIONS[m]}" for m in match.group(1).split("、") if m in MOCK_SECTIONS)
+    return build_reply(original)
+
+
+def malform(payload, content):
+    """
+    模拟有小毛病的输出（本地修复和补问的测试用）：
+    JSON 加代码块标记和多余的逗号并缺一个字段，分段文本的标记写法不标准并缺少翻译，HTML 缺少一部分并被截断
+    """
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        data = json.loads(content)
+        last = data["meanings"][-1]
+        last.pop("example_cn", None) or data.pop("reading", None) or data.pop("translations", None)
+        text = json.dumps(data, ensure_ascii=False, indent=4)
+        return "```json\n" + text[:text.rindex("]")].rstrip() + ",\n    ]\n}\n```"
+    if content.startswith("[SUMMARY]"):
+        return content.replace("[SUMMARY]", "**【摘要】**").split("[TRANSLATION]")[0]
+    if content.startswith("<!DOCTYPE html>"):
+        return content.replace(MOCK_ARTICLE_PARTS["核心语法"], "").split("<footer>")[0]
+    return content
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        with self.server.lock:
+            self.server.request_count += 1
+            failed = self.server.rng.random() < self.server.failure_rate
+        if failed:
+            self._send_json(503, {"error": {"message": "mock overloaded"}})
+            return
+
+        content = build_reply(payload)
+        messages = payload.get("messages", [])
+        if self.server.malformed_rate and not (len(messages) >= 2 and messages[-2].get("role") == "assistant"):
+            with self.server.lock:
+                malformed = self.server.rng.random() < self.server.malformed_rate
+            if malformed:
+                content = malform(payload, content)
+        usage = _usage(self.server, _prompt_text(payload), content)
+        if payload.get("stream"):
+            self._send_stream(payload, content, usage)
+            return
+        body = {
+            "id": "mock-1",
+            "object": "chat.completion",
+            "model": payload.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+        self._send_json(200, body)
+
+    def _send_stream(self, payload, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk_size = 20
+        with self.server.lock:
+            cut_at = len(content) // 2 if self.server.rng.random() < self.server.stream_cut_rate else None
+        for i in range(0, len(content), chunk_size):
+            if cut_at is not None and i >= cut_at:
+                # 模拟连接中途断开
+                self.close_connection = True
+                return
+            event = {"choices": [{"index": 0, "delta": {"content": content[i:i + chunk_size]}}]}
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_mock_server(host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, seed=0,
+                       chunk_delay=0.0, stream_cut_rate=0.0, malformed_rate=0.0):
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.chunk_delay = chunk_delay
+    server.stream_cut_rate = stream_cut_rate
+    server.malformed_rate = malformed_rate
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.prefix_cache = set()
+    return server
+
+
+def start_mock_server(host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, seed=0,
+                      chunk_delay=0.0, stream_cut_rate=0.0, malformed_rate=0.0):
+    """在后台线程启动 mock 服务，返回 (server, base_url)"""
+    server = create_mock_server(host, port, latency, failure_rate, seed, chunk_delay, stream_cut_rate, malformed_rate)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容 mock 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="每次请求的模拟延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="返回 503 的概率 (0~1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="流式输出每块之间的间隔（秒）")
+    parser.add_argument("--stream-cut-rate", type=float, default=0.0, help="流式输出中途断开的概率 (0~1)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回有小毛病的输出的概率 (0~1)")
+    args = parser.parse_args()
+
+    server = create_mock_server(args.host, args.port, args.latency, args.failure_rate, args.seed,
+                                args.chunk_delay, args.stream_cut_rate, args.malformed_rate)
+    print(f"🧪 mock LLM 服务已启动: http://{args.host}:{args.port}")
+    server.serve_forever()
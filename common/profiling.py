@@ -0,0 +1,164 @@
+"""
+性能剖析（按需开启）
+
+设置环境变量 PROFILE 后，每个阶段（metrics.stage）运行时会被剖析，结果写入 PROFILE_DIR：
+    cpu     cProfile           <日期>_<阶段>.prof（snakeviz / pstats 可读）
+    sample  采样剖析器          <日期>_<阶段>.folded（火焰图折叠格式，flamegraph.pl / speedscope 可读）
+    mem     tracemalloc        阶段前后快照的差异
+多个用逗号分隔，PROFILE=1 或 all 表示全部开启。每个阶段还会生成 <日期>_<阶段>_summary.txt（各项前 N 名）。
+
+未设置 PROFILE 时 profiled() 直接返回，没有额外开销。
+"""
+import io
+import os
+import sys
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+
+from common.config import PROFILE, PROFILE_DIR, PROFILE_TOP_N, PROFILE_SAMPLE_INTERVAL
+
+MODES = ("cpu", "sample", "mem")
+
+
+def enabled_modes(spec=PROFILE):
+    spec = (spec or "").strip().lower()
+    if not spec or spec in ("0", "off", "false"):
+        return ()
+    if spec in ("1", "all", "true"):
+        return MODES
+    return tuple(m.strip() for m in spec.split(",") if m.strip() in MODES)
+
+
+class StackSampler:
+    """
+    后台线程定期读取所有线程的调用栈，按折叠格式（"a;b;c 次数"）计数。
+    只读取栈帧，不修改解释器状态，开销与采样间隔成正比。
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, n):
+        """按“自身”（栈顶）采样次数排序的函数"""
+        leaf = {}
+        for stack, count in self.counts.items():
+            name = stack.rsplit(";", 1)[-1]
+            leaf[name] = leaf.get(name, 0) + count
+        return sorted(leaf.items(), key=lambda kv: -kv[1])[:n]
+
+
+@contextmanager
+def profiled(stage):
+    modes = enabled_modes()
+    if not modes:
+        yield
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prefix = os.path.join(PROFILE_DIR, f"{datetime.date.today().isoformat()}_{stage}")
+
+    profiler = sampler = snapshot_before = None
+    if "mem" in modes:
+        import tracemalloc
+        tracemalloc.start(25)
+        snapshot_before = tracemalloc.take_snapshot()
+    if "sample" in modes:
+        sampler = StackSampler()
+        sampler.start()
+    if "cpu" in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+        if sampler is not None:
+            sampler.stop()
+        try:
+            write_reports(prefix, stage, elapsed, profiler, sampler, snapshot_before)
+        except OSError as e:
+            print(f"⚠️ 剖析结果写入失败: {e}")
+
+
+def write_reports(prefix, stage, elapsed, profiler, sampler, snapshot_before):
+    # 先取内存快照，避免把下面生成报告时的内存分配也算进去
+    if snapshot_before is not None:
+        import tracemalloc
+        snapshot_after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory_top = snapshot_after.compare_to(snapshot_before, "lineno")[:PROFILE_TOP_N]
+
+    summary = io.StringIO()
+    summary.write(f"阶段: {stage}  耗时: {elapsed:.2f} 秒\n")
+    written = []
+
+    if profiler is not None:
+        import pstats
+        profiler.dump_stats(prefix + ".prof")
+        written.append(prefix + ".prof")
+        for sort_key in ("cumulative", "tottime"):
+            summary.write(f"\n===== cProfile 前 {PROFILE_TOP_N} 名 (按 {sort_key}) =====\n")
+            pstats.Stats(profiler, stream=summary).strip_dirs().sort_stats(sort_key).print_stats(PROFILE_TOP_N)
+
+    if sampler is not None:
+        sampler.write_folded(prefix + ".folded")
+        written.append(prefix + ".folded")
+        summary.write(f"\n===== 采样剖析前 {PROFILE_TOP_N} 名 (栈顶函数, 共 {sampler.samples} 次采样, "
+                      f"间隔 {sampler.interval * 1000:.0f}ms) =====\n")
+        total = sum(sampler.counts.values()) or 1
+        for name, count in sampler.top_functions(PROFILE_TOP_N):
+            summary.write(f"{count / total:>6.1%}  {count:>6}  {name}\n")
+
+    if snapshot_before is not None:
+        summary.write(f"\n===== tracemalloc 前 {PROFILE_TOP_N} 名 (当前 {current / 1e6:.1f}MB, 峰值 {peak / 1e6:.1f}MB) =====\n")
+        for stat in memory_top:
+            summary.write(f"{stat}\n")
+
+    summary_path = prefix + "_summary.txt"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+    written.append(summary_path)
+    print(f"🔬 剖析结果已写入: {', '.join(written)}")
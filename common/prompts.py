@@ -0,0 +1,26 @@
+"""
+Prompt 布局（配合服务端的前缀缓存）
+
+DeepSeek 会缓存请求开头与之前请求完全相同的部分（按 64 token 为单位），命中的输入 token
+计费约为十分之一，首字延迟也更短。只有“从第一个字节起都相同”的部分才能命中，
+所以每个 prompt 都分成两部分：
+    - 固定部分：角色、任务说明、输出格式 / JSON 结构 / HTML 模板，放在 system 消息中，
+      不插入任何变量（单词、话题、日期、JLPT 等级……），每次调用逐字节相同
+    - 变化部分：本次的参数和输入，作为最后的 user 消息
+
+命中情况记录在响应的 usage.prompt_cache_hit_tokens / prompt_cache_miss_tokens 中，
+由 LLMGateway 统计（见 common/llm.py），本地 mock 服务也会模拟（见 common/mock_llm_server.py）。
+"""
+
+
+def cached_messages(static, variable):
+    """固定部分作为 system 消息放在最前面，变化部分作为 user 消息放在最后"""
+    return [
+        {"role": "system", "content": static.strip()},
+        {"role": "user", "content": variable.strip()},
+    ]
+
+
+def fields(values):
+    """变化部分中的参数 {名称: 值}，每项一行：【本次参数】\\n- 名称: 值"""
+    return "【本次参数】\n" + "\n".join(f"- {name}: {value}" for name, value in values.items())
@@ -0,0 +1,75 @@
+"""
+流式输出的分段解析
+
+LLM 流式返回时，SectionParser 随着文本到达识别段落边界，记录“已完整的部分”：
+    - 开始标记（例如 [SUMMARY] / [JAPANESE] / [TRANSLATION]）：出现下一个标记时，上一段完整
+    - 结束标记（例如 </section>）：标记本身出现时，这一段完整
+每当完整部分变长就调用 on_checkpoint(完整文本)，调用方把它写入运行日志；
+中断后从完整部分继续生成，只需重新生成缺失的尾部。
+"""
+
+
+class SectionParser:
+    def __init__(self, start_markers=(), end_markers=(), on_checkpoint=None, text=""):
+        self.start_markers = tuple(start_markers)
+        self.end_markers = tuple(end_markers)
+        self.on_checkpoint = on_checkpoint
+        self.buffer = ""
+        self.committed = 0      # buffer[:committed] 是已完整的部分
+        self._scanned = 0       # 已经检查过的位置（标记可能跨越两次到达的文本）
+        if text:
+            # 从断点恢复：之前保存的文本都是完整的段落
+            self.buffer = text
+            self.committed = self._scanned = len(text)
+
+    @property
+    def complete_text(self):
+        return self.buffer[:self.committed]
+
+    def feed(self, delta):
+        self.buffer += delta
+        longest = max(map(len, self.start_markers + self.end_markers), default=0)
+        start = max(self.committed, self._scanned - longest + 1)
+        boundary = self._last_boundary(start)
+        self._scanned = len(self.buffer)
+        if boundary > self.committed:
+            self.committed = boundary
+            if self.on_checkpoint:
+                self.on_checkpoint(self.complete_text)
+
+    def _last_boundary(self, start):
+        boundary = self.committed
+        for marker in self.start_markers:
+            # 开始标记之前的内容完整（第一个标记之前没有内容，不算边界）
+            pos = self.buffer.rfind(marker, start)
+            if pos > 0:
+                boundary = max(boundary, pos)
+        for marker in self.end_markers:
+            pos = self.buffer.rfind(marker, start)
+            if pos >= 0:
+                boundary = max(boundary, pos + len(marker))
+        return boundary
+
+    def rewind(self):
+        """丢弃不完整的尾部，返回完整部分（重试时从这里继续生成）"""
+        self.buffer = self.complete_text
+        self._scanned = len(self.buffer)
+        return self.buffer
+
+    def finish(self):
+        """生成正常结束：全部文本都是完整的"""
+        if self.committed < len(self.buffer):
+            self.committed = self._scanned = len(self.buffer)
+            if self.on_checkpoint:
+                self.on_checkpoint(self.buffer)
+        return self.buffer
+
+
+def split_sections(text, markers):
+    """按开始标记切分，返回 {标记: 内容}；缺失的标记不出现在结果中"""
+    positions = sorted((text.find(m), m) for m in markers if text.find(m) >= 0)
+    sections = {}
+    for i, (pos, marker) in enumerate(positions):
+        end = positions[i + 1][0] if i + 1 < len(positions) else len(text)
+        sections[marker] = text[pos + len(marker):end].strip()
+    return sections
@@ -0,0 +1,29 @@
+"""
+HTML / 纯文本中的日语正文
+
+阅读文章、听力转写在收词（vocab/harvest.py）和归档（common/archive.py）时都只需要日语部分：
+去掉标签、样式，只保留含假名的行（中文翻译、英文不含假名）。
+"""
+import re
+import html
+
+_TAG = re.compile(r"<[^>]+>")
+_SKIP_BLOCKS = re.compile(r"<(style|script|head)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+_BLOCK_END = re.compile(r"<br\s*/?>|</(?:p|div|li|td|tr|h\d)>", re.IGNORECASE)
+_KANA = re.compile(r"[぀-ヿ]")
+_KANA_ONLY = re.compile(r"^[぀-ヿ]+$")
+
+
+def html_to_text(content):
+    """去掉标签和样式，块级元素之间换行"""
+    content = _SKIP_BLOCKS.sub("", content)
+    return html.unescape(_TAG.sub("", _BLOCK_END.sub("\n", content)))
+
+
+def japanese_text(content):
+    """
+    HTML 或纯文本 -> 只保留含假名的行（文章中的中文翻译、英文不参与分词）。
+    只有假名的短行是词汇表中的读音列，单独分词只会得到碎片，也去掉。
+    """
+    lines = (line.strip() for line in html_to_text(content).splitlines())
+    return "\n".join(line for line in lines if _KANA.search(line) and not _KANA_ONLY.match(line))
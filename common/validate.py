@@ -0,0 +1,290 @@
+"""
+LLM 输出的校验、本地修复和补问
+
+付费生成的结果有小毛病时不整段丢弃，也不整段重新生成：
+    1. 本地修复：去掉 markdown 代码块标记、多余的逗号，补全被截断的 JSON / HTML，统一写法不标准的段落标记
+    2. 按声明的结构校验（JSON 字段 / 文本段落 / HTML 部分）
+    3. 仍然缺失或不合格的部分用一个很短的追问只要这些部分（补问），合并回原结果
+补问把原来的回复作为 assistant 消息接在原对话后面，前缀与原请求相同，可以命中前缀缓存。
+
+JSON 结构用 text() / array() / obj() 声明，例如:
+    obj({"meanings": array(obj({"meaning": text()})), "reading": text()})
+"""
+import re
+import json
+
+from common import config, metrics
+
+_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+
+
+def strip_fences(text):
+    """去掉整段回复外层的 ```json / ```html 代码块标记"""
+    return _FENCE.sub("", text.strip())
+
+
+# ---------- JSON ----------
+
+def loads_tolerant(text):
+    """
+    解析 JSON，返回 (数据, 是否经过修复)。
+    修复: 代码块标记、前后多余的文字、对象 / 数组末尾多余的逗号、字符串中的换行、
+    被截断的输出（丢掉最后一个不完整的元素后补全括号）。无法修复时抛出 ValueError。
+    """
+    text = strip_fences(text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("回复中没有 JSON")
+    text = text[min(starts):]
+    try:
+        return json.loads(text, strict=False), False
+    except ValueError:
+        pass
+
+    out = []
+    levels = []   # 每层: {"closer": 右括号, "start": 最后一个元素开始的位置, "colon": 是否已有冒号, "complete": 最后一个元素是否完整}
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                level = levels[-1]
+                # 数组中的字符串是完整的元素；对象中冒号之后的字符串才是完整的值（之前的是键）
+                level["complete"] = level["closer"] == "]" or level["colon"]
+            continue
+        if ch.isspace():
+            out.append(ch)
+        elif ch == '"' and levels:
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            out.append(ch)
+            levels.append({"closer": "}" if ch == "{" else "]", "start": len(out), "colon": False, "complete": False})
+        elif ch in "}]":
+            if not levels or levels[-1]["closer"] != ch:
+                continue    # 多余或不匹配的右括号
+            _strip_trailing_comma(out)
+            out.append(levels.pop()["closer"])
+            if not levels:
+                break       # 顶层已经结束，后面的文字不要
+            levels[-1]["complete"] = True
+        elif ch == ",":
+            levels[-1].update(start=len(out), colon=False, complete=False)
+            out.append(ch)
+        else:
+            if ch == ":":
+                levels[-1]["colon"] = True
+            # 数字、true 等被截断时无法判断是否完整，当作不完整
+            levels[-1]["complete"] = False
+            out.append(ch)
+
+    if levels:
+        # 被截断：最内层最后一个元素不完整时整个丢掉，再补全所有括号
+        if in_string or not levels[-1]["complete"]:
+            del out[levels[-1]["start"]:]
+        while levels:
+            _strip_trailing_comma(out)
+            out.append(levels.pop()["closer"])
+    try:
+        return json.loads("".join(out), strict=False), True
+    except ValueError as e:
+        raise ValueError(f"JSON 无法修复: {e}") from e
+
+
+def _strip_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def text():
+    """非空字符串"""
+    return {"type": "str"}
+
+
+def array(items, min_items=1, length=None):
+    """列表：至少 min_items 项；指定 length 时必须正好这么多项"""
+    return {"type": "list", "items": items, "min": min_items, "length": length}
+
+
+def obj(fields):
+    return {"type": "object", "fields": fields}
+
+
+def check(value, spec):
+    """返回问题描述，合格时返回 None"""
+    if value is None:
+        return "缺失"
+    kind = spec["type"]
+    if kind == "str":
+        return None if isinstance(value, str) and value.strip() else "应为非空字符串"
+    if kind == "list":
+        if not isinstance(value, list):
+            return "应为列表"
+        if spec["length"] is not None and len(value) != spec["length"]:
+            return f"应有 {spec['length']} 项，实际 {len(value)} 项"
+        if len(value) < spec["min"]:
+            return f"至少应有 {spec['min']} 项"
+        for i, item in enumerate(value, 1):
+            problem = check(item, spec["items"])
+            if problem:
+                return f"第 {i} 项: {problem}"
+        return None
+    if not isinstance(value, dict):
+        return "应为 JSON 对象"
+    problems = check_fields(value, spec)
+    return "；".join(f"{name} {problem}" for name, problem in problems.items()) or None
+
+
+def check_fields(data, schema):
+    """逐个检查对象的字段，返回 {字段: 问题}"""
+    return {
+        name: problem for name, spec in schema["fields"].items()
+        if (problem := check(data.get(name), spec))
+    }
+
+
+def chat_json(llm, messages, schema, tag, temperature=1.0, max_reasks=None):
+    """
+    请求 JSON 输出并校验，返回 (数据, {仍有问题的字段: 问题})。
+    顶层字段有问题时补问，只要这些字段；第一次请求失败时抛出 LLMError。
+    """
+    max_reasks = config.LLM_REASK_MAX if max_reasks is None else max_reasks
+    response = llm.chat(messages, response_format={"type": "json_object"}, temperature=temperature, tag=tag)
+    data = _parse_json(response.content, tag)
+    problems = check_fields(data, schema)
+
+    for _ in range(max_reasks):
+        if not problems:
+            break
+        print(f"🩹 {tag}: 补问字段 {'、'.join(problems)}")
+        metrics.incr("llm_repair", tag=tag, kind="reask")
+        prompt = (
+            "上面的 JSON 有以下问题：\n"
+            + "\n".join(f"- {name}: {problem}" for name, problem in problems.items())
+            + f"\n请只返回包含以下字段的 JSON 对象：{'、'.join(problems)}。"
+            "字段格式与之前的要求相同，不要包含其他字段，也不要包含 markdown 代码块标记。"
+        )
+        try:
+            fixed = _parse_json(
+                reask(llm, messages, response.content, prompt, tag, response_format={"type": "json_object"}), tag,
+            )
+        except Exception as e:
+            print(f"⚠️ {tag}: 补问失败: {e}")
+            break
+        data.update({name: fixed[name] for name in problems if name in fixed})
+        problems = check_fields(data, schema)
+    return data, problems
+
+
+def _parse_json(content, tag):
+    try:
+        data, repaired = loads_tolerant(content)
+    except ValueError as e:
+        print(f"⚠️ {tag}: {e}")
+        return {}
+    if repaired:
+        print(f"🩹 {tag}: 已在本地修复 JSON")
+        metrics.incr("llm_repair", tag=tag, kind="local")
+    return data if isinstance(data, dict) else {}
+
+
+def reask(llm, messages, previous, prompt, tag, **options):
+    """在原对话后追问（原回复作为 assistant 消息），返回新的回复文本"""
+    follow_up = list(messages) + [
+        {"role": "assistant", "content": previous},
+        {"role": "user", "content": prompt},
+    ]
+    return llm.chat(follow_up, temperature=0.3, tag=f"{tag}-reask", **options).content
+
+
+# ---------- 分段文本 ----------
+
+def normalize_markers(text, markers, aliases=None):
+    """
+    把写法不标准的段落标记改回标准写法并单独成行，例如
+    "**[Japanese]**"、"【JAPANESE】："、"[日语重写] 本文……" -> "[JAPANESE]\\n本文……"
+    aliases: {标准标记: [别名]}
+    """
+    aliases = aliases or {}
+    for marker in markers:
+        names = [marker.strip("[]")] + list(aliases.get(marker, []))
+        alternatives = "(?:" + "|".join(map(re.escape, names)) + ")"
+        # 带括号时后面可以直接接内容；不带括号时后面必须是冒号或行尾，避免误改以同一个词开头的正文
+        pattern = re.compile(
+            r"^[ \t#*]*(?:[\[【][ \t]*" + alternatives + r"[ \t]*[\]】][ \t*]*[:：]?|"
+            + alternatives + r"[ \t*]*(?:[:：]|$))[ \t]*",
+            re.IGNORECASE | re.MULTILINE,
+        )
+        text = pattern.sub(lambda m: marker + "\n", text)
+    return text
+
+
+def reask_sections(llm, messages, previous, sections, markers, tag):
+    """只要缺失的段落，合并后返回新的 {标记: 内容}"""
+    from common.sections import split_sections
+
+    missing = [m for m in markers if not sections.get(m)]
+    print(f"🩹 {tag}: 补问缺失的部分 {'、'.join(missing)}")
+    metrics.incr("llm_repair", tag=tag, kind="reask")
+    prompt = (
+        f"上面的输出缺少以下部分（或内容为空）：{'、'.join(missing)}。\n"
+        f"请只输出缺少的部分：{'、'.join(missing)}，每部分以对应的标记单独成一行开头，格式与之前的要求相同，不要输出其他部分。"
+    )
+    try:
+        fixed = split_sections(normalize_markers(reask(llm, messages, previous, prompt, tag), markers), markers)
+    except Exception as e:
+        print(f"⚠️ {tag}: 补问失败: {e}")
+        return sections
+    return {**sections, **{m: fixed[m] for m in missing if fixed.get(m)}}
+
+
+# ---------- HTML ----------
+
+_HTML_BLOCK_END = re.compile(r"</(?:section|article|main|header|footer)>", re.IGNORECASE)
+
+
+def repair_html(html):
+    """去掉代码块标记；被截断时只保留到最后一个完整的块，并补上 </body></html>"""
+    html = strip_fences(html)
+    if re.search(r"</html>\s*$", html, re.IGNORECASE):
+        return html
+    ends = list(_HTML_BLOCK_END.finditer(html))
+    if ends:
+        html = html[:ends[-1].end()]
+    return html + "\n</body>\n</html>"
+
+
+def missing_parts(html, parts):
+    """parts: [(名称, 正则)]，返回 HTML 中找不到的部分名称"""
+    return [name for name, pattern in parts if not re.search(pattern, html, re.IGNORECASE | re.DOTALL)]
+
+
+def reask_html(llm, messages, html, parts, tag):
+    """只要缺失部分的 HTML 片段，插入到页脚（或 </body>）之前"""
+    missing = missing_parts(html, parts)
+    if not missing:
+        return html
+    print(f"🩹 {tag}: 补问缺失的部分 {'、'.join(missing)}")
+    metrics.incr("llm_repair", tag=tag, kind="reask")
+    prompt = (
+        f"上面的 HTML 缺少以下部分：{'、'.join(missing)}。\n"
+        f"请只输出缺少的部分的 HTML：{'、'.join(missing)}。使用与模板相同的结构和样式，"
+        "只输出这些 <section>，不要输出完整页面，也不要输出其他说明。"
+    )
+    try:
+        fragment = strip_fences(reask(llm, messages, html, prompt, tag))
+    except Exception as e:
+        print(f"⚠️ {tag}: 补问失败: {e}")
+        return html
+    for anchor in ("<footer", "</body>"):
+        pos = html.lower().rfind(anchor)
+        if pos >= 0:
+            return html[:pos] + fragment + "\n    " + html[pos:]
+    return html + fragment
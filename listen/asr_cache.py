@@ -0,0 +1,162 @@
+"""
+转写结果缓存
+
+转写过的音频按内容记在 ASR_CACHE_PATH 中（发送后删除源文件也不影响），
+同一段材料再次放进 audio 文件夹时，在加载 Whisper 之前就能直接给出结果：
+
+1. 文件哈希     —— 同一个文件原样再放一次，不用解码
+2. 解码后 PCM 哈希 —— 只改了标签 / 封装的同一段音频
+3. 声学指纹     —— 重新编码（码率、格式不同）的同一段音频，相似度超过阈值时提示疑似重复；
+                   指纹不能证明是同一段音频，默认仍然转写（ASR_REUSE_NEAR_DUP=1 时直接使用旧结果，但不写入缓存）
+
+结果与模型名和转写参数绑定，换模型或改参数后不会误用旧结果。
+解码在 listen/preprocess.py 中完成，需要 ffmpeg（transformers 读取 MP3 本来就依赖它），
+没有 ffmpeg 时只使用文件哈希。
+"""
+import json
+import sqlite3
+import hashlib
+import datetime
+
+from common.config import ASR_CACHE_PATH, ASR_NEAR_DUP_THRESHOLD
+
+SAMPLE_RATE = 16000              # Whisper 的输入采样率
+WINDOW = 2048                    # 指纹的分析窗（128ms）
+HOP = 512                        # 帧移（32ms）；窗口大量重叠，重新编码带来的细小错位影响很小
+FRAME_SECONDS = HOP / SAMPLE_RATE
+BAND_EDGES_HZ = [300, 400, 530, 700, 930, 1230, 1630, 2170, 2880, 3800]   # 9 个对数间隔的频带
+N_BITS = len(BAND_EDGES_HZ) - 2  # 每帧 8 个比特
+MAX_SHIFT_FRAMES = 62            # 比较指纹时允许的前后错位（约 ±2 秒）
+DURATION_TOLERANCE = 0.05        # 时长相差超过 5% 的不做指纹比较
+
+
+# ---------- 解码与指纹 ----------
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pcm_hash(samples):
+    # 直接对数组的内存（memmap 时即文件映射）求哈希，不复制
+    return hashlib.sha256(memoryview(samples).cast("B")).hexdigest()
+
+
+def fingerprint(samples, chunk_frames=2048):
+    """
+    Haitsma-Kalker 式指纹：每帧 9 个频带的能量，比较相邻频带之差在相邻两帧间的变化，得到 8 个比特。
+    只依赖频谱的相对变化，对码率、音量、重新编码都不敏感。
+    分块计算 FFT，长音频的内存占用也是固定的。返回 (打包后的比特, 帧数)
+    """
+    import numpy as np
+
+    if len(samples) < WINDOW + HOP:
+        return b"", 0
+    frames = np.lib.stride_tricks.sliding_window_view(samples, WINDOW)[::HOP]
+    n_frames = len(frames)
+    window = np.hanning(WINDOW).astype(np.float32)
+    freqs = np.fft.rfftfreq(WINDOW, 1 / SAMPLE_RATE)
+    band_index = [np.flatnonzero((freqs >= lo) & (freqs < hi)) for lo, hi in zip(BAND_EDGES_HZ, BAND_EDGES_HZ[1:])]
+
+    energy = np.empty((n_frames, len(band_index)), dtype=np.float32)
+    for start in range(0, n_frames, chunk_frames):
+        spectrum = np.abs(np.fft.rfft(frames[start:start + chunk_frames] * window, axis=1)) ** 2
+        for band, idx in enumerate(band_index):
+            energy[start:start + chunk_frames, band] = spectrum[:, idx].sum(axis=1)
+    energy = np.log(energy + 1e-10)
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return np.packbits(bits).tobytes(), n_frames
+
+
+def similarity(fp_a, frames_a, fp_b, frames_b):
+    """两段指纹在最佳错位下相同比特的比例；重叠部分太短时返回 0"""
+    import numpy as np
+
+    a = np.unpackbits(np.frombuffer(fp_a, dtype=np.uint8))[:(frames_a - 1) * N_BITS].reshape(-1, N_BITS)
+    b = np.unpackbits(np.frombuffer(fp_b, dtype=np.uint8))[:(frames_b - 1) * N_BITS].reshape(-1, N_BITS)
+    min_overlap = int(min(len(a), len(b)) * 0.8)
+
+    best = 0.0
+    for shift in range(-MAX_SHIFT_FRAMES, MAX_SHIFT_FRAMES + 1):
+        a_part = a[max(0, shift):]
+        b_part = b[max(0, -shift):]
+        overlap = min(len(a_part), len(b_part))
+        if overlap == 0 or overlap < min_overlap:
+            continue
+        best = max(best, float((a_part[:overlap] == b_part[:overlap]).mean()))
+    return best
+
+
+# ---------- 缓存 ----------
+
+class TranscriptCache:
+    def __init__(self, model, settings, path=None):
+        self.model = model
+        # 参数按键排序后序列化，保证同样的设置得到同样的键
+        self.settings = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+        self.conn = sqlite3.connect(path or ASR_CACHE_PATH, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                id INTEGER PRIMARY KEY,
+                file_hash TEXT,
+                pcm_hash TEXT,
+                fingerprint BLOB,
+                frames INTEGER,
+                duration REAL,
+                model TEXT,
+                settings TEXT,
+                source TEXT,
+                text TEXT,
+                created_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_transcripts_file ON transcripts (file_hash, model, settings);
+            CREATE INDEX IF NOT EXISTS idx_transcripts_pcm ON transcripts (pcm_hash, model, settings);
+            CREATE INDEX IF NOT EXISTS idx_transcripts_duration ON transcripts (model, settings, duration);
+        """)
+
+    def _find(self, column, value):
+        row = self.conn.execute(
+            f"SELECT text, source FROM transcripts WHERE {column}=? AND model=? AND settings=? LIMIT 1",
+            (value, self.model, self.settings),
+        ).fetchone()
+        return row
+
+    def by_file(self, digest):
+        return self._find("file_hash", digest)
+
+    def by_pcm(self, digest):
+        return self._find("pcm_hash", digest)
+
+    def near_duplicate(self, fp, frames, threshold=None):
+        """返回 (相似度, 文本, 来源文件) 中相似度最高且超过阈值的一条；没有时返回 None"""
+        threshold = ASR_NEAR_DUP_THRESHOLD if threshold is None else threshold
+        duration = frames * FRAME_SECONDS
+        rows = self.conn.execute(
+            """SELECT fingerprint, frames, text, source FROM transcripts
+               WHERE model=? AND settings=? AND duration BETWEEN ? AND ? AND frames > 1""",
+            (self.model, self.settings, duration * (1 - DURATION_TOLERANCE), duration * (1 + DURATION_TOLERANCE)),
+        )
+        best = None
+        for other_fp, other_frames, text, source in rows:
+            score = similarity(fp, frames, other_fp, other_frames)
+            if score >= threshold and (best is None or score > best[0]):
+                best = (score, text, source)
+        return best
+
+    def store(self, text, source, file_digest, pcm_digest=None, fp=b"", frames=0):
+        with self.conn:
+            self.conn.execute(
+                """INSERT INTO transcripts
+                   (file_hash, pcm_hash, fingerprint, frames, duration, model, settings, source, text, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (file_digest, pcm_digest, fp, frames, frames * FRAME_SECONDS,
+                 self.model, self.settings, source, text, datetime.datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def close(self):
+        self.conn.close()
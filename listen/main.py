@@ -1,74 +1,220 @@
-import torch
-from transformers import pipeline
 import time
 import os
+import sys
 
-def main():
-    model_path = "listen/whisper-large-v3"   # 本地模型
-    audio_dir = "listen/audio"               # 音频文件夹
+# 允许直接运行本脚本时导入项目根目录下的 common 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import AUDIO_DIR, WHISPER_MODEL_PATH, WHISPER_ASSISTANT_MODEL_PATH, ASR_REUSE_NEAR_DUP
+from common import metrics
+from listen import asr_cache, preprocess
+from listen.asr_cache import TranscriptCache
+
+# 转写参数（也是缓存键的一部分：参数变了就不会使用旧结果）
+CHUNK_LENGTH_S = 30
+BATCH_SIZE = 8
+GENERATE_KWARGS = {"language": "japanese", "task": "transcribe"}
 
-    # === 1. 修改此处：寻找 audio/ 中的 MP3 文件 (也可以兼容 WAV) ===
+def output_txt_for(audio_path):
+    # 输出文件名（自动替换后缀为 .txt）
+    return os.path.splitext(audio_path)[0] + ".txt"
+
+def pending_audio_files(audio_dir):
+    """audio 文件夹中还没有转写结果的音频（转写结果本身就是检查点）"""
     # 定义支持的格式
     valid_extensions = (".mp3")
-    
-    # 获取文件夹内所有文件
-    all_files = os.listdir(audio_dir)
-    
-    # 筛选出音频文件
-    audio_files = [f for f in all_files if f.lower().endswith(valid_extensions)]
 
-    if len(audio_files) == 0:
-        print(f"❌ 错误：audio 文件夹中没有找到音频文件 ({valid_extensions})！")
-        return
+    # 获取文件夹内所有文件
+    all_files = sorted(os.listdir(audio_dir)) if os.path.isdir(audio_dir) else []
 
-    # 默认取第一个文件
-    target_file = audio_files[0]
-    audio_path = os.path.join(audio_dir, target_file)
-    print(f"📂 找到音频文件：{audio_path}")
+    # 筛选出音频文件
+    audio_files = [os.path.join(audio_dir, f) for f in all_files if f.lower().endswith(valid_extensions)]
+    for path in audio_files:
+        if os.path.exists(output_txt_for(path)):
+            print(f"♻️ 已存在转写结果，跳过：{output_txt_for(path)}")
+    return [path for path in audio_files if not os.path.exists(output_txt_for(path))]
+
+def check_file_cache(cache, audio_path):
+    """加载模型和解码之前，先按文件哈希查缓存"""
+    hit = cache.by_file(asr_cache.file_hash(audio_path))
+    if hit:
+        print(f"♻️ 同一个音频文件已经转写过（来源: {hit[1]}），直接使用缓存结果")
+        return hit[0]
+    return None
+
+def check_decoded_cache(cache, decoded):
+    """
+    解码后再按 PCM 哈希、声学指纹查缓存，返回 (转写结果, 是否只是疑似重复)；没有命中时返回 (None, False)。
+    指纹相似只能说明疑似重复，默认仍然转写；ASR_REUSE_NEAR_DUP=1 时才直接使用旧结果。
+    """
+    hit = cache.by_pcm(decoded["pcm_hash"])
+    if hit:
+        print(f"♻️ 音频内容与已转写的 {hit[1]} 完全相同，直接使用缓存结果")
+        return hit[0], False
+
+    near = cache.near_duplicate(decoded["fingerprint"], decoded["frames"])
+    if near:
+        score, text, source = near
+        metrics.incr("asr_near_duplicate", reused=int(ASR_REUSE_NEAR_DUP))
+        if ASR_REUSE_NEAR_DUP:
+            print(f"⚠️ 疑似重复音频：与已转写的 {source} 相似度 {score:.0%}，使用其转写结果（ASR_REUSE_NEAR_DUP=1）")
+            return text, True
+        print(f"⚠️ 疑似重复音频：与已转写的 {source} 相似度 {score:.0%}，仍然重新转写")
+    return None, False
+
+def save_text(output_txt, final_text):
+    with open(output_txt, "w", encoding="utf-8") as f:
+        f.write(final_text)
+    print(f"\n🎉 已保存到：{output_txt}")
 
-    # 输出文件名（自动替换后缀为 .txt）
-    output_txt = os.path.join(audio_dir, os.path.splitext(target_file)[0] + ".txt")
+def load_pipeline(model_path, assistant_path=WHISPER_ASSISTANT_MODEL_PATH):
+    """返回 (pipeline, 辅助模型)；没有配置辅助模型时第二项为 None"""
+    # torch / transformers 导入很慢，确认有音频需要转写后才导入
+    import torch
+    from transformers import pipeline
 
-    # === 2. 自动检测设备 ===
+    # === 自动检测设备 ===
     device = "cuda:0" if torch.cuda.is_available() else "cpu"
     torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
 
     print(f"[1/3] 加载模型 (Device: {device}, Dtype: {torch_dtype})...")
 
-    pipe = pipeline(
-        "automatic-speech-recognition",
-        model=model_path,
-        tokenizer=model_path,
-        chunk_length_s=30,
-        device=device,
-        torch_dtype=torch_dtype,
-    )
-
-    # === 3. 开始转写 ===
-    print("[2/3] 开始转写…")
+    with metrics.span("whisper_load"):
+        pipe = pipeline(
+            "automatic-speech-recognition",
+            model=model_path,
+            tokenizer=model_path,
+            chunk_length_s=CHUNK_LENGTH_S,
+            device=device,
+            torch_dtype=torch_dtype,
+        )
+        assistant = load_assistant(assistant_path, device, torch_dtype) if assistant_path else None
+    return pipe, assistant
+
+def load_assistant(assistant_path, device, torch_dtype):
+    """
+    辅助解码用的小模型（与大模型使用相同的分词器，例如 distil-large-v3 之于 large-v3）：
+    小模型一次起草几个 token，大模型一次前向计算全部验证，CPU 上自回归步数大幅减少
+    """
+    from transformers import AutoModelForSpeechSeq2Seq
+
+    print(f"      辅助解码模型: {assistant_path}")
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(assistant_path, torch_dtype=torch_dtype, low_cpu_mem_usage=True)
+    return model.to(device)
+
+def call_kwargs(assistant=None):
+    """调用 pipeline 的参数；辅助解码一次只能验证一条序列，batch_size 固定为 1"""
+    if assistant is None:
+        return {"batch_size": BATCH_SIZE, "return_timestamps": False, "generate_kwargs": dict(GENERATE_KWARGS)}
+    return {"batch_size": 1, "return_timestamps": False,
+            "generate_kwargs": {**GENERATE_KWARGS, "assistant_model": assistant}}
+
+def asr_settings(assistant_path=WHISPER_ASSISTANT_MODEL_PATH):
+    """
+    缓存键中的转写参数：取实际调用 pipeline 的参数（辅助解码时 batch_size 为 1）加上辅助模型名。
+    辅助解码与默认方式的结果不保证逐字相同（见 bench/asr_bench.py 的 agreement），两者分开缓存。
+    """
+    kwargs = call_kwargs(assistant_path or None)
+    generate_kwargs = kwargs.pop("generate_kwargs")
+    generate_kwargs.pop("assistant_model", None)
+    settings = {"chunk_length_s": CHUNK_LENGTH_S, **kwargs, **generate_kwargs}
+    if assistant_path:
+        settings["assistant_model"] = os.path.basename(os.path.normpath(assistant_path))
+    return settings
+
+def transcribe(pipe, audio_input, assistant=None):
+    mode = "assisted" if assistant is not None else "default"
+    print(f"[2/3] 开始转写{'（辅助解码）' if assistant is not None else ''}…")
     start_time = time.time()
 
-    # pipeline 会自动处理 MP3 解码，无需额外代码
-    result = pipe(
-        audio_path,
-        batch_size=8,
-        return_timestamps=False,
-        generate_kwargs={"language": "japanese", "task": "transcribe"}
-    )
+    result = pipe(audio_input, **call_kwargs(assistant))
 
     end_time = time.time()
     print(f"⏱️ 转写耗时: {end_time - start_time:.2f} 秒")
+    metrics.observe("whisper_seconds", end_time - start_time, mode=mode)
+    if isinstance(audio_input, dict):
+        # 实时率 = 转写耗时 / 音频时长，小于 1 表示比实时快
+        audio_seconds = len(audio_input["raw"]) / audio_input["sampling_rate"]
+        if audio_seconds:
+            metrics.observe("whisper_rtf", (end_time - start_time) / audio_seconds, mode=mode)
 
     final_text = result["text"]
 
     print("\n[3/3] 识别结果预览：")
     print(final_text[:500] + "..." if len(final_text) > 500 else final_text)
+    return final_text
 
-    # === 4. 保存 ===
-    with open(output_txt, "w", encoding="utf-8") as f:
-        f.write(final_text)
+@metrics.stage("listen")
+def main():
+    model_path = WHISPER_MODEL_PATH   # 本地模型
+    audio_dir = AUDIO_DIR             # 音频文件夹
+
+    # === 1. 寻找 audio/ 中还没有转写的 MP3 文件 ===
+    audio_files = pending_audio_files(audio_dir)
+    if not audio_files:
+        if not os.path.isdir(audio_dir) or not any(f.lower().endswith(".mp3") for f in os.listdir(audio_dir)):
+            print("❌ 错误：audio 文件夹中没有找到音频文件 (.mp3)！")
+        return
 
-    print(f"\n🎉 已保存到：{output_txt}")
+    cache = TranscriptCache(os.path.basename(os.path.normpath(model_path)), asr_settings())
+    try:
+        run_batch(cache, model_path, audio_files)
+    finally:
+        cache.close()
+
+def run_batch(cache, model_path, audio_files):
+    # === 2. 按文件哈希命中缓存的直接写出，不需要解码 ===
+    to_decode = []
+    for audio_path in audio_files:
+        print(f"📂 找到音频文件：{audio_path}")
+        cached_text = check_file_cache(cache, audio_path)
+        if cached_text is not None:
+            metrics.incr("asr_cache", result="hit")
+            save_text(output_txt_for(audio_path), cached_text)
+        else:
+            to_decode.append(audio_path)
+    if not to_decode:
+        return
+
+    pipe = assistant = None
+    if not preprocess.can_decode():
+        # 没有 ffmpeg 时无法预处理，交给 pipeline 自己读取文件
+        print("⚠️ 未找到 ffmpeg，跳过预处理，仅按文件哈希缓存")
+        for audio_path in to_decode:
+            if pipe is None:
+                pipe, assistant = load_pipeline(model_path)
+            final_text = transcribe(pipe, audio_path, assistant)
+            cache.store(final_text, os.path.basename(audio_path), asr_cache.file_hash(audio_path))
+            save_text(output_txt_for(audio_path), final_text)
+        return
+
+    # === 3. 子进程解码，主进程按完成顺序推理：推理当前文件时其余文件仍在解码 ===
+    for decoded in preprocess.preprocess_all(to_decode):
+        audio_path = decoded["audio_path"]
+        if "error" in decoded:
+            print(f"❌ 解码失败 {audio_path}: {decoded['error']}")
+            continue
+
+        final_text, near_duplicate = check_decoded_cache(cache, decoded)
+        metrics.incr("asr_cache", result="miss" if final_text is None else "near" if near_duplicate else "hit")
+        if final_text is None:
+            if pipe is None:
+                pipe, assistant = load_pipeline(model_path)
+            samples = preprocess.load_pcm(decoded["pcm_path"])
+            final_text = transcribe(pipe, {"raw": samples, "sampling_rate": asr_cache.SAMPLE_RATE}, assistant)
+            del samples
+
+        # === 4. 保存 ===
+        # 借用的疑似重复结果不以新音频的哈希写入缓存，否则错误的结果会变成精确命中
+        if not near_duplicate:
+            cache.store(
+                final_text, os.path.basename(audio_path), decoded["file_hash"],
+                decoded["pcm_hash"], decoded["fingerprint"], decoded["frames"],
+            )
+        save_text(output_txt_for(audio_path), final_text)
+        preprocess.remove_pcm(decoded["pcm_path"])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
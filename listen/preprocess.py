@@ -0,0 +1,130 @@
+"""
+音频预处理：解码 + 重采样
+
+在进程池中用 ffmpeg 把 MP3 解码为 16kHz 单声道 PCM，直接写入 PCM_CACHE_DIR 下的文件，
+同时在子进程中算好 PCM 哈希和声学指纹。转写阶段通过 numpy.memmap 零拷贝读取这些文件，
+主进程做推理时，其余音频在子进程中继续解码，两个阶段同时占满 CPU。
+
+PCM 文件按源文件哈希命名，已解码过的文件不会重复解码；转写完成后删除。
+
+用法:
+    python listen/preprocess.py          # 预先解码 audio 文件夹中所有还没有转写的音频
+"""
+import os
+import sys
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 允许直接运行本脚本时导入项目根目录下的 common / listen 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import AUDIO_DIR, PCM_CACHE_DIR, PCM_DTYPE, PREPROCESS_WORKERS
+from listen import asr_cache
+
+# ffmpeg 输出格式与 numpy dtype 的对应
+PCM_FORMATS = {"float32": "f32le", "int16": "s16le"}
+
+
+def can_decode():
+    return shutil.which("ffmpeg") is not None
+
+
+def pcm_file_for(file_digest, dtype=PCM_DTYPE):
+    return os.path.join(PCM_CACHE_DIR, f"{file_digest}.{dtype}.pcm")
+
+
+def load_pcm(path, dtype=PCM_DTYPE):
+    """
+    以 memmap 打开 PCM 文件，返回 float32 数组。
+    float32 文件不复制；int16 文件体积减半，但需要转换成 float32（会复制一份）。
+    """
+    import numpy as np
+
+    samples = np.memmap(path, dtype=dtype, mode="r")
+    if dtype == "int16":
+        return samples.astype(np.float32) / 32768.0
+    return samples
+
+
+def decode_to_pcm(audio_path, dtype=PCM_DTYPE):
+    """
+    在子进程中运行：解码为 PCM 文件并计算哈希和指纹。
+    返回 {"audio_path", "file_hash", "pcm_path", "pcm_hash", "fingerprint", "frames"}
+    """
+    file_digest = asr_cache.file_hash(audio_path)
+    pcm_path = pcm_file_for(file_digest, dtype)
+
+    if not os.path.exists(pcm_path):
+        os.makedirs(PCM_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{pcm_path}.{os.getpid()}.tmp"
+        # ffmpeg 直接写文件，解码结果不经过 Python 内存；写完再改名，中断时不会留下半个文件
+        subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", audio_path,
+             "-ac", "1", "-ar", str(asr_cache.SAMPLE_RATE), "-f", PCM_FORMATS[dtype], tmp_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True,
+        )
+        os.replace(tmp_path, pcm_path)
+
+    samples = load_pcm(pcm_path, dtype)
+    fp, frames = asr_cache.fingerprint(samples)
+    return {
+        "audio_path": audio_path,
+        "file_hash": file_digest,
+        "pcm_path": pcm_path,
+        "pcm_hash": asr_cache.pcm_hash(samples),
+        "fingerprint": fp,
+        "frames": frames,
+    }
+
+
+def preprocess_all(audio_paths, workers=PREPROCESS_WORKERS):
+    """
+    并行解码，按完成顺序逐个产出 decode_to_pcm 的结果；
+    调用方处理（推理）当前结果时，其余文件仍在子进程中解码。
+    解码失败的文件产出 {"audio_path", "error"}。
+    """
+    if not audio_paths:
+        return
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(audio_paths)))) as pool:
+        futures = {pool.submit(decode_to_pcm, path): path for path in audio_paths}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {"audio_path": futures[future], "error": e}
+
+
+def remove_pcm(pcm_path):
+    try:
+        if pcm_path and os.path.exists(pcm_path):
+            os.remove(pcm_path)
+    except OSError as e:
+        # Windows 上文件仍被映射时无法删除，留到下次按同名覆盖即可
+        print(f"⚠️ 无法删除 PCM 文件 {pcm_path}: {e}")
+
+
+def main():
+    from listen.main import pending_audio_files
+
+    if not can_decode():
+        print("❌ 未找到 ffmpeg，无法预处理音频。")
+        return
+    paths = pending_audio_files(AUDIO_DIR)
+    if not paths:
+        print("✅ 没有需要预处理的音频。")
+        return
+
+    print(f"🎛️ 使用 {min(PREPROCESS_WORKERS, len(paths))} 个进程解码 {len(paths)} 个音频...")
+    for result in preprocess_all(paths):
+        if "error" in result:
+            print(f"❌ 解码失败 {result['audio_path']}: {result['error']}")
+        else:
+            seconds = result["frames"] * asr_cache.FRAME_SECONDS
+            print(f"✓ {os.path.basename(result['audio_path'])} → {result['pcm_path']} ({seconds:.0f} 秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,57 @@
 import os
+import sys
 import glob
-import smtplib
-import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 from email.utils import formataddr
-from openai import OpenAI
-from dotenv import load_dotenv
+
+# 允许直接运行本脚本时导入项目根目录下的 common 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
 
 # ================= 🚀 配置加载 =================
-load_dotenv() 
+from common.config import (
+    SENDER_EMAIL, SENDER_PASSWORD, RECEIVER_EMAIL, DEEPSEEK_API_KEY, AUDIO_DIR,
+)
+from common.clients import get_llm, send_mail
+from common import metrics, prompts, validate
+from common.archive import Archive
+from common.journal import RunJournal
+from common.sections import SectionParser, split_sections
+
+SECTION_MARKERS = ["[SUMMARY]", "[JAPANESE]", "[TRANSLATION]"]
+# 模型有时把标记写成任务名称（【摘要】、中文翻译：等）
+SECTION_ALIASES = {
+    "[SUMMARY]": ["摘要", "概括"],
+    "[JAPANESE]": ["日语重写", "日语原文", "日本語"],
+    "[TRANSLATION]": ["中文翻译", "翻译"],
+}
+
+# 核心在于要求 AI 进行"文本整形"；固定部分不含原文（见 common/prompts.py）
+LISTEN_PROMPT = """
+你是一个专业的日语语言学专家和翻译家。
+
+请阅读用户给出的日语文本（原文可能是语音转文字，缺少标点且未分段），请完成三个任务：
 
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
-RECEIVER_EMAIL = os.getenv("RECEIVER_EMAIL")
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.qq.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_APIKEY")
+1. 【摘要】：提供一个非常简短的中文概括（不超过 15 个字），用于邮件标题。
+2. 【日语重写】：
+   - 为原文添加正确的标点符号（。、？！等）。
+   - 根据语义逻辑进行**智能分段**（在段落之间插入空行），使其易于朗读和阅读。
+3. 【中文翻译】：
+   - 将重写后的日语翻译成自然流畅的中文。
+   - **中文翻译的段落结构必须与重写后的日语完全对应**（日语分几段，中文就分几段）。
 
-DEEPSEEK_BASE_URL = "https://api.deepseek.com"
-AUDIO_DIR = "listen/audio"
+请严格按照以下格式返回结果（不要包含多余的寒暄）：
 
-if not all([SENDER_EMAIL, SENDER_PASSWORD, RECEIVER_EMAIL, DEEPSEEK_API_KEY]):
-    print("❌ 错误：重要的环境变量未加载。请检查 .env 文件。")
-    exit(1)
+[SUMMARY]
+(这里写概括)
+[JAPANESE]
+(这里写添加标点并分段后的日语原文)
+[TRANSLATION]
+(这里写对应的中文翻译)
+"""
 
 
 # ================= 功能函数 =================
@@ -52,71 +79,46 @@ def get_file_pair():
     print(f"📂 找到文件:\n - 音频: {wav_path}\n - 文本: {txt_path}")
     return wav_path, txt_path
 
-def get_ai_response(content):
+def get_ai_response(content, journal=None, key=""):
     """
     调用 DeepSeek API:
     1. 生成摘要
     2. 【新增】为日语原文添加标点并智能分段
     3. 生成中文翻译
+
+    流式输出：每完成一个部分就记入运行日志，中断后只重新生成还没完成的部分。
     """
     print("🤖 正在请求 DeepSeek API 进行重写、分段和翻译...")
     
-    client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
-
-    # 修改后的 Prompt，核心在于要求 AI 进行"文本整形"
-    prompt = f"""
-    请阅读以下日语文本（原文可能是语音转文字，缺少标点且未分段），请完成三个任务：
-
-    1. 【摘要】：提供一个非常简短的中文概括（不超过 15 个字），用于邮件标题。
-    2. 【日语重写】：
-       - 为原文添加正确的标点符号（。、？！等）。
-       - 根据语义逻辑进行**智能分段**（在段落之间插入空行），使其易于朗读和阅读。
-    3. 【中文翻译】：
-       - 将重写后的日语翻译成自然流畅的中文。
-       - **中文翻译的段落结构必须与重写后的日语完全对应**（日语分几段，中文就分几段）。
+    # 说明和格式是固定部分（可命中前缀缓存），待处理的原文放在最后
+    messages = prompts.cached_messages(LISTEN_PROMPT, f"待处理的日语原文：\n{content}")
 
-    请严格按照以下格式返回结果（不要包含多余的寒暄）：
-    
-    [SUMMARY]
-    (这里写概括)
-    [JAPANESE]
-    (这里写添加标点并分段后的日语原文)
-    [TRANSLATION]
-    (这里写对应的中文翻译)
-
-    待处理的日语原文：
-    {content}
-    """
+    partial = journal.get("ai_partial", key) if journal is not None else None
+    if partial:
+        print(f"♻️ 从断点继续生成（已有 {len(partial)} 字）")
+    parser = SectionParser(
+        start_markers=SECTION_MARKERS,
+        on_checkpoint=(lambda text: journal.record("ai_partial", key, text)) if journal is not None else None,
+        text=partial or "",
+    )
 
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=[
-            {"role": "system", "content": "你是一个专业的日语语言学专家和翻译家。"},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.3 # 保持较低温度以确保格式稳定
+    response = get_llm().stream_chat(
+        messages,
+        temperature=0.3, # 保持较低温度以确保格式稳定
+        tag="listen",
+        parser=parser,
     )
 
-    result_text = response.choices[0].message.content
+    result_text = response.content
     
-    # 解析返回的三部分内容
-    try:
-        # 1. 提取翻译部分（在最后）
-        parts_trans = result_text.split("[TRANSLATION]")
-        translation_part = parts_trans[1].strip()
-        
-        # 2. 提取剩余部分中的摘要和日语
-        parts_meta = parts_trans[0].split("[JAPANESE]")
-        formatted_japanese = parts_meta[1].strip()
-        
-        # 3. 提取摘要
-        summary_part = parts_meta[0].replace("[SUMMARY]", "").strip()
-        
-        return summary_part, formatted_japanese, translation_part
-        
-    except IndexError:
+    # 解析返回的三部分内容：标记写法不标准时先在本地统一，缺少的部分单独补问（见 common/validate.py）
+    sections = split_sections(validate.normalize_markers(result_text, SECTION_MARKERS, SECTION_ALIASES), SECTION_MARKERS)
+    if not sections.get("[JAPANESE]") or not sections.get("[TRANSLATION]"):
+        sections = validate.reask_sections(get_llm(), messages, result_text, sections, SECTION_MARKERS, "listen")
+    if not sections.get("[JAPANESE]") or not sections.get("[TRANSLATION]"):
         print("⚠️ 解析 AI 响应失败，将使用原始文本。")
         return "今日日语听力", content, result_text
+    return sections.get("[SUMMARY]") or "今日日语听力", sections["[JAPANESE]"], sections["[TRANSLATION]"]
 
 
 def send_email(subject_summary, formatted_japanese, translation_text, audio_path):
@@ -183,16 +185,29 @@ def send_email(subject_summary, formatted_japanese, translation_text, audio_path
         print(f"⚠️ 警告: 未找到音频文件 {audio_path}")
         
     try:
-        smtp_obj = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=15)
-        smtp_obj.login(SENDER_EMAIL, SENDER_PASSWORD)
-        smtp_obj.sendmail(SENDER_EMAIL, [RECEIVER_EMAIL], msg.as_string())
-        smtp_obj.quit()
+        send_mail(SENDER_EMAIL, [RECEIVER_EMAIL], msg.as_string())
         print("✅ 邮件发送成功！")
         return True
     except Exception as e:
         print(f"❌ 邮件发送失败: {e}")
     return False
 
+def archive_pair(summary, formatted_japanese, translation, audio_path, txt_path):
+    """发送成功后、删除源文件前存入归档（含原始转写）；归档失败不影响发送结果"""
+    try:
+        transcript = ""
+        if os.path.exists(txt_path):
+            with open(txt_path, 'r', encoding='utf-8') as f:
+                transcript = f.read()
+        archive = Archive()
+        try:
+            item_id, duplicate_of = archive.store_listen(summary, formatted_japanese, translation, transcript, audio_path)
+        finally:
+            archive.close()
+        print(f"🗄 已归档 #{item_id}" + (f"（与归档 #{duplicate_of} 内容几乎相同）" if duplicate_of else ""))
+    except Exception as e:
+        print(f"⚠️ 归档失败: {e}")
+
 def delete_pair_files(audio_path, txt_path):
     """邮件成功发送后自动删除对应的 mp3 和 txt 文件"""
     try:
@@ -208,27 +223,44 @@ def delete_pair_files(audio_path, txt_path):
 
 # ================= 主程序 =================
 
+@metrics.stage("listen-send")
 def main():
+    if not all([SENDER_EMAIL, SENDER_PASSWORD, RECEIVER_EMAIL, DEEPSEEK_API_KEY]):
+        print("❌ 错误：重要的环境变量未加载。请检查 .env 文件。")
+        return
+
+    journal = RunJournal("listen")
     try:
         # 1. 获取文件路径
         wav_path, txt_path = get_file_pair()
-        
-        # 2. 读取原始的、无标点的文本
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            raw_text = f.read()
-            
-        # 3. AI 处理：获取摘要、格式化后的日语、翻译
-        # 注意：这里接收三个返回值
-        summary, formatted_japanese, translation = get_ai_response(raw_text)
-        
-        print(f"📝 生成摘要: {summary}")
-        
-        # 4. 发送邮件
-        success = send_email(summary, formatted_japanese, translation, wav_path)
+        # 检查点以文本文件名为 key，同一天内重跑不会重复调用 API 或重复发信
+        pair_key = os.path.basename(txt_path)
+
+        if not journal.has("deliver", pair_key):
+            result = journal.get("ai_response", pair_key)
+            if result is None:
+                # 2. 读取原始的、无标点的文本
+                with open(txt_path, 'r', encoding='utf-8') as f:
+                    raw_text = f.read()
+
+                # 3. AI 处理：获取摘要、格式化后的日语、翻译
+                # 注意：这里接收三个返回值
+                result = get_ai_response(raw_text, journal, pair_key)
+                journal.record("ai_response", pair_key, list(result))
+            else:
+                print(f"♻️ 已从断点恢复 AI 处理结果: {pair_key}")
+
+            summary, formatted_japanese, translation = result
+            print(f"📝 生成摘要: {summary}")
+
+            # 4. 发送邮件
+            if not send_email(summary, formatted_japanese, translation, wav_path):
+                return
+            journal.record("deliver", pair_key)
+            archive_pair(summary, formatted_japanese, translation, wav_path, txt_path)
 
         # 5. 邮件发送成功 → 删除对应文件
-        if success:
-            delete_pair_files(wav_path, txt_path)
+        delete_pair_files(wav_path, txt_path)
         
     except FileNotFoundError as e:
         print(f"\n❌ 文件错误: {e}")
@@ -236,6 +268,8 @@ def main():
         import traceback
         traceback.print_exc()
         print(f"\n❌ 程序运行出错: {e}")
+    finally:
+        journal.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
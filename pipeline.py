@@ -0,0 +1,82 @@
+"""
+每日日语学习流水线（单进程版）
+
+在同一个解释器中依次运行 vocab → read → listen(转写) → listen(发送) → 收集生词 → 单词预取，
+配置只加载一次，HTTP / LLM / SMTP 连接在各阶段之间复用。
+
+用法:
+    python pipeline.py              # 运行全部阶段
+    python pipeline.py vocab read   # 只运行指定阶段
+"""
+import os
+import sys
+import time
+import importlib
+import traceback
+
+from common import metrics
+
+# 阶段名 -> 模块（模块需提供 main()）
+STAGES = {
+    "vocab": "vocab.main",
+    "read": "read.main",
+    "listen": "listen.main",
+    "listen-send": "listen.sender",
+    # 从今天的文章和转写中收集生词（在预取之前，新词也能预取到解析）
+    "vocab-harvest": "vocab.harvest",
+    # 当天的邮件都发完后，以较低的限流为明天的单词预先生成解析
+    "vocab-prefetch": "vocab.prefetch",
+}
+
+
+def run_stage(name):
+    """运行单个阶段；某个阶段失败不影响后续阶段"""
+    print(f"\n========== ▶ {name} ==========")
+    start = time.perf_counter()
+    ok = True
+    try:
+        # 模块的 main() 自己也会进入同名阶段，这里包一层是为了导入失败等情况也有记录
+        with metrics.stage(name):
+            module = importlib.import_module(STAGES[name])
+            module.main()
+    except Exception:
+        traceback.print_exc()
+        print(f"❌ 阶段 {name} 运行失败")
+        ok = False
+    print(f"⏱️ {name} 耗时: {time.perf_counter() - start:.2f} 秒")
+    return ok
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    selected = argv or list(STAGES)
+    unknown = [name for name in selected if name not in STAGES]
+    if unknown:
+        print(f"✗ 未知阶段: {', '.join(unknown)}  (可选: {', '.join(STAGES)})")
+        return 2
+
+    # 各模块使用相对于项目根目录的路径（vocab/vocab.db 等）
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    from common.clients import close_clients, peek_llm
+
+    print("🚀 开始运行每日日语学习流水线...")
+    results = {}
+    try:
+        for name in selected:
+            results[name] = run_stage(name)
+    finally:
+        if peek_llm() is not None:
+            print("\n" + peek_llm().format_stats())
+        close_clients()
+
+    failed = [name for name, ok in results.items() if not ok]
+    if failed:
+        print(f"\n⚠️ 以下阶段失败: {', '.join(failed)}")
+        return 1
+    print("\n🎉 全部阶段完成！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
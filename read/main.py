@@ -1,19 +1,27 @@
 import os
-import smtplib
-import requests
+import sys
 from email.mime.text import MIMEText
 from email.header import Header
 from email.utils import formataddr
 from datetime import datetime
-from dotenv import load_dotenv
+
+# 允许直接运行本脚本时导入项目根目录下的 common 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common import config
+from common.clients import get_llm, send_mail
+from common import metrics, prompts, validate
+from common.archive import Archive
+from common.journal import RunJournal
+from common.sections import SectionParser
 
 # =========================
 # 可配置参数
 # =========================
-JLPT_LEVEL = "N4"
+JLPT_LEVEL = config.JLPT_LEVEL
 template_file = "read/template_reference.html"
-# 加载 .env 环境变量
-load_dotenv()
 
 
 def get_html_template():
@@ -22,42 +30,55 @@ def get_html_template():
         return f.read()
 
 
-def get_ai_content():
-    """调用 DeepSeek API 生成日语学习内容"""
-    api_key = os.getenv("DEEPSEEK_APIKEY")
-    url = "https://api.deepseek.com/v1/chat/completions"
-
-    # 从 topic.txt 读取第一行
+def pick_topic(archive=None):
+    """
+    从 topic.txt 取出第一行作为本次话题，并将其从文件中删除。
+    与已归档的文章话题过于相似的（见 common/archive.py）在 ARCHIVE_TOPIC_DEDUP=skip 时跳过并一起删除，
+    全部相似时仍使用第一个。
+    """
     topic_file = "read/topic.txt"
     with open(topic_file, "r", encoding="utf-8") as f:
         lines = f.readlines()
 
-    selected_topic = lines[0].strip()
-
-    # 删除第一行并写回
+    candidates = [i for i, line in enumerate(lines) if line.strip()]
+    index = candidates[0]
+    for i in candidates:
+        similar = archive.similar_topics(lines[i].strip()) if archive is not None else []
+        if not similar:
+            index = i
+            break
+        score, item_id, topic, delivered_at = similar[0]
+        print(f"♻️ 话题「{lines[i].strip()}」与 {delivered_at[:10]} 发送过的「{topic}」相似（{score:.2f}，归档 #{item_id}）")
+        if config.ARCHIVE_TOPIC_DEDUP != "skip":
+            index = i
+            break
+    skipped = [i for i in candidates if i < index]
+    if skipped:
+        print(f"⏭ 跳过 {len(skipped)} 个重复话题，可用 python common/archive.py show <id> 查看以前的文章")
+
+    selected_topic = lines[index].strip()
+
+    # 删除选中的话题（和跳过的重复话题）并写回
     with open(topic_file, "w", encoding="utf-8") as f:
-        f.writelines(lines[1:])
+        f.writelines(lines[index + 1:])
 
-    print(f"🎯 本次选定话题: {selected_topic}")
-
-    html_template = get_html_template()
+    return selected_topic
 
-    system_prompt = f"""
-你是一位专业的日语教师，专攻JLPT {JLPT_LEVEL}水平教学。请生成一封适合{JLPT_LEVEL}水平日语学习者的"每日日语阅读"邮件内容。
 
-【今日话题】
-{selected_topic}
+# 固定部分（不含话题、等级等变量），后面接 HTML 模板和注意事项
+READ_PROMPT = """
+你是一位专业的日语教师，专攻JLPT各级别的教学。请按【本次参数】中的话题和 JLPT 等级，生成一封"每日日语阅读"邮件内容。
 
 【生成要求】
 1. 文章内容：
    - 标题：与话题相关的正式、有深度的日语标题
-   - 正文：500-800字的日语文章，{JLPT_LEVEL}阅读难度
+   - 正文：500-800字的日语文章，阅读难度符合指定的 JLPT 等级
    - 文章需要有逻辑性，包含观点、分析或说明
 
 2. 中文翻译：
    - 提供准确、通顺的中文翻译
 
-3. {JLPT_LEVEL}模拟试题（4问）：
+3. 对应等级的模拟试题（4问）：
    - 问题1: 文章主旨题
    - 问题2: 细节理解题
    - 问题3: 词义推断题
@@ -65,49 +86,70 @@ def get_ai_content():
    - 每题提供4个选项（日文），并附解析和答案
 
 4. 学习要点：
-   - 8-12个{JLPT_LEVEL}核心词汇（表格形式，包含单词、读音、中文意思）
-   - 4-6个{JLPT_LEVEL}核心语法点（包含接续、用法、例句）
+   - 8-12个该等级的核心词汇（表格形式，包含单词、读音、中文意思）
+   - 4-6个该等级的核心语法点（包含接续、用法、例句）
 
 【HTML格式要求】
 请严格遵循以下HTML模板的结构、样式和格式。请直接生成完整的HTML代码，不需要额外的解释。
 
-{html_template}
+"""
+READ_NOTES = """
 
 【重要提示】
-1. 用今天的实际日期替换模板中的时间
+1. 用【本次参数】中的日期替换模板中的时间
 2. 保持模板的CSS样式不变
 3. 根据实际内容调整各部分
-4. 确保所有内容都围绕话题【{selected_topic}】展开
+4. 确保所有内容都围绕【本次参数】中的话题展开
 """
 
-    response = requests.post(
-        url,
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "User-Agent": "DailyJapaneseReader/1.0"
-        },
-        json={
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": f"请严格按照模板格式，生成关于「{selected_topic}」的{JLPT_LEVEL}水平日语阅读材料。"
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 8000
-        },
-        timeout=180
+# 生成结果必须包含的部分: (名称, 正则)
+READ_PARTS = [
+    ("日语正文", r"<article\b.*?</article>"),
+    ("中文翻译", r"中文翻译"),
+    ("模拟试题", r"模拟试题|問題\s*1"),
+    ("核心词汇", r"核心词汇"),
+    ("核心语法", r"核心语法"),
+]
+
+
+def get_ai_content(selected_topic, journal=None):
+    """
+    调用 DeepSeek API 生成日语学习内容（流式输出）。
+    每写完一个 </section> 就把已完成的部分记入运行日志，中断后从最后一个完整的段落继续生成。
+    """
+    print(f"🎯 本次选定话题: {selected_topic}")
+
+    # 话题和等级放在最后，说明和 HTML 模板每天逐字节相同，可命中前缀缓存（见 common/prompts.py）
+    messages = prompts.cached_messages(
+        READ_PROMPT + get_html_template() + READ_NOTES,
+        prompts.fields({"话题": selected_topic, "JLPT 等级": JLPT_LEVEL, "日期": datetime.now().strftime("%Y-%m-%d")})
+        + "\n请严格按照模板格式，生成关于这个话题、这个等级的日语阅读材料。",
+    )
+
+    partial = journal.get("generate_partial") if journal is not None else None
+    if partial:
+        print(f"♻️ 从断点继续生成（已有 {len(partial)} 字）")
+    parser = SectionParser(
+        end_markers=["</section>"],
+        on_checkpoint=(lambda text: journal.record("generate_partial", value=text)) if journal is not None else None,
+        text=partial or "",
     )
 
-    response.raise_for_status()
-    data = response.json()
+    # 流式输出只在长时间没有新内容时才超时，生成得慢但一直在输出不会失败
+    response = get_llm().stream_chat(
+        messages,
+        temperature=0.7,
+        max_tokens=8000,
+        tag="read",
+        parser=parser,
+    )
 
-    content = data['choices'][0]['message']['content']
+    content = validate.strip_fences(response.content)
 
-    if not content.strip().startswith('<!DOCTYPE html>'):
+    if content.strip().startswith('<!DOCTYPE html>'):
+        # 被截断时只保留完整的部分并补全页面结尾
+        content = validate.repair_html(content)
+    else:
         content = f"""<!DOCTYPE html>
 <html lang="ja">
 <head>
@@ -120,15 +162,14 @@ def get_ai_content():
 </body>
 </html>"""
 
-    return content
+    # 缺少的部分单独补问，不重新生成整篇（见 common/validate.py）
+    return validate.reask_html(get_llm(), messages, content, READ_PARTS, "read")
 
 
 def send_email(html_content):
     """发送 HTML 邮件"""
-    sender = os.getenv("SENDER_EMAIL")
-    password = os.getenv("SENDER_PASSWORD")
-    receiver = os.getenv("RECEIVER_EMAIL")
-    smtp_server = os.getenv("SMTP_SERVER")
+    sender = config.SENDER_EMAIL
+    receiver = config.RECEIVER_EMAIL
 
     subject = f"📚 {JLPT_LEVEL}日语阅读训练 - {datetime.now().strftime('%Y-%m-%d')}"
     message = MIMEText(html_content, 'html', 'utf-8')
@@ -137,20 +178,63 @@ def send_email(html_content):
     message['To'] = formataddr(("日语学习者", receiver))
     message['Subject'] = Header(subject, 'utf-8')
 
-    server = smtplib.SMTP_SSL(smtp_server, 465)
-    server.login(sender, password)
-    server.sendmail(sender, [receiver], message.as_string())
-    server.quit()
+    send_mail(sender, [receiver], message.as_string())
 
     print(f"✅ 邮件已成功发送给 {receiver}")
 
 
-def main():
-    print(f"🤖 正在生成 {JLPT_LEVEL} 日语阅读材料...")
-    content = get_ai_content()
+def archive_article(archive, content, topic):
+    """已发送的文章存入归档；归档失败不影响发送结果"""
+    try:
+        item_id, duplicate_of = archive.store_read(content, topic)
+    except Exception as e:
+        print(f"⚠️ 归档失败: {e}")
+        return
+    print(f"🗄 已归档 #{item_id}")
+    if duplicate_of:
+        print(f"⚠️ 这篇文章与归档 #{duplicate_of} 内容几乎相同")
+
 
-    print("📝 内容生成完毕，正在发送邮件...")
-    send_email(content)
+@metrics.stage("read")
+def main():
+    journal = RunJournal("read")
+    archive = Archive()
+    try:
+        run_with_journal(journal, archive)
+    finally:
+        archive.close()
+        journal.close()
+
+
+def run_with_journal(journal, archive=None):
+    if journal.finished:
+        print(f"✅ {journal.run_date} 的阅读材料已经发送 (run: {journal.run_id})，跳过。")
+        return
+
+    # 话题只在第一次运行时从 topic.txt 取出
+    selected_topic = journal.get("topic")
+    if selected_topic is None:
+        selected_topic = pick_topic(archive)
+        journal.record("topic", value=selected_topic)
+
+    content = journal.get("generate")
+    if content is None:
+        print(f"🤖 正在生成 {JLPT_LEVEL} 日语阅读材料...")
+        content = get_ai_content(selected_topic, journal)
+        journal.record("generate", value=content)
+    else:
+        print(f"♻️ 已从断点恢复阅读材料 (run: {journal.run_id})")
+
+    # 已发送但没来得及 finish（例如归档时中断）时不再重复发信
+    if not journal.has("deliver"):
+        print("📝 内容生成完毕，正在发送邮件...")
+        send_email(content)
+        journal.record("deliver")
+    else:
+        print(f"♻️ 阅读材料已经发送 (run: {journal.run_id})，不再重复发送")
+    if archive is not None:
+        archive_article(archive, content, selected_topic)
+    journal.finish()
 
     print("🎉 任务完成！")
 
@@ -0,0 +1,170 @@
+"""
+批量操作
+
+database_cmd 的批量命令都在这里实现：
+- add -f words.txt          批量添加（本地词典 + 并发 Jisho，单个事务写入）
+- set-stage <模式|n5> N     批量修改阶段（一条 UPDATE）
+- reset --where 条件        批量重置为未学习（一条 UPDATE）
+
+条件语法: 字段 运算符 值，多个条件之间为 AND，例如
+    stage>=3 jlpt=n5
+    word=食*            (含 * 或 ? 时按通配符匹配)
+    next_review<2025-01-01
+"""
+import re
+import sys
+import datetime
+
+from common.config import REVIEW_INTERVALS as INTERVALS
+from vocab import db
+from vocab.lookup import lookup_many, build_word_row
+
+WHERE_FIELDS = {"word", "reading", "stage", "jlpt", "is_common", "first_seen", "last_review", "next_review"}
+_CONDITION = re.compile(r"^([a-z_]+)\s*(<=|>=|!=|=|<|>)\s*(.+)$", re.IGNORECASE)
+_JLPT_LEVEL = re.compile(r"^(jlpt-)?n[1-5]$", re.IGNORECASE)
+
+
+# ---------- 条件解析 ----------
+
+def parse_where(expr):
+    """把条件表达式解析为 (SQL, 参数)，字段和运算符都有白名单；格式错误时抛出 ValueError"""
+    tokens = [t for t in re.split(r"\s+(?:and\s+)?", expr.strip(), flags=re.IGNORECASE) if t]
+    if not tokens:
+        raise ValueError("条件不能为空")
+
+    clauses, params = [], []
+    for token in tokens:
+        match = _CONDITION.match(token)
+        if not match or match.group(1).lower() not in WHERE_FIELDS:
+            raise ValueError(f"无法识别的条件: {token}（可用字段: {', '.join(sorted(WHERE_FIELDS))}）")
+        field, op, value = match.group(1).lower(), match.group(2), match.group(3)
+
+        if field == "jlpt":
+            if op not in ("=", "!="):
+                raise ValueError("jlpt 只支持 = 或 !=")
+            level = value.lower().replace("jlpt-", "")
+            clauses.append(f"jlpt {'NOT ' if op == '!=' else ''}LIKE ?")
+            params.append(f'%"jlpt-{level}"%')
+        elif field in ("word", "reading") and op in ("=", "!=") and any(c in value for c in "*?"):
+            clauses.append(f"{field} {'NOT ' if op == '!=' else ''}GLOB ?")
+            params.append(value)
+        elif field in ("stage", "is_common"):
+            clauses.append(f"{field} {op} ?")
+            params.append(int(value))
+        else:
+            clauses.append(f"{field} {op} ?")
+            params.append(value)
+    return " AND ".join(clauses), params
+
+
+def target_filter(target):
+    """set-stage 的目标：JLPT 等级（n5 / jlpt-n5）或单词通配符（食*）"""
+    if _JLPT_LEVEL.match(target):
+        return parse_where(f"jlpt={target}")
+    return parse_where(f"word={target}")
+
+
+def count_where(where_sql, params):
+    return db.get_connection().execute(f"SELECT COUNT(*) FROM vocab_progress WHERE {where_sql}", params).fetchone()[0]
+
+
+def preview_where(where_sql, params, limit=5):
+    rows = db.get_connection().execute(f"SELECT word FROM vocab_progress WHERE {where_sql} LIMIT ?", (*params, limit))
+    return [w for (w,) in rows]
+
+
+# ---------- 批量修改 ----------
+
+def set_stage(where_sql, params, stage, today=None):
+    """
+    一条 UPDATE 修改所有匹配单词的阶段。
+    stage=0 等同于重置；stage>0 时下次复习日期在 SQL 中按间隔加随机浮动计算。
+    """
+    if stage <= 0:
+        return reset_where(where_sql, params)
+
+    today = today or datetime.date.today().isoformat()
+    base = INTERVALS[min(stage - 1, len(INTERVALS) - 1)]
+    fuzz = max(1, int(base * 0.15)) if base > 4 else 0
+    with db.transaction() as conn:
+        return conn.execute(f"""
+            UPDATE vocab_progress
+            SET stage = ?,
+                last_review = ?,
+                first_seen = CASE WHEN first_seen IS NULL OR first_seen = '' THEN ? ELSE first_seen END,
+                next_review = date(?, '+' || max(1, ? + (abs(random()) % (2 * ? + 1)) - ?) || ' days')
+            WHERE {where_sql}
+        """, (stage, today, today, today, base, fuzz, fuzz, *params)).rowcount
+
+
+def reset_where(where_sql, params):
+    """一条 UPDATE 把匹配的单词重置为未学习（保留词典信息，不重新联网查询）"""
+    with db.transaction() as conn:
+        return conn.execute(f"""
+            UPDATE vocab_progress
+            SET stage = 0, first_seen = '', last_review = '', next_review = ''
+            WHERE {where_sql}
+        """, params).rowcount
+
+
+# ---------- 批量添加 ----------
+
+def read_word_file(path):
+    """每行一个单词，忽略空行和 # 注释，保持顺序去重"""
+    words = []
+    seen = set()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            word = line.split("#", 1)[0].strip()
+            if word and word not in seen:
+                seen.add(word)
+                words.append(word)
+    return words
+
+
+def print_progress(done, total, width=30):
+    # 大批量时只在每 1% 刷新一次，避免输出本身成为瓶颈
+    if done < total and done % max(1, total // 100):
+        return
+    filled = int(width * done / total) if total else width
+    sys.stdout.write(f"\r  [{'█' * filled}{'░' * (width - filled)}] {done}/{total}")
+    if done >= total:
+        sys.stdout.write("\n")
+    sys.stdout.flush()
+
+
+def add_words(words, workers=4, progress=print_progress):
+    """
+    批量添加单词，返回 (added, skipped, failed)。
+    已存在的单词在查询前就被过滤掉；所有新行在一个事务里写入。
+    """
+    existing = db.existing_words(words)
+    pending = [w for w in words if w not in existing]
+    skipped = [w for w in words if w in existing]
+
+    results = lookup_many(pending, workers=workers, progress=progress) if pending else {}
+
+    rows, failed = [], []
+    seen = set(existing)
+    for word in pending:
+        word_data = results.get(word) or {"error": "未知错误"}
+        if "error" in word_data:
+            failed.append((word, word_data["error"]))
+            continue
+        row = build_word_row(word, word_data)
+        if row["word"] in seen:
+            # 不同输入对应同一个词典写法（例如假名和汉字）
+            skipped.append(word)
+            continue
+        seen.add(row["word"])
+        rows.append(row)
+
+    # 词典写法也可能已经在库中
+    canonical_existing = db.existing_words(r["word"] for r in rows)
+    skipped.extend(r["word"] for r in rows if r["word"] in canonical_existing)
+    rows = [r for r in rows if r["word"] not in canonical_existing]
+
+    if rows:
+        with db.transaction() as conn:
+            db.insert_words(conn, rows)
+    return [r["word"] for r in rows], skipped, failed
@@ -1,117 +1,92 @@
-import sqlite3
+import os
+import sys
 import json
+import time
 import random
-import requests
 from datetime import datetime, timedelta
-from jisho_api import jisho_api
 
-DB_FILE = 'vocab/vocab.db'
+# 允许直接运行本脚本时导入项目根目录下的 common / vocab 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import REVIEW_INTERVALS
+from vocab import db, search, bulk, transfer
+from vocab.lookup import lookup_word_data, build_word_row
 
 # --- 计算下次复习日期 ---
 def calculate_next_review_date(current_stage):
-    intervals = [1, 2, 4, 7, 15, 30, 60, 90, 180]
+    intervals = REVIEW_INTERVALS
     base_interval = intervals[current_stage] if current_stage < len(intervals) else intervals[-1]
     fuzz = random.randint(-max(1, int(base_interval * 0.15)), max(1, int(base_interval * 0.15))) if base_interval > 4 else 0
     return max(1, base_interval + fuzz)
 
-# --- 添加单词到数据库 ---
-def add_word_to_db(word):
-    """添加新单词到数据库"""
+# --- 获取单词信息 ---
+def fetch_word_row(word):
+    """获取单词信息，返回可直接写入数据库的行；失败返回 None"""
     print(f"正在获取单词 '{word}' 的信息...")
     
-    # 调用Jisho API获取单词信息
-    word_data = jisho_api(word)
+    word_data = lookup_word_data(word)
     
     if "error" in word_data:
         print(f"获取单词信息失败: {word_data['error']}")
-        return False
-    
-    # 提取API返回的数据
-    word_form = word_data.get("word", word)  # 如果API返回空，使用原词
-    reading = word_data.get("reading", "")
-    definitions = word_data.get("definitions", [])
-    part_of_speech = word_data.get("part_of_speech", [])
-    is_common = word_data.get("is_common", 0)
-    jlpt = word_data.get("jlpt", [])
+        return None
     
-    # 将列表转换为JSON字符串
-    definitions_json = json.dumps(definitions) if definitions else ""
-    part_of_speech_json = json.dumps(part_of_speech) if part_of_speech else ""
-    jlpt_json = json.dumps(jlpt) if jlpt else ""
-    
-    # 连接数据库
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    return build_word_row(word, word_data)
+
+def print_added(row):
+    definitions = json.loads(row["definitions"]) if row["definitions"] else []
+    print(f"✓ 单词 '{row['word']}' 已成功添加到数据库")
+    print(f"  读音: {row['reading'] if row['reading'] else '暂无'}")
+    print(f"  释义: {', '.join(definitions[:3]) if definitions else '暂无'}")
+    print(f"  阶段: 0 (未学习)")
+
+# --- 添加单词到数据库 ---
+def add_word_to_db(word):
+    """添加新单词到数据库"""
+    # 网络请求放在事务之外，避免长时间占用写锁
+    row = fetch_word_row(word)
+    if row is None:
+        return False
     
     try:
-        # 检查单词是否已存在
-        cursor.execute("SELECT word FROM vocab_progress WHERE word=?", (word_form,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            print(f"单词 '{word_form}' 已在数据库中。")
-            conn.close()
-            return False
-        
-        # 插入新单词
-        cursor.execute('''
-        INSERT INTO vocab_progress 
-        (word, stage, first_seen, last_review, next_review, 
-         reading, definitions, part_of_speech, is_common, jlpt)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            word_form, 0, "", "", "",  # stage=0, 其他时间字段为空
-            reading, definitions_json, part_of_speech_json, is_common, jlpt_json
-        ))
-        
-        conn.commit()
-        print(f"✓ 单词 '{word_form}' 已成功添加到数据库")
-        print(f"  读音: {reading if reading else '暂无'}")
-        print(f"  释义: {', '.join(definitions[:3]) if definitions else '暂无'}")
-        print(f"  阶段: 0 (未学习)")
+        with db.transaction() as conn:
+            # 检查单词是否已存在
+            if db.word_exists(row["word"]):
+                print(f"单词 '{row['word']}' 已在数据库中。")
+                return False
+            
+            # 插入新单词
+            db.insert_word(conn, row)
         
-        conn.close()
+        print_added(row)
         return True
         
     except Exception as e:
         print(f"添加单词失败: {e}")
-        conn.rollback()
-        conn.close()
         return False
 
 # --- 统计功能 ---
 def get_statistics():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # 总单词数
-    cursor.execute("SELECT COUNT(*) FROM vocab_progress")
-    total_words = cursor.fetchone()[0]
-    
-    # 未学习单词数 (stage = 0)
-    cursor.execute("SELECT COUNT(*) FROM vocab_progress WHERE stage = 0")
-    unlearned_words = cursor.fetchone()[0]
+    conn = db.get_connection()
     
-    # 已学习单词数 (stage > 0)
-    cursor.execute("SELECT COUNT(*) FROM vocab_progress WHERE stage > 0")
-    learned_words = cursor.fetchone()[0]
-    
-    # 今日需要复习的单词数
+    # 总单词数 / 未学习 (stage = 0) / 已学习 (stage > 0) / 常用单词，一次扫描完成
     today = datetime.today().strftime("%Y-%m-%d")
-    cursor.execute("SELECT COUNT(*) FROM vocab_progress WHERE next_review <= ? AND stage > 0", (today,))
-    today_review = cursor.fetchone()[0]
+    total_words, unlearned_words, learned_words, today_review, common_words = conn.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(stage = 0), 0),
+               COALESCE(SUM(stage > 0), 0),
+               COALESCE(SUM(stage > 0 AND next_review <= ?), 0),
+               COALESCE(SUM(is_common = 1), 0)
+        FROM vocab_progress
+    """, (today,)).fetchone()
     
     # 各个stage的分布数
-    cursor.execute("SELECT stage, COUNT(*) FROM vocab_progress GROUP BY stage ORDER BY stage")
-    stage_distribution = cursor.fetchall()
-    
-    # 常用单词统计
-    cursor.execute("SELECT COUNT(*) FROM vocab_progress WHERE is_common = 1")
-    common_words = cursor.fetchone()[0]
+    stage_distribution = [tuple(row) for row in conn.execute(
+        "SELECT stage, COUNT(*) FROM vocab_progress GROUP BY stage ORDER BY stage")]
     
     # JLPT级别统计 - 使用精确解析
-    cursor.execute("SELECT jlpt FROM vocab_progress WHERE jlpt IS NOT NULL AND jlpt != ''")
-    jlpt_rows = cursor.fetchall()
+    jlpt_rows = conn.execute("SELECT jlpt FROM vocab_progress WHERE jlpt IS NOT NULL AND jlpt != ''").fetchall()
     
     # 解析JLPT数据
     jlpt_stats = {'N1': 0, 'N2': 0, 'N3': 0, 'N4': 0, 'N5': 0}
@@ -135,8 +110,6 @@ def get_statistics():
             except:
                 continue
     
-    conn.close()
-    
     return {
         'total_words': total_words,
         'unlearned_words': unlearned_words,
@@ -189,46 +162,82 @@ def show_statistics():
 
 # --- 重置单词（删除并重新添加） ---
 def reset_word(word):
-    """重置单词，删除后重新添加"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    """重置单词，重新获取信息后在同一个事务中删除并重新添加"""
+    row = fetch_word_row(word)
+    if row is None:
+        return False
     
-    # 删除原单词
-    cursor.execute("DELETE FROM vocab_progress WHERE word=?", (word,))
-    conn.commit()
-    conn.close()
+    try:
+        with db.transaction() as conn:
+            # 删除原单词（以及 Jisho 返回的规范写法，避免重复）
+            db.delete_word(conn, word)
+            db.delete_word(conn, row["word"])
+            db.insert_word(conn, row)
+    except Exception as e:
+        print(f"重置单词失败: {e}")
+        return False
     
-    # 重新添加单词
-    return add_word_to_db(word)
+    print_added(row)
+    return True
+
+# --- 搜索单词 ---
+RANK_LABELS = {
+    search.RANK_EXACT: "完全一致",
+    search.RANK_NORMALIZED: "读音/写法一致",
+    search.RANK_DEINFLECTED: "活用形",
+    search.RANK_PREFIX: "前缀",
+    search.RANK_FUZZY: "相似",
+}
+
+def print_candidates(candidates):
+    for i, (rank, score, word) in enumerate(candidates, 1):
+        data = db.get_word(word)
+        print(f"  {i}. {word} [{data['reading'] or '-'}]  stage {data['stage']}  ({RANK_LABELS[rank]})")
+
+def search_command(query):
+    candidates = db.search_words(query)
+    if not candidates:
+        print(f"没有找到与 '{query}' 相关的单词。")
+        return
+    print(f"\n'{query}' 的搜索结果:")
+    print_candidates(candidates)
+
+def confirm_not_duplicate(word):
+    """添加前检查读音 / 活用形等是否已经对应库中的单词，避免重复添加"""
+    duplicates = [c for c in db.search_words(word) if c[0] <= search.RANK_DEINFLECTED]
+    if not duplicates:
+        return True
+    print(f"'{word}' 可能已经在数据库中:")
+    print_candidates(duplicates)
+    return input("仍然要添加吗？(y/n): ").strip().lower() == 'y'
 
 # --- 查询单词 ---
 def query_word(word):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM vocab_progress WHERE word=?", (word,))
-    row = cursor.fetchone()
-    
-    if not row:
+    data = db.get_word(word)
+    
+    if not data:
+        # 单词不存在：先看看是否是已有单词的读音 / 活用形
+        candidates = db.search_words(word, limit=5)
+        if candidates:
+            print(f"单词 '{word}' 不在数据库中，你是否在找:")
+            print_candidates(candidates)
+            choice = input("输入序号查看该单词，直接回车跳过: ").strip()
+            if choice.isdigit() and 1 <= int(choice) <= len(candidates):
+                query_word(candidates[int(choice) - 1][2])
+                return
+            if any(c[0] <= search.RANK_DEINFLECTED for c in candidates):
+                return
+
         # 单词不存在，询问是否添加
         print(f"单词 '{word}' 不在数据库中。")
         add_option = input("是否添加该单词到数据库？(y/n): ").strip().lower()
         
         if add_option == 'y':
-            conn.close()
             # 调用添加单词功能
             if add_word_to_db(word):
                 # 添加成功后，重新查询显示
                 query_word(word)
-            return
-        else:
-            conn.close()
-            return
-    
-    # 解析数据
-    columns = ['word', 'stage', 'first_seen', 'last_review', 'next_review', 
-               'reading', 'definitions', 'part_of_speech', 'is_common', 'jlpt']
-    data = dict(zip(columns, row))
+        return
     
     # JSON 字段解析
     for field in ['definitions', 'part_of_speech', 'jlpt']:
@@ -284,7 +293,6 @@ def query_word(word):
                 if new_stage == 0:
                     # 特殊处理：stage=0表示重置单词
                     print("重置单词为未学习状态，将重新获取单词信息...")
-                    conn.close()
                     if reset_word(word):
                         # 重置成功后，重新查询显示
                         query_word(word)
@@ -303,14 +311,15 @@ def query_word(word):
                         data['first_seen'] = datetime.today().strftime("%Y-%m-%d")
                     
                     # 更新数据库
-                    cursor.execute('''
-                    UPDATE vocab_progress
-                    SET stage=?, last_review=?, next_review=?, first_seen=?
-                    WHERE word=?
-                    ''', (data['stage'], data['last_review'], data['next_review'], 
-                          data.get('first_seen'), word))
+                    with db.transaction() as conn:
+                        db.update_progress(conn, [{
+                            "stage": data['stage'],
+                            "first_seen": data.get('first_seen'),
+                            "last_review": data['last_review'],
+                            "next_review": data['next_review'],
+                            "word": word,
+                        }])
                     
-                    conn.commit()
                     print(f"\n✓ 更新完成！现在单词 '{word}' 的状态:")
                     print(f"  Stage: {data['stage']}")
                     print(f"  Last review: {data['last_review'] or '从未'}")
@@ -330,10 +339,9 @@ def query_word(word):
             confirm = input(f"确认要删除单词 '{word}' 吗？此操作不可撤销！(输入 'yes' 确认): ").strip().lower()
             
             if confirm == 'yes':
-                cursor.execute("DELETE FROM vocab_progress WHERE word=?", (word,))
-                conn.commit()
+                with db.transaction() as conn:
+                    db.delete_word(conn, word)
                 print(f"✓ 单词 '{word}' 已从数据库中删除。")
-                conn.close()
                 return  # 直接返回主菜单
             else:
                 print("✗ 删除操作已取消。")
@@ -344,8 +352,58 @@ def query_word(word):
         
         else:
             print("✗ 无效选项，请重新选择。")
-    
-    conn.close()
+
+# --- 批量命令 ---
+def confirm_bulk(where_sql, params, action):
+    count = bulk.count_where(where_sql, params)
+    if count == 0:
+        print("没有匹配的单词。")
+        return False
+    preview = bulk.preview_where(where_sql, params)
+    more = " ..." if count > len(preview) else ""
+    print(f"共 {count} 个单词匹配: {', '.join(preview)}{more}")
+    return input(f"确认{action}吗？(y/n): ").strip().lower() == 'y'
+
+def bulk_add_command(path):
+    try:
+        words = bulk.read_word_file(path)
+    except OSError as e:
+        print(f"✗ 无法读取文件: {e}")
+        return
+    print(f"正在批量添加 {len(words)} 个单词...")
+    start = time.perf_counter()
+    added, skipped, failed = bulk.add_words(words)
+    print(f"✓ 新增 {len(added)} 个，已存在 {len(skipped)} 个，失败 {len(failed)} 个 "
+          f"(耗时 {time.perf_counter() - start:.2f} 秒)")
+    for word, error in failed[:10]:
+        print(f"  ✗ {word}: {error}")
+
+def set_stage_command(argument):
+    parts = argument.split()
+    if len(parts) != 2 or not parts[1].lstrip('-').isdigit():
+        print("  用法: set-stage [单词通配符|n1-n5] [阶段]")
+        return
+    target, stage = parts[0], int(parts[1])
+    try:
+        where_sql, params = bulk.target_filter(target)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
+    if confirm_bulk(where_sql, params, f"将它们设置为 stage {stage}"):
+        print(f"✓ 已更新 {bulk.set_stage(where_sql, params, stage)} 个单词。")
+
+def reset_command(argument):
+    if not argument.startswith("--where"):
+        # 单个单词：重新获取信息并重置
+        reset_word(argument)
+        return
+    try:
+        where_sql, params = bulk.parse_where(argument[len("--where"):])
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
+    if confirm_bulk(where_sql, params, "将它们重置为未学习"):
+        print(f"✓ 已重置 {bulk.reset_where(where_sql, params)} 个单词。")
 
 # --- 解析命令 ---
 def parse_command(user_input):
@@ -375,6 +433,7 @@ if __name__ == "__main__":
         command, argument = parse_command(user_input)
         
         if command == 'exit':
+            db.close()
             print("バイバイ！")
             break
         
@@ -384,13 +443,22 @@ if __name__ == "__main__":
         elif command == 'help':
             print("\n可用命令:")
             print("  query [单词]     - 查询单词信息")
+            print("  search [关键词]  - 按读音/罗马字/活用形搜索")
             print("  add [单词]       - 添加新单词")
+            print("  add -f [文件]    - 从文件批量添加（每行一个单词）")
+            print("  set-stage [模式|n5] [阶段] - 批量修改阶段")
+            print("  reset [单词]     - 重置单词")
+            print("  reset --where [条件] - 批量重置，如: reset --where stage>=3 jlpt=n5")
+            print("  import [文件] [--update] - 从 Anki(.apkg)/CSV/TSV 导入")
+            print("  export [文件]    - 导出为 .apkg/.csv/.tsv")
             print("  stats           - 显示统计信息")
             print("  exit            - 退出程序")
             print("  help            - 显示此帮助")
             print("\n示例:")
             print("  query 夜         - 查询单词'夜'")
+            print("  search yoru      - 搜索读音为 よる 的单词")
             print("  add 山           - 添加单词'山'")
+            print("  set-stage 食* 2  - 把所有以'食'开头的单词设为 stage 2")
             print("  stats           - 显示学习统计\n")
         
         elif command == 'query':
@@ -400,13 +468,53 @@ if __name__ == "__main__":
             else:
                 query_word(argument)
         
+        elif command == 'search':
+            if not argument:
+                print("✗ 请指定要搜索的内容。")
+                print("  用法: search [关键词]")
+            else:
+                search_command(argument)
+        
         elif command == 'add':
             if not argument:
                 print("✗ 请指定要添加的单词。")
-                print("  用法: add [单词]")
-            else:
+                print("  用法: add [单词] / add -f [文件]")
+            elif argument.startswith("-f "):
+                bulk_add_command(argument[3:].strip())
+            elif confirm_not_duplicate(argument):
                 add_word_to_db(argument)
         
+        elif command == 'set-stage':
+            set_stage_command(argument)
+        
+        elif command == 'reset':
+            if not argument:
+                print("  用法: reset [单词] / reset --where [条件]")
+            else:
+                reset_command(argument)
+        
+        elif command == 'import':
+            path, update, _ = argument.partition(" --update")
+            path = path.strip()
+            if not path:
+                print("  用法: import [文件] [--update]")
+            elif not os.path.exists(path):
+                print(f"✗ 未找到文件: {path}")
+            else:
+                try:
+                    transfer.run_import(path, update=bool(update))
+                except ValueError as e:
+                    print(f"✗ {e}")
+        
+        elif command == 'export':
+            if not argument:
+                print("  用法: export [文件]")
+            else:
+                try:
+                    transfer.run_export(argument)
+                except ValueError as e:
+                    print(f"✗ {e}")
+        
         else:
             print(f"✗ 未知命令: {command}")
             print("  输入 'help' 查看可用命令")
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+单词库数据访问层
+
+每个线程一个长连接（WAL 模式 + 调优过的 pragma），
+SQL 语句写成模块级常量，依靠 sqlite3 的语句缓存重复使用预编译结果。
+写操作统一放在 transaction() 中显式提交，事务内不做任何网络请求，
+因此每日任务和打开着的 database_cmd 可以同时运行而不会出现 database is locked。
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from common import config, metrics
+from vocab import search
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=10000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",     # 约 16 MB 页缓存
+    "PRAGMA mmap_size=268435456",   # 256 MB 内存映射
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vocab_progress (
+    word TEXT PRIMARY KEY,
+    stage INTEGER,
+    first_seen TEXT,
+    last_review TEXT,
+    next_review TEXT,
+    reading TEXT,
+    definitions TEXT,
+    part_of_speech TEXT,
+    is_common INTEGER,
+    jlpt TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_vocab_stage_next ON vocab_progress (stage, next_review);
+"""
+
+# ---------- SQL 语句 ----------
+SQL_GET_WORD = "SELECT * FROM vocab_progress WHERE word=?"
+SQL_WORD_EXISTS = "SELECT 1 FROM vocab_progress WHERE word=?"
+SQL_INSERT_WORD = """
+    INSERT INTO vocab_progress
+    (word, stage, first_seen, last_review, next_review,
+     reading, definitions, part_of_speech, is_common, jlpt)
+    VALUES (:word, :stage, :first_seen, :last_review, :next_review,
+            :reading, :definitions, :part_of_speech, :is_common, :jlpt)
+"""
+SQL_DELETE_WORD = "DELETE FROM vocab_progress WHERE word=?"
+SQL_UPDATE_PROGRESS = """
+    UPDATE vocab_progress
+    SET stage = :stage, first_seen = :first_seen,
+        last_review = :last_review, next_review = :next_review
+    WHERE word = :word
+"""
+SQL_DUE_REVIEWS = """
+    SELECT * FROM vocab_progress
+    WHERE stage > 0 AND next_review <= ? AND next_review != ''
+    ORDER BY next_review ASC
+"""
+SQL_NEW_WORDS = "SELECT * FROM vocab_progress WHERE stage = 0 LIMIT ?"
+SQL_EXISTING_WORDS = "SELECT word FROM vocab_progress WHERE word IN ({})"
+
+_lock = threading.RLock()           # 写事务
+_connect_lock = threading.Lock()    # 打开连接、建表（不能用 _lock：别的线程的事务进行中时也要能打开连接）
+_local = threading.local()
+_connections = []       # 所有线程打开的连接，close() 时一起关闭
+_generation = 0         # close() 之后各线程的旧连接作废
+_schema_ready = False
+_search_checked = False
+
+
+def get_connection():
+    """
+    返回当前线程的连接，第一次调用时打开并初始化。
+    每个线程一个连接（WAL 模式下读操作互不阻塞）：一个线程的写事务进行中时，
+    其他线程的读操作看不到未提交的数据，建表等隐式提交也不会提交别的线程的事务。
+    """
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    with _connect_lock:
+        conn = sqlite3.connect(
+            config.VOCAB_DB_PATH,
+            timeout=10,
+            isolation_level=None,       # 自动提交模式，事务由 transaction() 显式控制
+            check_same_thread=False,    # 只有 close() 会在别的线程关闭它
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if not _schema_ready:
+            conn.executescript(SCHEMA)
+            conn.executescript(search.SEARCH_SCHEMA)
+            _schema_ready = True
+        _connections.append(conn)
+        _local.conn, _local.generation = conn, _generation
+    return conn
+
+
+@contextmanager
+def transaction():
+    """
+    显式写事务：BEGIN IMMEDIATE 立即拿到写锁，出错时整体回滚。
+    事务内不要做网络请求，保持事务尽量短。
+    """
+    with _lock:
+        conn = get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+
+def close():
+    global _generation, _schema_ready, _search_checked
+    with _lock, _connect_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+        _schema_ready = False
+        _search_checked = False
+
+
+# ---------- 查询 ----------
+
+@metrics.timed("sqlite_query", op="get_word")
+def get_word(word):
+    row = get_connection().execute(SQL_GET_WORD, (word,)).fetchone()
+    return dict(row) if row else None
+
+
+def word_exists(word):
+    return get_connection().execute(SQL_WORD_EXISTS, (word,)).fetchone() is not None
+
+
+@metrics.timed("sqlite_query", op="existing_words")
+def existing_words(words, chunk_size=500):
+    """返回 words 中已经在数据库里的单词集合（分块 IN 查询）"""
+    words = list(words)
+    found = set()
+    conn = get_connection()
+    for i in range(0, len(words), chunk_size):
+        chunk = words[i:i + chunk_size]
+        sql = SQL_EXISTING_WORDS.format(",".join("?" * len(chunk)))
+        found.update(w for (w,) in conn.execute(sql, chunk))
+    return found
+
+
+@metrics.timed("sqlite_query", op="due_reviews")
+def due_reviews(today):
+    return [dict(row) for row in get_connection().execute(SQL_DUE_REVIEWS, (today,))]
+
+
+@metrics.timed("sqlite_query", op="new_words")
+def new_words(limit):
+    return [dict(row) for row in get_connection().execute(SQL_NEW_WORDS, (limit,))]
+
+
+@metrics.timed("sqlite_query", op="search_words")
+def search_words(query, limit=10):
+    """按读音 / 罗马字 / 活用形 / 模糊匹配搜索单词，返回 [(rank, score, word), ...]"""
+    global _search_checked
+    conn = get_connection()
+    # 本进程内的增删都会同步维护索引，因此只需在第一次搜索时检查一次
+    if not _search_checked:
+        if not search.index_in_sync(conn):
+            with transaction():
+                search.rebuild_index(conn)
+        _search_checked = True
+    return search.search(conn, query, limit)
+
+
+# ---------- 写入（需在 transaction() 中调用） ----------
+
+def insert_word(conn, row):
+    conn.execute(SQL_INSERT_WORD, row)
+    search.index_word(conn, row["word"], row.get("reading"))
+
+
+@metrics.timed("sqlite_query", op="insert_words")
+def insert_words(conn, rows):
+    """批量插入（单条 executemany），同时维护搜索索引"""
+    conn.executemany(SQL_INSERT_WORD, rows)
+    for row in rows:
+        search.index_word(conn, row["word"], row.get("reading"))
+
+
+def delete_word(conn, word):
+    search.unindex_word(conn, word)
+    return conn.execute(SQL_DELETE_WORD, (word,)).rowcount
+
+
+@metrics.timed("sqlite_query", op="update_progress")
+def update_progress(conn, updates):
+    """updates: [{"word", "stage", "first_seen", "last_review", "next_review"}, ...]"""
+    conn.executemany(SQL_UPDATE_PROGRESS, updates)
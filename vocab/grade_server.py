@@ -0,0 +1,173 @@
+"""
+评分服务
+
+接收邮件中评分链接的点击（GET /grade?...），校验签名后放入队列，
+每 GRADE_FLUSH_INTERVAL 秒或积累到 GRADE_BATCH_SIZE 条时在一个事务中写入数据库。
+同一个单词同一次复习多次点击时，以最后一次为准。
+
+只依赖标准库 asyncio，不需要额外的 Web 框架；默认只监听本机。
+
+用法:
+    python vocab/grade_server.py [--host 127.0.0.1] [--port 8766]
+    python vocab/grade_server.py stats      # 最近 30 天的评分统计
+"""
+import os
+import sys
+import asyncio
+import argparse
+from html import escape
+from urllib.parse import urlsplit, parse_qs
+
+# 允许直接运行本脚本时导入项目根目录下的 common / vocab 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import GRADE_HOST, GRADE_PORT, GRADE_FLUSH_INTERVAL, GRADE_BATCH_SIZE, VOCAB_DB_PATH
+from vocab import db, grading
+
+MAX_REQUEST_LINE = 8192
+
+PAGE = """<!doctype html><html><head><meta charset="utf-8"><title>日语单词助手</title></head>
+<body style="font-family:sans-serif;text-align:center;padding-top:40px;color:#2c3e50">{body}</body></html>"""
+
+
+class GradeServer:
+    def __init__(self, flush_interval=GRADE_FLUSH_INTERVAL, batch_size=GRADE_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # (用户, 单词, 复习日期) -> 评分，同一次复习只保留最后一次点击
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.applied = 0
+        self.received = 0
+
+    # ---------- HTTP ----------
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+            # 读完请求头（内容不需要）
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=10)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            status, body = self.route(request_line[:MAX_REQUEST_LINE].decode("latin-1"))
+        except (asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+
+        payload = PAGE.format(body=body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/html; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("ascii") + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def route(self, request_line):
+        parts = request_line.split()
+        if len(parts) < 2 or parts[0] != "GET":
+            return "405 Method Not Allowed", "<p>只支持 GET</p>"
+        url = urlsplit(parts[1])
+        if url.path == "/health":
+            return "200 OK", f"<p>ok: 已接收 {self.received} / 已写入 {self.applied} / 等待 {len(self.pending)}</p>"
+        if url.path != "/grade":
+            return "404 Not Found", "<p>未知地址</p>"
+
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            user_id, word, review_date = query["u"], query["w"], query["d"]
+            stage, grade, signature = int(query["s"]), query["g"], query["t"]
+        except (KeyError, ValueError):
+            return "400 Bad Request", "<p>链接不完整</p>"
+        if not grading.verify(user_id, word, review_date, stage, grade, signature):
+            return "403 Forbidden", "<p>链接无效或已被修改</p>"
+
+        self.pending[(user_id, word, review_date)] = {
+            "user_id": user_id, "word": word, "review_date": review_date, "stage": stage, "grade": grade,
+        }
+        self.received += 1
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+        return "200 OK", f"<h2>{escape(word)}</h2><p>已记录：{grading.GRADES[grade]}</p>"
+
+    # ---------- 批量写入 ----------
+
+    async def flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch = list(self.pending.values())
+        self.pending.clear()
+        # SQLite 写入是阻塞操作，放到线程池中执行，不阻塞接收请求
+        loop = asyncio.get_running_loop()
+        try:
+            applied = await loop.run_in_executor(None, grading.apply_grades, batch)
+        except Exception as e:
+            print(f"❌ 评分写入失败，稍后重试: {e}")
+            for g in batch:
+                self.pending.setdefault((g["user_id"], g["word"], g["review_date"]), g)
+            return
+        self.applied += applied
+        print(f"✅ 已写入 {applied}/{len(batch)} 条评分" + ("（其余链接已过期）" if applied < len(batch) else ""))
+
+
+async def serve(host=GRADE_HOST, port=GRADE_PORT, ready=None, server_state=None):
+    state = server_state or GradeServer()
+    server = await asyncio.start_server(state.handle, host, port)
+    flusher = asyncio.create_task(state.flush_loop())
+    print(f"📝 评分服务已启动: http://{host}:{server.sockets[0].getsockname()[1]}/grade")
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        flusher.cancel()
+        await state.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="接收邮件中的复习评分")
+    parser.add_argument("command", nargs="?", default="serve", choices=["serve", "stats"])
+    parser.add_argument("--host", default=GRADE_HOST)
+    parser.add_argument("--port", type=int, default=GRADE_PORT)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(VOCAB_DB_PATH):
+        print(f"❌ 未找到数据库文件: {VOCAB_DB_PATH}")
+        return
+
+    try:
+        if args.command == "stats":
+            summary = grading.grade_summary()
+            total = sum(summary.values())
+            print(f"📊 最近 30 天共 {total} 次评分")
+            for grade, label in grading.GRADES.items():
+                count = summary.get(grade, 0)
+                print(f"   {label}({grade}): {count} ({count / total:.0%})" if total else f"   {label}({grade}): 0")
+            return
+
+        if not grading.enabled():
+            print("⚠️ 未设置 GRADE_SECRET，邮件中不会有评分链接，所有请求都会被拒绝。")
+        try:
+            asyncio.run(serve(args.host, args.port))
+        except KeyboardInterrupt:
+            print("👋 评分服务已停止")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+复习评分
+
+邮件中每个单词带有 4 个签名链接（忘记 / 模糊 / 记得 / 简单），指向本地的评分服务（vocab/grade_server.py）。
+发送邮件后仍按“记得”推进 stage（没有点击评分的单词与以前的行为一致），
+收到评分后再根据复习前的 stage 重新计算 stage 和下次复习日期：
+
+    again  忘记   stage 回到 1，明天再复习
+    hard   模糊   stage 不变，间隔缩短为上一级
+    good   记得   与默认相同
+    easy   简单   多跳一级，间隔加长
+
+链接使用 HMAC 签名（GRADE_SECRET），包含用户、单词、复习日期和复习前的 stage；
+只有数据库中 last_review 仍是该日期时才会生效，过期的链接不会覆盖之后的复习。
+未设置 GRADE_SECRET 时邮件中不显示评分链接。
+"""
+import hmac
+import base64
+import hashlib
+import datetime
+from urllib.parse import urlencode
+
+from common.config import GRADE_SECRET, GRADE_BASE_URL, REVIEW_INTERVALS as INTERVALS
+from common import metrics
+from vocab import db, learners
+
+GRADES = {"again": "忘记", "hard": "模糊", "good": "记得", "easy": "简单"}
+
+GRADE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_log (
+    user_id TEXT,
+    word TEXT,
+    review_date TEXT,
+    grade TEXT,
+    graded_at TEXT,
+    PRIMARY KEY (user_id, word, review_date)
+) WITHOUT ROWID;
+"""
+
+_schema_ready = False
+
+
+def enabled():
+    return bool(GRADE_SECRET)
+
+
+# ---------- 签名链接 ----------
+
+def sign(user_id, word, review_date, stage, grade, secret=None):
+    message = "\x1f".join([user_id, word, review_date, str(stage), grade]).encode("utf-8")
+    digest = hmac.new((secret or GRADE_SECRET).encode("utf-8"), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode("ascii")
+
+
+def verify(user_id, word, review_date, stage, grade, signature, secret=None):
+    if grade not in GRADES or not (secret or GRADE_SECRET):
+        return False
+    return hmac.compare_digest(sign(user_id, word, review_date, stage, grade, secret), signature or "")
+
+
+def grade_links(user_id, word, review_date, stage):
+    """返回 [(评分, 显示文字, 链接)]；未启用评分时返回空列表"""
+    if not enabled():
+        return []
+    links = []
+    for grade, label in GRADES.items():
+        query = urlencode({
+            "u": user_id, "w": word, "d": review_date, "s": stage, "g": grade,
+            "t": sign(user_id, word, review_date, stage, grade),
+        })
+        links.append((grade, label, f"{GRADE_BASE_URL.rstrip('/')}/grade?{query}"))
+    return links
+
+
+# ---------- 调度 ----------
+
+def _interval(stage):
+    return INTERVALS[min(max(stage, 0), len(INTERVALS) - 1)]
+
+
+def reschedule(stage, grade, review_date, graded_date):
+    """
+    stage: 复习前的 stage；review_date: 发邮件的日期；graded_date: 点击评分的日期
+    返回 (新 stage, 下次复习日期)
+    """
+    review = datetime.date.fromisoformat(review_date)
+    graded = datetime.date.fromisoformat(graded_date)
+    if grade == "again":
+        return 1, (graded + datetime.timedelta(days=_interval(0))).isoformat()
+    if grade == "hard":
+        return max(1, stage), (graded + datetime.timedelta(days=_interval(stage - 1))).isoformat()
+    if grade == "easy":
+        return stage + 2, (review + datetime.timedelta(days=_interval(stage + 1))).isoformat()
+    return stage + 1, (review + datetime.timedelta(days=_interval(stage))).isoformat()
+
+
+def _conn():
+    global _schema_ready
+    conn = db.get_connection()
+    if not _schema_ready:
+        conn.executescript(GRADE_SCHEMA)
+        _schema_ready = True
+    return conn
+
+
+def ensure_schema():
+    """建表（并发使用前先在主线程调用一次）"""
+    _conn()
+
+
+@metrics.timed("sqlite_query", op="apply_grades")
+def apply_grades(grades, today=None):
+    """
+    grades: [{"user_id", "word", "review_date", "stage", "grade"}]，在一个事务中写入。
+    返回实际生效的数量（复习日期与 last_review 不一致的会被忽略）。
+    """
+    today = today or datetime.date.today().isoformat()
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    _conn()
+    learners.ensure_schema()
+    applied = 0
+    with db.transaction() as conn:
+        for g in grades:
+            stage, next_review = reschedule(g["stage"], g["grade"], g["review_date"], today)
+            if g["user_id"] == learners.DEFAULT_USER:
+                cursor = conn.execute(
+                    "UPDATE vocab_progress SET stage=?, next_review=? WHERE word=? AND last_review=?",
+                    (stage, next_review, g["word"], g["review_date"]),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE learner_progress SET stage=?, next_review=? WHERE user_id=? AND word=? AND last_review=?",
+                    (stage, next_review, g["user_id"], g["word"], g["review_date"]),
+                )
+            if cursor.rowcount:
+                applied += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO review_log (user_id, word, review_date, grade, graded_at) VALUES (?, ?, ?, ?, ?)",
+                    (g["user_id"], g["word"], g["review_date"], g["grade"], now),
+                )
+    return applied
+
+
+def grade_summary(days=30):
+    """最近几天各评分的数量"""
+    since = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+    rows = _conn().execute(
+        "SELECT grade, COUNT(*) FROM review_log WHERE review_date >= ? GROUP BY grade", (since,),
+    )
+    return dict(rows.fetchall())
@@ -0,0 +1,395 @@
+"""
+从阅读文章和听力转写中收集生词
+
+用本地词典分词（SudachiPy 或 fugashi + UniDic，不联网），把每篇文章 / 转写还原为词典形，
+合并被拆开的复合名词（図書 + 館），去掉复合助词中的动词（について 的 つく）、
+助词等功能词、停用词和词库中已有的单词（词库的单词和读音一次性读入内存集合），
+剩下的按出现次数、JLPT 等级和常用程度排序，前 HARVEST_MAX_WORDS 个作为 stage 0 新词写入词库。
+
+每个来源按内容哈希只处理一次（harvest_sources 表），重复运行不会重复收词。
+文章和转写中的句子同时加入例句库（见 vocab/sentences.py）。
+分词器只创建一次，所有来源在同一批中处理。
+
+来源:
+    - 今天 read 阶段生成的文章（运行日志中的 generate 检查点）
+    - 今天 listen 阶段整理过的转写（运行日志中的 ai_response 检查点；发送后 *.txt 已被删除）
+    - AUDIO_DIR 中还没有发送的转写结果 *.txt
+    - 命令行指定的文件（.txt / .html）
+
+用法:
+    python vocab/harvest.py                    # 处理今天的文章和转写
+    python vocab/harvest.py a.txt b.html       # 处理指定文件
+    python vocab/harvest.py --dry-run          # 只显示候选词，不写入
+"""
+import os
+import re
+import sys
+import glob
+import hashlib
+import argparse
+import datetime
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+# 允许直接运行本脚本时导入项目根目录下的 common / vocab 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import (
+    VOCAB_DB_PATH, AUDIO_DIR, HARVEST_TOKENIZER, HARVEST_MAX_WORDS, HARVEST_MIN_COUNT, HARVEST_JLPT_LIST,
+)
+from common import metrics
+from common.text import japanese_text
+from vocab import db, sentences
+from vocab.jmdict import get_dictionary
+from vocab.lookup import build_word_row
+
+HARVEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS harvest_sources (
+    hash TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    harvested_at TEXT NOT NULL,
+    words INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# 收集的词性（UniDic / Sudachi 的第一层词性相同）；代名词、助词、助动词、记号等不收
+CONTENT_POS = {"名詞", "動詞", "形容詞", "形状詞", "副詞"}
+# 第二层词性为这些时不收：数词、专有名词、形式名词 / 补助动词（こと、いる、する 等）
+EXCLUDED_POS2 = {"数詞", "固有名詞", "非自立可能", "助数詞可能"}
+
+# 分词能得到但不值得学的高频词
+STOP_WORDS = frozenset("""
+する ある いる なる れる られる できる よる 言う いう 思う 見る 来る 行く いく くる おる やる もらう くれる あげる
+こと もの ところ とき 時 方 人 中 前 後 上 下 日 年 月 今 今日 明日 昨日 私 僕 自分 皆さん
+ため よう そう こう どう ここ そこ あそこ これ それ あれ どれ
+とても もう まだ すぐ よく また 少し ちょっと たくさん 本当 大丈夫 いい 良い ない 多い
+""".split())
+
+# 复合助词中的动词：前一个助词 -> 动词的表层形（について 中的 つい 不是「付く」）
+COMPOUND_PARTICLES = {
+    "に": frozenset("""
+つい つき よっ より よる とっ 対し 対する 対 おい おける 関し 関する 基づい 基づき 基づく 従っ 従い
+応じ 沿っ 沿い わたっ わたり わたる 渡っ 渡り 向け かけ 際し 比べ 加え 伴っ 伴い 限っ 限り 当たっ 当たり あたっ あたり
+""".split()),
+    "を": frozenset("通し 通じ めぐっ 巡っ もっ 除い 問わ 始め はじめ".split()),
+}
+
+_JAPANESE = re.compile(r"^[぀-ヿ一-鿿々ー]+$")
+_HAS_KANJI = re.compile(r"[一-鿿々]")
+
+_schema_ready = False
+
+
+def _conn():
+    global _schema_ready
+    conn = db.get_connection()
+    if not _schema_ready:
+        conn.executescript(HARVEST_SCHEMA)
+        _schema_ready = True
+    return conn
+
+
+# ---------- 文本 ----------
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ---------- 分词 ----------
+
+@lru_cache(maxsize=1)
+def get_tokenizer(name=HARVEST_TOKENIZER):
+    """
+    返回 (名称, 分词函数)；分词函数把文本转换为 [(表层形, 词典形, 词性1, 词性2)]。
+    分词器只创建一次（加载词典约需 0.1~1 秒）。都没有安装时返回 None。
+    auto 优先用 Sudachi：C 模式按长单位切分（図書館、少子化），UniDic 是短单位（図書 + 館）。
+    """
+    if name in ("auto", "sudachi"):
+        try:
+            from sudachipy import Dictionary, SplitMode
+            dictionary = Dictionary()
+            # 0.7 起 create() 改名为 tokenizer()
+            tokenizer = getattr(dictionary, "tokenizer", dictionary.create)(mode=SplitMode.C)
+
+            def tokenize_sudachi(text):
+                return [(m.surface(), m.dictionary_form(), *m.part_of_speech()[:2]) for m in tokenizer.tokenize(text)]
+            return "sudachi", tokenize_sudachi
+        except ImportError:
+            if name == "sudachi":
+                return None
+    if name in ("auto", "fugashi"):
+        try:
+            import fugashi
+            tagger = fugashi.Tagger()
+
+            def tokenize_fugashi(text):
+                # orthBase 是书面的词典形（読む、とても）；lemma 会变成 迚も、為る 这样的写法
+                return [(w.surface, w.feature.orthBase or w.surface, w.feature.pos1, w.feature.pos2)
+                        for w in tagger(text)]
+            return "fugashi", tokenize_fugashi
+        except (ImportError, RuntimeError):
+            return None
+    return None
+
+
+def is_candidate(lemma, pos1, pos2):
+    if pos1 not in CONTENT_POS or pos2 in EXCLUDED_POS2 or lemma in STOP_WORDS:
+        return False
+    if not _JAPANESE.match(lemma):
+        return False
+    # 单个假名基本都是分词碎片
+    return len(lemma) > 1 or bool(_HAS_KANJI.search(lemma))
+
+
+def join_compounds(tokens, dictionary):
+    """
+    UniDic 短单位会把复合名词拆开（図書館 -> 図書 + 館），
+    连续的名词 / 名词性接头接尾辞中，词典里有的最长组合合并成一个词（词性按名词）。
+    """
+    merged = []
+    i = 0
+    while i < len(tokens):
+        end = i
+        while end < len(tokens) and _is_compound_part(tokens[end]):
+            end += 1
+        j = end
+        while j - i > 1 and dictionary.word_info("".join(t[0] for t in tokens[i:j])) is None:
+            j -= 1
+        if j - i > 1:
+            surface = "".join(t[0] for t in tokens[i:j])
+            merged.append((surface, surface, "名詞", "普通名詞"))
+            i = j
+        else:
+            merged.append(tokens[i])
+            i += 1
+    return merged
+
+
+def _is_compound_part(token):
+    _, _, pos1, pos2 = token
+    if pos1 == "名詞":
+        return pos2 not in ("数詞", "固有名詞")
+    return pos1 == "接頭辞" or (pos1 == "接尾辞" and pos2 == "名詞的")
+
+
+def is_compound_particle(tokens, index):
+    """动词是复合助词的一部分（に + つい + て = について、に + よっ + て = によって）"""
+    return index > 0 and tokens[index][0] in COMPOUND_PARTICLES.get(tokens[index - 1][0], ())
+
+
+def count_lemmas(tokenize, texts, dictionary=None):
+    """所有来源一起统计词典形出现次数；有本地 JMdict 时合并分词器拆开的复合名词"""
+    counts = Counter()
+    for text in texts:
+        # Sudachi 对单次输入有长度限制（约 49KB），按行分词
+        for line in text.splitlines():
+            tokens = tokenize(unicodedata.normalize("NFKC", line))
+            if dictionary is not None:
+                tokens = join_compounds(tokens, dictionary)
+            for index, (_, lemma, pos1, pos2) in enumerate(tokens):
+                if pos1 == "動詞" and is_compound_particle(tokens, index):
+                    continue
+                if is_candidate(lemma, pos1, pos2):
+                    counts[lemma] += 1
+    return counts
+
+
+# ---------- 筛选 ----------
+
+def known_words():
+    """词库中所有单词和读音（一次查询读入内存，之后每次判断都是集合查找）"""
+    known = set()
+    for word, reading in db.get_connection().execute("SELECT word, reading FROM vocab_progress"):
+        known.add(word)
+        if reading:
+            known.add(reading)
+    return known
+
+
+_JLPT = re.compile(r"n([1-5])\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1)
+def jlpt_list(path=HARVEST_JLPT_LIST):
+    """
+    读取 JLPT 词表（每行: 单词<制表符或逗号>等级，等级写 N3 / jlpt-n3 都可以），返回 {单词: 等级数字}。
+    JMdict 不含 JLPT 等级，没有配置词表时返回空字典。
+    """
+    levels = {}
+    if not path or not os.path.exists(path):
+        return levels
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            fields = re.split(r"[\t,]", line.strip())
+            match = _JLPT.search(" ".join(fields[1:]))
+            if fields[0] and match:
+                # 同一个词出现在多个等级时取最简单的（数字最大）
+                levels[fields[0]] = max(levels.get(fields[0], 0), int(match.group(1)))
+    return levels
+
+
+def jlpt_level(word, info):
+    """单词的 JLPT 等级（5 = N5 ... 1 = N1）；Jisho 来源的词条信息优先，其次是 JLPT 词表，都没有时为 None"""
+    tags = (info or {}).get("jlpt") or []
+    levels = [int(m.group(1)) for m in map(_JLPT.search, tags) if m]
+    if levels:
+        return max(levels)
+    table = jlpt_list()
+    for key in (word, (info or {}).get("word"), (info or {}).get("reading")):
+        if key in table:
+            return table[key]
+    return None
+
+
+def rank_candidates(counts, known, limit=HARVEST_MAX_WORDS, min_count=HARVEST_MIN_COUNT):
+    """
+    去掉已知词后排序，返回 [(单词, 次数, 词典信息)]。
+    有本地 JMdict 时只保留词典中有的词（顺便滤掉分词错误）。
+    次数相同时有 JLPT 等级的词排在前面（N5 -> N1），没有等级的词再按 JMdict 的常用标记排序。
+    """
+    dictionary = get_dictionary()
+    ranked = []
+    for lemma, count in counts.items():
+        if count < min_count or lemma in known:
+            continue
+        info = dictionary.word_info(lemma) if dictionary is not None else None
+        if dictionary is not None:
+            if not info or info["word"] in known or info["reading"] in known:
+                continue
+        ranked.append((lemma, count, info))
+
+    def sort_key(item):
+        lemma, count, info = item
+        level = jlpt_level(lemma, info)
+        if level is not None:
+            return (-count, 0, -level, lemma)
+        return (-count, 1, not (info and info["is_common"]), lemma)
+
+    ranked.sort(key=sort_key)
+    return ranked[:limit]
+
+
+# ---------- 来源 ----------
+
+def todays_sources():
+    """[(来源名, 内容)]：今天生成的阅读文章 + 今天发送的听力材料 + 还没发送的转写"""
+    from common.journal import RunJournal
+
+    sources = []
+    journal = RunJournal("read")
+    try:
+        article = journal.get("generate")
+    finally:
+        journal.close()
+    if article:
+        sources.append((f"read:{journal.run_date}", article))
+
+    # listen-send 发送后会删除 *.txt，已发送的转写从运行日志中取（加过标点、分好段的日语）
+    journal = RunJournal("listen")
+    try:
+        responses = journal.values("ai_response")
+    finally:
+        journal.close()
+    for name, (_, japanese, _) in responses.items():
+        sources.append((name, japanese))
+
+    for path in sorted(glob.glob(os.path.join(AUDIO_DIR, "*.txt"))):
+        if os.path.basename(path) in responses:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            sources.append((os.path.basename(path), f.read()))
+    return sources
+
+
+def file_sources(paths):
+    sources = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            sources.append((os.path.basename(path), f.read()))
+    return sources
+
+
+def new_sources(sources):
+    """去掉已经处理过的来源（按日语正文的哈希），返回 [(来源名, 哈希, 正文)]"""
+    prepared = []
+    for name, content in sources:
+        text = japanese_text(content)
+        if text:
+            prepared.append((name, content_hash(text), text))
+    if not prepared:
+        return []
+    hashes = [h for _, h, _ in prepared]
+    done = {h for (h,) in _conn().execute(
+        f"SELECT hash FROM harvest_sources WHERE hash IN ({','.join('?' * len(hashes))})", hashes,
+    )}
+    return [item for item in prepared if item[1] not in done]
+
+
+# ---------- 主流程 ----------
+
+def harvest(sources, limit=HARVEST_MAX_WORDS, dry_run=False):
+    """返回写入的新词列表"""
+    pending = new_sources(sources)
+    if not pending:
+        print("✅ 没有新的阅读 / 听力内容需要收词。")
+        return []
+    if not dry_run:
+        # 句子同时存入例句库（不依赖分词器）
+        added = sum(sentences.add_text(text, source) for source, _, text in pending)
+        print(f"📚 {added} 个句子已加入例句库")
+
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        print("⚠️ 未安装分词器，跳过收词（pip install fugashi unidic-lite 或 sudachipy sudachidict_core）")
+        return []
+    name, tokenize = tokenizer
+
+    with metrics.span("harvest_tokenize", tokenizer=name):
+        counts = count_lemmas(tokenize, [text for _, _, text in pending], get_dictionary())
+    ranked = rank_candidates(counts, known_words(), limit)
+    print(f"🔎 {len(pending)} 篇内容中有 {len(counts)} 个实词，其中 {len(ranked)} 个生词入选 (分词器: {name})")
+    for word, count, info in ranked:
+        reading = f" [{info['reading']}]" if info and info["reading"] else ""
+        print(f"   {word}{reading} ×{count}")
+    if dry_run:
+        return [word for word, _, _ in ranked]
+
+    # 不同的词典形可能对应同一个词条（假名写法 -> 汉字写法），按最终写法去重
+    unique = {}
+    for word, _, info in ranked:
+        row = build_word_row(word, info or {})
+        unique.setdefault(row["word"], row)
+    rows = list(unique.values())
+    today = datetime.date.today().isoformat()
+    with db.transaction() as conn:
+        db.insert_words(conn, rows)
+        conn.executemany(
+            "INSERT OR REPLACE INTO harvest_sources (hash, source, harvested_at, words) VALUES (?, ?, ?, ?)",
+            [(h, source, today, len(rows)) for source, h, _ in pending],
+        )
+    metrics.incr("vocab_words", len(rows), source="harvest")
+    print(f"✅ 已添加 {len(rows)} 个新词（stage 0）")
+    return [row["word"] for row in rows]
+
+
+@metrics.stage("vocab-harvest")
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="从阅读文章和听力转写中收集生词")
+    parser.add_argument("paths", nargs="*", help="要处理的文件（默认: 今天的文章和 audio 中的转写）")
+    parser.add_argument("--limit", type=int, default=HARVEST_MAX_WORDS, help=f"最多添加几个词（默认 {HARVEST_MAX_WORDS}）")
+    parser.add_argument("--dry-run", action="store_true", help="只显示候选词，不写入数据库")
+    # 作为流水线阶段运行时不读取 sys.argv（那是流水线自己的参数）
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(VOCAB_DB_PATH):
+        print(f"❌ 未找到数据库文件: {VOCAB_DB_PATH}")
+        return
+    sources = file_sources(args.paths) if args.paths else todays_sources()
+    harvest(sources, args.limit, args.dry_run)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
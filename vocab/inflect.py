@@ -0,0 +1,226 @@
+"""
+本地活用（变形）生成
+
+根据数据库中已有的词性（Jisho / JMdict 的英文标签）按规则生成动词和形容词的常用活用形，
+以及中文词性说明。结果是确定的，不需要调用 LLM。
+
+支持:
+    五段动词（含 行く、問う、くださる 等特殊类）、一段动词、サ变动词（名词 + する）、カ变动词、
+    い形容词（含 いい）、な形容词
+名词、副词等没有活用，返回空列表。
+
+用法:
+    python vocab/inflect.py 食べる "Ichidan verb"
+"""
+import sys
+
+# 五段动词词尾 -> (あ段, い段, え段, お段, て形, た形)
+GODAN = {
+    "う": ("わ", "い", "え", "お", "って", "った"),
+    "く": ("か", "き", "け", "こ", "いて", "いた"),
+    "ぐ": ("が", "ぎ", "げ", "ご", "いで", "いだ"),
+    "す": ("さ", "し", "せ", "そ", "して", "した"),
+    "つ": ("た", "ち", "て", "と", "って", "った"),
+    "ぬ": ("な", "に", "ね", "の", "んで", "んだ"),
+    "ぶ": ("ば", "び", "べ", "ぼ", "んで", "んだ"),
+    "む": ("ま", "み", "め", "も", "んで", "んだ"),
+    "る": ("ら", "り", "れ", "ろ", "って", "った"),
+}
+
+# 英文词性标签（前缀） -> 中文，按顺序匹配
+POS_LABELS = [
+    ("Godan verb", "五段动词"),
+    ("Ichidan verb", "一段动词"),
+    ("Suru verb", "サ变动词"),
+    ("Kuru verb", "カ变动词"),
+    ("Transitive verb", "他动词"),
+    ("Intransitive verb", "自动词"),
+    ("Auxiliary verb", "助动词"),
+    ("I-adjective", "い形容词"),
+    ("Na-adjective", "な形容词"),
+    ("No-adjective", "の形容词"),
+    ("Pre-noun adjectival", "连体词"),
+    ("Adverb", "副词"),
+    ("Temporal noun", "时间名词"),
+    ("Noun", "名词"),
+    ("Pronoun", "代词"),
+    ("Expressions", "惯用语"),
+    ("Particle", "助词"),
+    ("Conjunction", "连词"),
+    ("Interjection", "感叹词"),
+    ("Counter", "量词"),
+    ("Numeric", "数词"),
+    ("Suffix", "后缀"),
+    ("Prefix", "前缀"),
+]
+# 不是词性的标签（Jisho 会混入）
+IGNORED_LABELS = ("Wikipedia definition", "Place", "Full name", "Other forms", "Notes")
+
+
+def _has(pos_list, prefix):
+    return any(p.startswith(prefix) for p in pos_list)
+
+
+def classify(word, pos_list):
+    """返回活用类型: godan / ichidan / suru / suru-special / kuru / i-adj / ii-adj / na-adj / None"""
+    if _has(pos_list, "Kuru verb"):
+        return "kuru"
+    if _has(pos_list, "Suru verb - special class"):
+        return "suru-special"
+    if _has(pos_list, "Godan verb") and word[-1:] in GODAN:
+        return "godan"
+    if _has(pos_list, "Ichidan verb") and word.endswith("る") and not _has(pos_list, "Ichidan verb - zuru"):
+        return "ichidan"
+    if _has(pos_list, "Suru verb"):
+        return "suru"
+    if _has(pos_list, "I-adjective") and word.endswith("い"):
+        return "ii-adj" if _has(pos_list, "I-adjective (keiyoushi) - yoi/ii") and word.endswith("いい") else "i-adj"
+    if _has(pos_list, "Na-adjective"):
+        return "na-adj"
+    return None
+
+
+def _godan(word, pos_list):
+    stem, (a, i, e, o, te, ta) = word[:-1], GODAN[word[-1]]
+    if _has(pos_list, "Godan verb - Iku/Yuku"):
+        te, ta = "って", "った"
+    elif _has(pos_list, "Godan verb with 'u' ending (special"):
+        # 問う、請う: 問うて / 問うた
+        te, ta = "うて", "うた"
+    masu = stem + i + "ます"
+    if _has(pos_list, "Godan verb - -aru"):
+        # くださる、いらっしゃる、おっしゃる、なさる、ござる
+        masu = stem + "います"
+    # ある 的否定是 ない
+    negative = "ない" if word in ("ある", "有る", "在る") else stem + a + "ない"
+    return [
+        ("ます形", masu),
+        ("て形", stem + te),
+        ("た形", stem + ta),
+        ("ない形", negative),
+        ("可能形", stem + e + "る"),
+        ("被动形", stem + a + "れる"),
+        ("使役形", stem + a + "せる"),
+        ("意志形", stem + o + "う"),
+        ("假定形", stem + e + "ば"),
+    ]
+
+
+def _ichidan(word):
+    stem = word[:-1]
+    return [
+        ("ます形", stem + "ます"),
+        ("て形", stem + "て"),
+        ("た形", stem + "た"),
+        ("ない形", stem + "ない"),
+        ("可能/被动形", stem + "られる"),
+        ("使役形", stem + "させる"),
+        ("意志形", stem + "よう"),
+        ("假定形", stem + "れば"),
+    ]
+
+
+def _suru(word, special=False):
+    # 名词 + する（勉強 -> 勉強する）；词中已经包含 する 时去掉
+    base = word[:-2] if word.endswith("する") else word
+    forms = [
+        ("辞书形", base + "する"),
+        ("ます形", base + "します"),
+        ("て形", base + "して"),
+        ("た形", base + "した"),
+        ("ない形", base + ("さない" if special else "しない")),
+        ("可能形", base + ("せる" if special else "できる")),
+        ("被动形", base + "される"),
+        ("使役形", base + "させる"),
+        ("意志形", base + ("そう" if special else "しよう")),
+        ("假定形", base + "すれば"),
+    ]
+    # 本来就是 する 动词时不需要再列出辞书形
+    return forms[1:] if word.endswith("する") else forms
+
+
+def _kuru(word):
+    base = word[:-2]
+    if word.endswith("来る"):
+        # 汉字写法各活用形都写作 来（读音 き / こ / く 不同）
+        k = ko = ku = base + "来"
+    else:
+        k, ko, ku = base + "き", base + "こ", base + "く"
+    return [
+        ("ます形", k + "ます"),
+        ("て形", k + "て"),
+        ("た形", k + "た"),
+        ("ない形", ko + "ない"),
+        ("可能/被动形", ko + "られる"),
+        ("使役形", ko + "させる"),
+        ("意志形", ko + "よう"),
+        ("假定形", ku + "れば"),
+    ]
+
+
+def _i_adjective(word, ii=False):
+    # いい 的活用使用 よい 的词干（よくない、よかった）
+    stem = word[:-2] + "よ" if ii else word[:-1]
+    return [
+        ("否定", stem + "くない"),
+        ("过去", stem + "かった"),
+        ("过去否定", stem + "くなかった"),
+        ("て形", stem + "くて"),
+        ("副词形", stem + "く"),
+        ("假定形", stem + "ければ"),
+    ]
+
+
+def _na_adjective(word):
+    return [
+        ("连体形", word + "な"),
+        ("否定", word + "ではない"),
+        ("过去", word + "だった"),
+        ("て形", word + "で"),
+        ("副词形", word + "に"),
+    ]
+
+
+def conjugate(word, pos_list):
+    """返回 [(活用名称, 活用形)]；没有活用的词性返回空列表"""
+    kind = classify(word, pos_list)
+    if kind == "godan":
+        return _godan(word, pos_list)
+    if kind == "ichidan":
+        return _ichidan(word)
+    if kind in ("suru", "suru-special"):
+        return _suru(word, special=kind == "suru-special")
+    if kind == "kuru":
+        return _kuru(word)
+    if kind in ("i-adj", "ii-adj"):
+        return _i_adjective(word, ii=kind == "ii-adj")
+    if kind == "na-adj":
+        return _na_adjective(word)
+    return []
+
+
+def variations(word, pos_list):
+    """邮件中显示的变形列表，例如 ["食べます（ます形）", ...]"""
+    return [f"{form}（{name}）" for name, form in conjugate(word, pos_list)]
+
+
+def pos_label(pos_list):
+    """英文词性标签 -> 中文词性说明，例如 "五段动词·他动词" """
+    labels = []
+    for pos in pos_list:
+        if pos.startswith(IGNORED_LABELS):
+            continue
+        label = next((zh for prefix, zh in POS_LABELS if pos.startswith(prefix)), pos)
+        if label not in labels:
+            labels.append(label)
+    return "·".join(labels)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print('用法: python vocab/inflect.py [单词] [词性...]   例如: python vocab/inflect.py 書く "Godan verb with \'ku\' ending"')
+        sys.exit(1)
+    word, pos_list = sys.argv[1], sys.argv[2:]
+    print(f"{word}  {pos_label(pos_list) or '未知词性'}")
+    for name, form in conjugate(word, pos_list) or [("", "（没有活用）")]:
+        print(f"   {name:<8} {form}")
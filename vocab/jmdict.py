@@ -0,0 +1,254 @@
+"""
+本地 JMdict 词典
+
+把 JMdict（或格式相同的 XML 词典）一次性导入到带索引的 SQLite 中，
+之后添加单词时直接查本地库，不再依赖 jisho.org：
+- 精确查询（汉字写法或假名读音）
+- 前缀查询
+- 返回全部义项和词性，而不仅是第一个
+
+用法:
+    python vocab/jmdict.py import JMdict_e.gz     # 导入（支持 .xml / .gz）
+    python vocab/jmdict.py lookup 夜
+    python vocab/jmdict.py prefix たべ
+"""
+import os
+import sys
+import gzip
+import json
+import sqlite3
+import argparse
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+# 允许直接运行本脚本时导入项目根目录下的 common 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common import config
+
+SCHEMA = """
+CREATE TABLE entries (
+    ent_seq INTEGER PRIMARY KEY,
+    is_common INTEGER,
+    data TEXT
+);
+CREATE TABLE keys (
+    key TEXT,
+    rank INTEGER,
+    ent_seq INTEGER,
+    PRIMARY KEY (key, rank, ent_seq)
+) WITHOUT ROWID;
+"""
+
+# 与 Jisho 的 is_common 判定一致的优先级标记
+COMMON_PRIORITIES = {"news1", "ichi1", "spec1", "spec2", "gai1"}
+
+# JMdict 的词性描述 → Jisho 风格的标签（与数据库中已有数据保持一致）
+JISHO_POS = {
+    "noun (common) (futsuumeishi)": "Noun",
+    "adverb (fukushi)": "Adverb (fukushi)",
+    "adjective (keiyoushi)": "I-adjective (keiyoushi)",
+    "adjective (keiyoushi) - yoi/ii class": "I-adjective (keiyoushi) - yoi/ii class",
+    "adjectival nouns or quasi-adjectives (keiyodoshi)": "Na-adjective (keiyodoshi)",
+    "nouns which may take the genitive case particle 'no'": "No-adjective",
+    "noun or participle which takes the aux. verb suru": "Suru verb",
+    "suru verb - included": "Suru verb - included",
+    "suru verb - special class": "Suru verb - special class",
+    "Kuru verb - special class": "Kuru verb - special class",
+    "transitive verb": "Transitive verb",
+    "intransitive verb": "Intransitive verb",
+    "expressions (phrases, clauses, etc.)": "Expressions (phrases, clauses, etc.)",
+    "pronoun": "Pronoun",
+    "particle": "Particle",
+    "conjunction": "Conjunction",
+    "interjection (kandoushi)": "Interjection",
+    "counter": "Counter",
+    "suffix": "Suffix",
+    "prefix": "Prefix",
+    "numeric": "Numeric",
+}
+
+
+# ---------- 导入 ----------
+
+def _open_source(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _parse_entry(elem):
+    kanji = [k.findtext("keb") for k in elem.findall("k_ele")]
+    readings = [r.findtext("reb") for r in elem.findall("r_ele")]
+    priorities = {p.text for p in elem.iter() if p.tag in ("ke_pri", "re_pri")}
+
+    senses = []
+    last_pos = []
+    for sense in elem.findall("sense"):
+        # JMdict 中省略 pos 的义项沿用上一个义项的词性
+        pos = [p.text for p in sense.findall("pos")] or last_pos
+        last_pos = pos
+        glosses = [g.text for g in sense.findall("gloss") if g.text]
+        if glosses:
+            senses.append({"pos": pos, "gloss": glosses})
+
+    return {
+        "ent_seq": int(elem.findtext("ent_seq")),
+        "kanji": kanji,
+        "readings": readings,
+        "senses": senses,
+        "is_common": bool(priorities & COMMON_PRIORITIES),
+    }
+
+
+def import_jmdict(xml_path, db_path=None, batch_size=5000):
+    """流式解析 JMdict XML（内存占用恒定）并写入 SQLite，返回导入的词条数"""
+    db_path = db_path or config.JMDICT_DB_PATH
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+
+    entries, keys, count = [], [], 0
+
+    def flush():
+        conn.executemany("INSERT INTO entries VALUES (?, ?, ?)", entries)
+        conn.executemany("INSERT OR IGNORE INTO keys VALUES (?, ?, ?)", keys)
+        entries.clear()
+        keys.clear()
+
+    with _open_source(xml_path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag != "entry":
+                continue
+            entry = _parse_entry(elem)
+            elem.clear()
+
+            seq = entry.pop("ent_seq")
+            # rank 越小越优先：常用词在前，汉字写法在读音前
+            base_rank = 0 if entry["is_common"] else 10
+            entries.append((seq, int(entry["is_common"]), json.dumps(entry, ensure_ascii=False)))
+            for i, k in enumerate(entry["kanji"]):
+                keys.append((k, base_rank + min(i, 4), seq))
+            for i, r in enumerate(entry["readings"]):
+                keys.append((r, base_rank + 5 + min(i, 4), seq))
+
+            count += 1
+            if len(entries) >= batch_size:
+                flush()
+
+    flush()
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp_path, db_path)
+    get_dictionary.cache_clear()
+    return count
+
+
+# ---------- 查询 ----------
+
+class JMdict:
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(
+            f"file:{db_path}?mode=ro", uri=True, check_same_thread=False, cached_statements=64,
+        )
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self._lookup = lru_cache(maxsize=4096)(self._lookup_uncached)
+
+    def _entries(self, rows):
+        seen, result = set(), []
+        for (seq,) in rows:
+            if seq in seen:
+                continue
+            seen.add(seq)
+            data = self.conn.execute("SELECT data FROM entries WHERE ent_seq=?", (seq,)).fetchone()[0]
+            result.append(json.loads(data))
+        return result
+
+    def _lookup_uncached(self, key):
+        rows = self.conn.execute("SELECT ent_seq FROM keys WHERE key=? ORDER BY rank", (key,))
+        return tuple(json.dumps(e, ensure_ascii=False) for e in self._entries(rows))
+
+    def lookup(self, key):
+        """精确查询：key 可以是汉字写法，也可以是假名读音"""
+        return [json.loads(e) for e in self._lookup(key)]
+
+    def prefix(self, prefix, limit=20):
+        """前缀查询，按常用程度排序"""
+        rows = self.conn.execute(
+            "SELECT ent_seq FROM keys WHERE key >= ? AND key < ? ORDER BY rank, key LIMIT ?",
+            (prefix, prefix + "\uffff", limit * 3),
+        )
+        return self._entries(rows)[:limit]
+
+    def word_info(self, word):
+        """
+        返回与 jisho_api() 相同结构的字典（全部义项和词性），查不到返回 None。
+        JMdict 不含 JLPT 等级，jlpt 为空列表。
+        """
+        entries = self.lookup(word)
+        if not entries:
+            return None
+        entry = entries[0]
+
+        definitions, part_of_speech = [], []
+        for sense in entry["senses"]:
+            definitions.extend(g for g in sense["gloss"] if g not in definitions)
+            for p in sense["pos"]:
+                label = JISHO_POS.get(p, p[:1].upper() + p[1:])
+                if label not in part_of_speech:
+                    part_of_speech.append(label)
+
+        kanji = entry["kanji"]
+        # 用户输入的是汉字写法时保留原样；输入假名时使用词条的首选写法
+        word_form = word if word in kanji else (kanji[0] if kanji else entry["readings"][0])
+        return {
+            "word": word_form,
+            "reading": entry["readings"][0] if entry["readings"] else "",
+            "definitions": definitions,
+            "part_of_speech": part_of_speech,
+            "is_common": entry["is_common"],
+            "jlpt": [],
+        }
+
+
+@lru_cache(maxsize=1)
+def get_dictionary():
+    """返回本地词典；尚未导入时返回 None"""
+    if not os.path.exists(config.JMDICT_DB_PATH):
+        return None
+    return JMdict(config.JMDICT_DB_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 JMdict 词典")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="导入 JMdict XML (.xml/.gz)")
+    p_import.add_argument("path")
+    p_lookup = sub.add_parser("lookup", help="精确查询")
+    p_lookup.add_argument("word")
+    p_prefix = sub.add_parser("prefix", help="前缀查询")
+    p_prefix.add_argument("prefix")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import time
+        start = time.perf_counter()
+        n = import_jmdict(args.path)
+        print(f"✓ 已导入 {n} 个词条到 {config.JMDICT_DB_PATH}，耗时 {time.perf_counter() - start:.1f} 秒")
+    else:
+        dictionary = get_dictionary()
+        if dictionary is None:
+            print(f"✗ 未找到本地词典 {config.JMDICT_DB_PATH}，请先运行 import。")
+            sys.exit(1)
+        if args.command == "lookup":
+            print(json.dumps(dictionary.word_info(args.word), ensure_ascii=False, indent=2))
+        else:
+            for entry in dictionary.prefix(args.prefix):
+                print(f"{'・'.join(entry['kanji'] or entry['readings'])}  [{'・'.join(entry['readings'])}]  "
+                      f"{'; '.join(entry['senses'][0]['gloss'][:3]) if entry['senses'] else ''}")
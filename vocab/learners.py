@@ -0,0 +1,130 @@
+"""
+多用户（学习者）数据
+
+单词内容（读音、释义、词性……）只保存一份，就是 vocab_progress 中的内容列；
+vocab_progress 自身的 stage / 复习日期属于默认用户（RECEIVER_EMAIL）。
+其他学习者各自在 learner_progress 中保存自己的复习进度。
+"""
+from common import metrics
+from vocab import db
+
+# vocab_progress 自身的进度属于默认用户
+DEFAULT_USER = "default"
+
+LEARNER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS learners (
+    user_id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    name TEXT,
+    new_words_per_day INTEGER
+);
+CREATE TABLE IF NOT EXISTS learner_progress (
+    user_id TEXT,
+    word TEXT,
+    stage INTEGER,
+    first_seen TEXT,
+    last_review TEXT,
+    next_review TEXT,
+    PRIMARY KEY (user_id, word)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_learner_due ON learner_progress (user_id, stage, next_review);
+"""
+
+# 学习者的进度行与单词内容拼成与 vocab_progress 相同的结构
+_PROGRESS_COLUMNS = """
+    v.word, p.stage, p.first_seen, p.last_review, p.next_review,
+    v.reading, v.definitions, v.part_of_speech, v.is_common, v.jlpt
+"""
+SQL_LEARNER_DUE = f"""
+    SELECT {_PROGRESS_COLUMNS}
+    FROM learner_progress p JOIN vocab_progress v ON v.word = p.word
+    WHERE p.user_id = ? AND p.stage > 0 AND p.next_review <= ? AND p.next_review != ''
+    ORDER BY p.next_review ASC
+"""
+SQL_LEARNER_NEW = f"""
+    SELECT {_PROGRESS_COLUMNS}
+    FROM learner_progress p JOIN vocab_progress v ON v.word = p.word
+    WHERE p.user_id = ? AND p.stage = 0
+    LIMIT ?
+"""
+SQL_LEARNER_UPDATE = """
+    UPDATE learner_progress
+    SET stage = :stage, first_seen = :first_seen,
+        last_review = :last_review, next_review = :next_review
+    WHERE user_id = :user_id AND word = :word
+"""
+
+_schema_ready = False
+
+
+def _conn():
+    global _schema_ready
+    conn = db.get_connection()
+    if not _schema_ready:
+        conn.executescript(LEARNER_SCHEMA)
+        _schema_ready = True
+    return conn
+
+
+def ensure_schema():
+    _conn()
+
+
+# ---------- 学习者管理 ----------
+
+def add_learner(user_id, email, name=None, new_words_per_day=None):
+    _conn()
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO learners (user_id, email, name, new_words_per_day) VALUES (?, ?, ?, ?)",
+            (user_id, email, name or user_id, new_words_per_day),
+        )
+
+
+def remove_learner(user_id):
+    _conn()
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM learner_progress WHERE user_id=?", (user_id,))
+        return conn.execute("DELETE FROM learners WHERE user_id=?", (user_id,)).rowcount
+
+
+def list_learners():
+    return [dict(row) for row in _conn().execute("SELECT * FROM learners ORDER BY user_id")]
+
+
+def has_learners():
+    return _conn().execute("SELECT 1 FROM learners LIMIT 1").fetchone() is not None
+
+
+def enroll(user_id, where_sql="1", params=()):
+    """把 vocab_progress 中符合条件的单词加入学习者的词库（stage=0），返回新增数量"""
+    _conn()
+    with db.transaction() as conn:
+        return conn.execute(f"""
+            INSERT OR IGNORE INTO learner_progress (user_id, word, stage, first_seen, last_review, next_review)
+            SELECT ?, word, 0, '', '', '' FROM vocab_progress WHERE {where_sql}
+        """, (user_id, *params)).rowcount
+
+
+def learner_stats(user_id):
+    row = _conn().execute(
+        "SELECT COUNT(*), COALESCE(SUM(stage = 0), 0) FROM learner_progress WHERE user_id=?", (user_id,),
+    ).fetchone()
+    return {"total": row[0], "unlearned": row[1]}
+
+
+# ---------- 每日任务 ----------
+
+@metrics.timed("sqlite_query", op="learner_due_reviews")
+def due_reviews(user_id, today):
+    return [dict(row) for row in _conn().execute(SQL_LEARNER_DUE, (user_id, today))]
+
+
+@metrics.timed("sqlite_query", op="learner_new_words")
+def new_words(user_id, limit):
+    return [dict(row) for row in _conn().execute(SQL_LEARNER_NEW, (user_id, limit))]
+
+
+@metrics.timed("sqlite_query", op="learner_update_progress")
+def update_progress(conn, user_id, updates):
+    conn.executemany(SQL_LEARNER_UPDATE, [dict(u, user_id=user_id) for u in updates])
@@ -0,0 +1,83 @@
+"""
+单词信息查询
+
+优先查本地 JMdict 词典，查不到时（且允许联网）再调用 Jisho API，
+并把结果整理成可以直接写入 vocab_progress 的行。
+"""
+import json
+
+from common.config import JISHO_FALLBACK
+from vocab.jisho_api import jisho_api
+from vocab.jmdict import get_dictionary
+
+
+def lookup_word_data(word):
+    """返回与 jisho_api() 相同结构的字典；失败时包含 error 字段"""
+    dictionary = get_dictionary()
+    if dictionary is not None:
+        word_data = dictionary.word_info(word)
+        if word_data:
+            return word_data
+    if JISHO_FALLBACK:
+        return _safe_jisho(word)
+    return {"error": "本地词典中没有该单词。"}
+
+
+def build_word_row(word, word_data):
+    """把查询结果转换为数据库行（stage=0, 其他时间字段为空）"""
+    definitions = word_data.get("definitions", [])
+    part_of_speech = word_data.get("part_of_speech", [])
+    jlpt = word_data.get("jlpt", [])
+
+    # 将列表转换为JSON字符串
+    return {
+        "word": word_data.get("word", word) or word,  # 如果API返回空，使用原词
+        "stage": 0,
+        "first_seen": "",
+        "last_review": "",
+        "next_review": "",
+        "reading": word_data.get("reading", ""),
+        "definitions": json.dumps(definitions) if definitions else "",
+        "part_of_speech": json.dumps(part_of_speech) if part_of_speech else "",
+        "is_common": word_data.get("is_common", 0),
+        "jlpt": json.dumps(jlpt) if jlpt else "",
+    }
+
+
+def lookup_many(words, workers=4, progress=None):
+    """
+    批量查询：先在本地词典中逐个查询（微秒级），
+    剩下查不到的再用线程池并发请求 Jisho。
+    返回 {word: word_data}，progress(done, total) 用于显示进度。
+    """
+    results = {}
+    total = len(words)
+    dictionary = get_dictionary()
+    misses = []
+    for word in words:
+        word_data = dictionary.word_info(word) if dictionary is not None else None
+        if word_data:
+            results[word] = word_data
+            if progress:
+                progress(len(results), total)
+        else:
+            misses.append(word)
+
+    if misses and JISHO_FALLBACK:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for word, word_data in zip(misses, pool.map(_safe_jisho, misses)):
+                results[word] = word_data
+                if progress:
+                    progress(len(results), total)
+    else:
+        for word in misses:
+            results[word] = {"error": "本地词典中没有该单词。"}
+    return results
+
+
+def _safe_jisho(word):
+    try:
+        return jisho_api(word)
+    except Exception as e:
+        return {"error": f"Jisho 查询失败: {e}"}
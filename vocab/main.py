@@ -1,34 +1,28 @@
 import os
+import sys
 import json
-import smtplib
 import datetime
 import random
-import sqlite3
-import requests
 from email.mime.text import MIMEText
 from email.utils import formataddr
-from dotenv import load_dotenv
 
-# 加载环境变量
-load_dotenv()
+# 允许直接运行本脚本时导入项目根目录下的 common 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
 
-# 配置信息
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
-RECEIVER_EMAIL = os.getenv("RECEIVER_EMAIL")
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_APIKEY")
-NEW_WORDS_PER_DAY = int(os.getenv("NEW_WORDS_PER_DAY", 20)) 
-MAX_STAGES = int(os.getenv("MAX_REVIEWS", 8))
-DB_PATH = "vocab/vocab.db"
+from common.config import (
+    SENDER_EMAIL, RECEIVER_EMAIL, NEW_WORDS_PER_DAY, REVIEW_INTERVALS, VOCAB_DB_PATH, EXAMPLE_MIN_SENTENCES,
+)
+from common.clients import get_llm, send_mail
+from common import metrics
+from common.journal import RunJournal
+from common import prompts, validate
+from vocab import db, learners, prefetch, render, grading, inflect, sentences
 
-# ---------- 数据库辅助函数 ----------
+DB_PATH = VOCAB_DB_PATH
 
-def get_db_connection():
-    # 确保连接到 vocab/vocab.db
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # 允许通过列名访问数据
-    return conn
+# ---------- 数据库辅助函数 ----------
 
 def safe_parse_json_field(field_value):
     """即使数据库存的是字符串格式的列表 (如 "['n5']"), 也要安全解析"""
@@ -47,250 +41,270 @@ def safe_parse_json_field(field_value):
 
 # ---------- 遗忘曲线计算下一次复习 ----------
 def calculate_next_review_date(current_stage):
-    intervals = [1, 2, 4, 7, 15, 30, 60, 90, 180]
+    intervals = REVIEW_INTERVALS
     base_interval = intervals[current_stage] if current_stage < len(intervals) else intervals[-1]
     fuzz = random.randint(-max(1, int(base_interval * 0.15)), max(1, int(base_interval * 0.15))) if base_interval > 4 else 0
     return max(1, base_interval + fuzz)
 
+# ---------- 本地生成的字段 ----------
+def local_word_details(word, db_info):
+    """
+    读音、词性、JLPT 和变形直接由数据库信息生成（变形见 vocab/inflect.py），
+    结果确定且不需要调用 API；LLM 只负责中文释义和例句。
+    """
+    pos_list = safe_parse_json_field(db_info['part_of_speech'])
+    return {
+        "word": word,
+        "readings": [db_info['reading']] if db_info['reading'] else [],
+        "jlpt": safe_parse_json_field(db_info['jlpt']),
+        "is_common": bool(db_info['is_common']),
+        "pos": inflect.pos_label(pos_list) or "未知",
+        "variations": inflect.variations(word, pos_list),
+    }
+
 # ---------- 核心逻辑：DeepSeek API 调用 ----------
-def fetch_word_details_deepseek(word, db_info):
+# 固定部分：所有单词都相同（见 common/prompts.py）；只要求释义和例句，读音、词性、变形在本地生成
+WORD_PROMPT = """
+你是一位日语老师，为日语单词编写中文释义和例句，只输出 JSON。
+
+【任务说明】只完成【本次参数】的“任务”中列出的项：
+- 释义: 结合参考信息（读音、词性、英文释义来自数据库，请勿直接照抄英文），给出**中文**释义。如果有多个常用义项，请分条列出。
+- 例句: 为每个义项编写一个地道的日语例句，并附带中文翻译。
+- 例句翻译: 按顺序把【待翻译例句】中的日语例句翻译成中文。
+- 读音: 给出准确的平假名读音。
+
+【输出格式】
+最终请返回严格的 JSON 格式 (不要包含 markdown 代码块标记)，任务中没有的字段不要输出：
+{
+    "reading": "平假名读音（任务包含“读音”时）",
+    "translations": ["例句1的中文翻译", "例句2的中文翻译"],
+    "meanings": [
+        { "meaning": "中文释义1", "example_jp": "日语例句1", "example_cn": "中文例句1" },
+        { "meaning": "中文释义2", "example_jp": "日语例句2", "example_cn": "中文例句2" }
+    ]
+}
+任务中没有“例句”时，meanings 的每一项只写 meaning；没有“例句翻译”时不要输出 translations。
+"""
+
+
+
+def word_schema(with_examples, translations, need_reading):
+    """本次任务要求的 JSON 结构"""
+    meaning = {"meaning": validate.text()}
+    if with_examples:
+        meaning.update(example_jp=validate.text(), example_cn=validate.text())
+    fields = {"meanings": validate.array(validate.obj(meaning))}
+    if translations:
+        fields["translations"] = validate.array(validate.text(), length=translations)
+    if need_reading:
+        fields["reading"] = validate.text()
+    return validate.obj(fields)
+
+
+def fetch_word_details_deepseek(word, db_info, llm=None, tag="vocab", mark_used=True):
     """
     word: 单词文本
     db_info: 数据库中的原始行数据 (作为参考 context)
+    llm: 使用的 LLM 网关，默认为共享网关（预取任务会传入低限流的网关）
+    mark_used: 是否立即记录例句的使用（计入轮换）。预取时为 False，例句 id 保存在 details["sentence_ids"] 中，
+               真正发送时再记录（见 get_word_details）
     """
     print(f"🤖 正在向 DeepSeek 查询单词: {word} ...")
-    
-    url = "https://api.deepseek.com/chat/completions"
-    
-    # 提取数据库参考信息 (仅供 AI 参考)
-    # 使用 .get() 并非必须，因为 row_factory=sqlite3.Row 支持字典式访问，但为了安全起见
-    ref_reading = db_info['reading'] if db_info['reading'] else "未知"
+
+    details = local_word_details(word, db_info)
     ref_defs = db_info['definitions'] if db_info['definitions'] else "未知"
-    ref_pos = db_info['part_of_speech'] if db_info['part_of_speech'] else "未知"
-    
-    # is_common 是 0/1，转换显示
-    ref_is_common = "是" if db_info['is_common'] == 1 else "否"
-    ref_jlpt = db_info['jlpt'] if db_info['jlpt'] else "未知"
-    
-    # Prompt 逻辑：将数据库信息作为 Context 给 AI
-    prompt = f"""
-    请作为日语老师，详细分析日语单词: 「{word}」。
-    
-    【参考信息 (来自数据库，仅供确认基本信息，请勿直接照抄英文)】
-    - 参考读音: {ref_reading}
-    - 原始释义: {ref_defs}
-    - 参考词性: {ref_pos}
-    - 是否常用: {ref_is_common}
-    - 参考等级: {ref_jlpt}
-
-    【任务要求】
-    1. **读音**: 给出准确的平假名读音。
-    2. **释义**: 结合参考信息，给出**中文**释义。如果有多个常用义项，请分条列出。
-    3. **例句**: 为每个义项编写一个地道的日语例句，并附带中文翻译。
-    4. **属性**: 判断 JLPT 等级、是否常用、详细词性。
-    5. **变形**: 列出常见的动词/形容词变形，或名词的常见搭配。
-
-    最终请返回严格的 JSON 格式 (不要包含 markdown 代码块标记)：
-    {{
-        "word": "{word}",
-        "readings": ["平假名1", "平假名2"],
-        "jlpt": ["N5" 或 "N3" 等],
-        "is_common": true/false,
-        "pos": "详细词性 (例如: 五段动词·他动词，な形容词等)",
-        "variations": ["变形1", "搭配1"],
-        "meanings": [
-            {{ "meaning": "中文释义1", "example_jp": "日语例句1", "example_cn": "中文例句1" }},
-            {{ "meaning": "中文释义2", "example_jp": "日语例句2", "example_cn": "中文例句2" }}
-        ]
-    }}
-    """
-    
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant that outputs JSON only."},
-        {"role": "user", "content": prompt}
-    ]
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
-    }
+    # 例句库中已有足够的例句时只让 AI 写释义（没有中文翻译的例句顺便翻译），见 vocab/sentences.py
+    pos_list = safe_parse_json_field(db_info['part_of_speech'])
+    examples = sentences.pick_examples(word, pos_list, sentences.EXAMPLES_PER_WORD) if EXAMPLE_MIN_SENTENCES else []
+    if len(examples) < EXAMPLE_MIN_SENTENCES:
+        examples = []
+    untranslated = [e for e in examples if not e["cn"]]
+
+    tasks = ["释义"] if examples else ["释义", "例句"]
+    if untranslated:
+        tasks.append("例句翻译")
+    # 数据库中没有读音时（例如从文章中收集的词）才让 AI 顺便给出读音
+    need_reading = not details["readings"]
+    if need_reading:
+        tasks.append("读音")
+
+    # 固定的说明和 JSON 结构在前（可命中前缀缓存），单词和本次任务在后
+    request = prompts.fields({
+        "单词": word,
+        "任务": "、".join(tasks),
+        "读音": details["readings"][0] if details["readings"] else "未知",
+        "词性": details["pos"],
+        "英文释义": ref_defs,
+    })
+    if untranslated:
+        request += "\n【待翻译例句】\n" + "\n".join(f"例句{i}: {e['jp']}" for i, e in enumerate(untranslated, 1))
+    messages = prompts.cached_messages(WORD_PROMPT, request)
 
     try:
-        response = requests.post(url, json={
-            "model": "deepseek-chat",
-            "messages": messages,
-            "response_format": {"type": "json_object"},
-            "temperature": 1.0 
-        }, headers=headers)
-        
-        response.raise_for_status()
-        response_data = response.json()
-        content = response_data['choices'][0]['message']['content']
-        return json.loads(content)
-
+        # 有小毛病的 JSON 在本地修复，缺失 / 不合格的字段单独补问（见 common/validate.py）
+        data, problems = validate.chat_json(
+            llm or get_llm(), messages, word_schema(not examples, len(untranslated), need_reading), tag,
+        )
     except Exception as e:
         print(f"❌ 获取 {word} 详情失败: {e}")
-        # 降级返回（使用数据库的基础信息兜底）
-        return {
-            "word": word,
-            "readings": [str(ref_reading)],
-            "jlpt": safe_parse_json_field(ref_jlpt),
-            "is_common": bool(db_info['is_common']),
-            "pos": str(ref_pos),
-            "variations": [],
-            "meanings": [{"meaning": f"API调用失败，原始释义: {ref_defs}", "example_jp": "", "example_cn": ""}]
-        }
-
-# ---------- 发送邮件 (保持 UI 美观) ----------
-def send_email(review_list):
-    if not review_list:
-        print("📭 今日无复习内容，跳过发送邮件。")
-        return
+        return fallback_word_details(word, db_info)
+    if "meanings" in problems:
+        print(f"❌ 获取 {word} 详情失败: meanings {problems['meanings']}")
+        return fallback_word_details(word, db_info)
 
-    today_str = datetime.date.today().strftime("%Y-%m-%d")
-    
-    new_count = sum(1 for item in review_list if item['stage'] == 0)
-    review_count = len(review_list) - new_count
+    details["meanings"] = data["meanings"]
+    if need_reading and data.get("reading"):
+        details["readings"] = [data["reading"]]
 
-    html_content = f"""
-    <div style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; max-width: 800px; margin: 0 auto; color: #333;">
-        <h2 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px;">📅 日语记忆曲线复习表 ({today_str})</h2>
-        <p>今日任务：<b>{len(review_list)}</b> 个单词 (🆕 新词: {new_count} / 🔄 复习: {review_count})</p>
+    try:
+        if examples:
+            translations = data.get("translations") or []
+            for example, cn in zip(untranslated, translations):
+                example["cn"] = str(cn)
+            if untranslated:
+                sentences.add_sentences([(e["jp"], e["cn"]) for e in untranslated], "llm")
+            # 例句库的例句依次放到各个义项下
+            for meaning, example in zip(details["meanings"], examples):
+                meaning["example_jp"], meaning["example_cn"] = example["jp"], example["cn"]
+            sentence_ids = [e["id"] for e in examples[:len(details["meanings"])]]
+            metrics.incr("vocab_examples", len(sentence_ids), source="corpus")
+        else:
+            sentence_ids = sentences.add_from_details(details)
+            metrics.incr("vocab_examples", len(sentence_ids), source="llm")
+        if mark_used:
+            sentences.mark_used(word, sentence_ids)
+        else:
+            details["sentence_ids"] = sentence_ids
+    except Exception as e:
+        # 例句库只是优化，出错时不影响今天的单词
+        print(f"⚠️ 例句库更新失败 ({word}): {e}")
+    return details
+
+def fallback_word_details(word, db_info):
+    """降级返回（本地字段照常生成，释义使用数据库的基础信息兜底）"""
+    ref_defs = db_info['definitions'] if db_info['definitions'] else "未知"
+    details = local_word_details(word, db_info)
+    details["meanings"] = [{"meaning": f"API调用失败，原始释义: {ref_defs}", "example_jp": "", "example_cn": ""}]
+    details["fallback"] = True
+    return details
+
+def mark_prefetched_examples(word, sentence_ids):
+    try:
+        sentences.mark_used(word, sentence_ids)
+    except Exception as e:
+        print(f"⚠️ 例句库更新失败 ({word}): {e}")
+
+def get_word_details(word, db_info, journal=None):
+    """
+    优先读取运行日志中已完成的解析结果，其次使用前一天预取的结果，最后才调用 API；
+    只有成功的 API 结果才会写入检查点
+    """
+    if journal is not None:
+        cached = journal.get("enrich", word)
+        if cached is not None:
+            print(f"♻️ 已从断点恢复单词: {word}")
+            metrics.incr("vocab_words", source="journal")
+            return cached
+
+    details = prefetch.take(word)
+    if details is not None:
+        # 预取时没有记录例句的使用，今天真正发送时才计入轮换
+        mark_prefetched_examples(word, details.pop("sentence_ids", []))
+        # 预取结果只用一次：先写入今天的检查点再删除，重跑时从检查点恢复
+        if journal is not None:
+            journal.record("enrich", word, details)
+        prefetch.discard(word)
+        metrics.incr("vocab_words", source="prefetch")
+        return details
+
+    details = fetch_word_details_deepseek(word, db_info)
+    metrics.incr("vocab_words", source="fallback" if details.get("fallback") else "api")
+    if journal is not None and not details.get("fallback"):
+        journal.record("enrich", word, details)
+    return details
+
+# ---------- 生成邮件 (保持 UI 美观) ----------
+def render_email(review_list, journal=None, today_str=None, details_map=None, user_id=learners.DEFAULT_USER):
     """
+    解析每个单词并生成邮件，返回 [{"subject": ..., "html": ...}]；
+    超过 EMAIL_MAX_BYTES 时分为多封（见 vocab/render.py）。
 
+    details_map 为预先解析好的 {单词: 解析结果}，其中没有的单词才会调用 API。
+    设置了 GRADE_SECRET 时每个单词带有 user_id 的评分链接（见 vocab/grading.py）。
+    """
+    today_str = today_str or datetime.date.today().strftime("%Y-%m-%d")
+
+    entries = []
     for item in review_list:
         word = item['word']
-        stage = item['stage']
-        db_raw_info = item['db_raw_info'] # 获取数据库原始数据
-        
-        # 熟练度颜色条
-        stage_color = "#2ecc71" if stage > 5 else "#1abc9c" if stage > 3 else "#f1c40f" if stage > 1 else "#e74c3c"
-        if stage == 0:
-            stage_display = '<span style="background-color:#e74c3c; color:white; padding:2px 6px; border-radius:4px; font-size:0.8em; margin-left:5px;">NEW</span>'
+        # 调用 API 生成内容（已完成的单词直接从断点恢复）
+        if details_map and word in details_map:
+            details = details_map[word]
         else:
-            stage_display = f'<span style="display:inline-block;width:10px;height:10px;background-color:{stage_color};border-radius:50%; margin-left:5px;" title="熟练度等级: {stage}"></span>'
-
-        # 调用 API 生成内容
-        details = fetch_word_details_deepseek(word, db_raw_info)
-        
-        readings = " / ".join(details.get("readings", []))
-        pos = details.get("pos", "暂无词性")
-        variations = details.get("variations", [])
-        variations_str = "、".join(variations) if variations else "无常见变形"
-
-        # 标签 HTML 生成
-        tags_html = ""
-        jlpt_list = details.get("jlpt", [])
-        for lvl in jlpt_list:
-            lvl_display = lvl.replace("jlpt-", "").upper()
-            tags_html += f'<span style="background-color:#3498db; color:white; padding:2px 6px; border-radius:4px; font-size:0.7em; margin-right:5px;">{lvl_display}</span>'
-
-        if details.get("is_common"):
-            tags_html += '<span style="background-color:#27ae60; color:white; padding:2px 6px; border-radius:4px; font-size:0.7em; margin-right:5px;">常用</span>'
-
-        html_content += f"""
-        <div style="border:1px solid #e0e0e0; border-radius:8px; padding:10px; margin-bottom:15px; background-color:#fafafa;">
-            <div style="display:flex; align-items:center; margin-bottom:5px;">
-                <h3 style="margin:0; color:#2c3e50; margin-right:10px;">
-                    {word}
-                </h3>
-                {stage_display}
-                <div style="margin-left:auto;">{tags_html}</div>
-            </div>
-            
-            <p style="margin:2px 0; color:#555;"><b>读音:</b> <span style="color:#d35400; font-family:'Hiragino Sans', sans-serif;">{readings}</span></p>
-            <p style="margin:2px 0; color:#555;"><b>词性:</b> <span style="background-color:#e8f4f8; padding:2px 5px; border-radius:3px; color:#2980b9; font-size:0.9em;">{pos}</span></p>
-            <p style="margin:2px 0; color:#555;"><b>变形:</b> <span style="color:#7f8c8d; font-size:0.9em;">{variations_str}</span></p>
-        """
-
-        for m in details.get("meanings", []):
-            html_content += f"""
-            <div style="margin:5px 0; padding:5px; background-color:#fff; border-left:4px solid #3498db; border-radius:4px;">
-                <p style="margin:2px 0;"><b>释义:</b> {m.get('meaning','')}</p>
-                <p style="margin:2px 0;"><b>例句(日):</b> {m.get('example_jp','')}</p>
-                <p style="margin:2px 0; color:#888;"><b>例句(中):</b> {m.get('example_cn','')}</p>
-            </div>
-            """
-
-        html_content += "</div>"
-
-    html_content += "<p style='text-align:center; color:#999; font-size:12px;'>Generated by DeepSeek AI (Ref: SQLite)</p></div>"
-
-    message = MIMEText(html_content, 'html', 'utf-8')
+            details = get_word_details(word, item['db_raw_info'], journal)
+        links = grading.grade_links(user_id, word, today_str, item['stage'])
+        entries.append((word, item['stage'], details, links))
+
+    with metrics.span("render"):
+        return render.render_pages(entries, today_str)
+
+# ---------- 发送邮件 ----------
+def send_email(rendered, receiver=None):
+    """发送已渲染好的邮件，成功返回 True"""
+    receiver = receiver or RECEIVER_EMAIL
+    message = MIMEText(rendered["html"], 'html', 'utf-8')
     message['From'] = formataddr(("日语单词助手", SENDER_EMAIL))
-    message['To'] = RECEIVER_EMAIL
-    message['Subject'] = f'【记忆曲线】{today_str} 任务: {new_count}新词 + {review_count}复习'
+    message['To'] = receiver
+    message['Subject'] = rendered["subject"]
 
     try:
-        smtp_obj = smtplib.SMTP_SSL(SMTP_SERVER, 465)
-        smtp_obj.login(SENDER_EMAIL, SENDER_PASSWORD)
-        smtp_obj.sendmail(SENDER_EMAIL, [RECEIVER_EMAIL], message.as_string())
-        smtp_obj.quit()
-        print("📧 邮件发送成功！")
+        send_mail(SENDER_EMAIL, [receiver], message.as_string())
+        print(f"📧 邮件发送成功！({receiver})")
+        return True
     except Exception as e:
         print(f"❌ 邮件发送失败: {e}")
-
-# ---------- 主流程 (数据库版) ----------
-def main():
-    if not os.path.exists(DB_PATH):
-        print(f"❌ 未找到数据库文件: {DB_PATH}")
-        return
-
-    today = datetime.date.today().isoformat()
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
+        return False
+
+def send_pages(pages, receiver=None, journal=None, key=""):
+    """依次发送各页邮件，已发送的页记录在运行日志中，重跑时不会重复发送；全部成功返回 True"""
+    for index, page in enumerate(pages):
+        page_key = f"{key}#{index}"
+        if journal is not None and journal.has("deliver_page", page_key):
+            continue
+        if not send_email(page, receiver):
+            return False
+        if journal is not None:
+            journal.record("deliver_page", page_key)
+    return True
+
+# ---------- 选出今日任务 ----------
+def plan_today(today):
+    """从数据库选出今日的新词和复习词，并预先计算好复习后的状态"""
     # 1. 获取今日复习 (Stage > 0 且 时间到)
-    # 注意：表名已修改为 vocab_progress
-    cursor.execute("""
-        SELECT * FROM vocab_progress 
-        WHERE stage > 0 AND next_review <= ? AND next_review != '' 
-        ORDER BY next_review ASC
-    """, (today,))
-    due_reviews = [dict(row) for row in cursor.fetchall()]
+    due_reviews = db.due_reviews(today)
 
     # 2. 获取新词 (Stage = 0)
-    # 注意：表名已修改为 vocab_progress
-    cursor.execute("SELECT * FROM vocab_progress WHERE stage = 0 LIMIT ?", (NEW_WORDS_PER_DAY,))
-    new_words = [dict(row) for row in cursor.fetchall()]
-    
-    conn.close()
+    new_words = db.new_words(NEW_WORDS_PER_DAY)
 
-    review_queue = new_words + due_reviews
+    return build_plan(today, new_words, due_reviews)
 
-    print(f"📊 今日任务总计: {len(review_queue)} 词")
-    print(f"   🔹 新词: {len(new_words)} (目标: {NEW_WORDS_PER_DAY})")
-    print(f"   🔸 复习: {len(due_reviews)}")
-
-    if not review_queue:
-        print("🎉 今日没有需要复习的单词，且词库已空。")
-        return
-
-    email_data_list = []
-    
+def build_plan(today, new_words, due_reviews):
+    """为今日的单词预先计算好复习后的状态"""
     # 用于批量更新数据库的列表
     updates = []
+    today_date = datetime.date.fromisoformat(today)
 
-    for item in review_queue:
-        word = item['word']
-        
+    for item in new_words + due_reviews:
         # 如果是新词，设置 first_seen
         first_seen = item['first_seen']
         if not first_seen:
             first_seen = today
-        
-        # 准备传给邮件函数的数据
-        email_data = {
-            "word": word,
-            "stage": item['stage'],
-            "db_raw_info": item  # 将整行数据传给 DeepSeek 函数做参考
-        }
-        email_data_list.append(email_data)
 
         # 算法更新
         current_stage = item['stage']
         days_delta = calculate_next_review_date(current_stage)
-        next_date = datetime.date.today() + datetime.timedelta(days=days_delta)
+        next_date = today_date + datetime.timedelta(days=days_delta)
         
         # 记录更新操作
         updates.append({
@@ -298,28 +312,92 @@ def main():
             "first_seen": first_seen,
             "last_review": today,
             "next_review": next_date.isoformat(),
-            "word": word
+            "word": item['word']
         })
 
-    # 发送邮件
-    send_email(email_data_list)
+    return {"new_words": new_words, "due_reviews": due_reviews, "updates": updates}
 
-    # 批量更新数据库
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def apply_updates(updates):
+    """批量更新数据库（写入的是计划好的绝对值，重复执行结果相同）"""
     try:
-        cursor.executemany("""
-            UPDATE vocab_progress 
-            SET stage = :stage, first_seen = :first_seen, 
-                last_review = :last_review, next_review = :next_review
-            WHERE word = :word
-        """, updates)
-        conn.commit()
+        with db.transaction() as conn:
+            db.update_progress(conn, updates)
         print(f"✅ 数据库已更新 {len(updates)} 条记录。")
+        return True
     except Exception as e:
         print(f"❌ 数据库更新失败: {e}")
+        return False
+
+# ---------- 主流程 (数据库版) ----------
+@metrics.stage("vocab")
+def main():
+    if not os.path.exists(DB_PATH):
+        print(f"❌ 未找到数据库文件: {DB_PATH}")
+        return
+
+    journal = RunJournal("vocab")
+    try:
+        if learners.has_learners():
+            # 有多个学习者时使用分发模式：同一个单词只解析一次
+            from vocab.team import run_team
+            run_team(journal)
+        else:
+            run_with_journal(journal)
     finally:
-        conn.close()
+        journal.close()
+
+def run_with_journal(journal):
+    today = journal.run_date
+    if journal.finished:
+        print(f"✅ {today} 的单词任务已经完成 (run: {journal.run_id})，跳过。")
+        return
+
+    # 今日任务只在第一次运行时选出，之后重跑都使用同一份计划
+    plan = journal.get("plan")
+    if plan is None:
+        plan = plan_today(today)
+        journal.record("plan", value=plan)
+    else:
+        print(f"♻️ 从断点继续 (run: {journal.run_id})")
+
+    new_words = plan["new_words"]
+    due_reviews = plan["due_reviews"]
+    review_queue = new_words + due_reviews
+
+    print(f"📊 今日任务总计: {len(review_queue)} 词")
+    print(f"   🔹 新词: {len(new_words)} (目标: {NEW_WORDS_PER_DAY})")
+    print(f"   🔸 复习: {len(due_reviews)}")
+
+    if not review_queue:
+        print("🎉 今日没有需要复习的单词，且词库已空。")
+        journal.finish()
+        return
+
+    if not journal.has("deliver"):
+        rendered = journal.get("render")
+        if rendered is None:
+            # 准备传给邮件函数的数据
+            email_data_list = [
+                {
+                    "word": item['word'],
+                    "stage": item['stage'],
+                    "db_raw_info": item  # 将整行数据传给 DeepSeek 函数做参考
+                }
+                for item in review_queue
+            ]
+            rendered = render_email(email_data_list, journal, today)
+            journal.record("render", value=rendered)
+
+        # 发送邮件；失败时不推进 stage，下次运行从这里继续
+        if not send_pages(rendered, journal=journal):
+            print("⚠️ 邮件未发送，数据库保持不变，重新运行将从断点继续。")
+            return
+        journal.record("deliver")
+
+    # 批量更新数据库
+    if apply_updates(plan["updates"]):
+        journal.record("update", value=len(plan["updates"]))
+        journal.finish()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
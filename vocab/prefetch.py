@@ -0,0 +1,166 @@
+"""
+单词解析预取
+
+复习日期已经写在 vocab_progress.next_review 中，明天要发的单词今天就能确定。
+本模块在当天邮件发完之后，以较低的限流为未来 PREFETCH_DAYS 天内到期的单词
+（以及接下来的 NEW_WORDS_PER_DAY 个新词）预先调用 API，结果保存在 word_prefetch 表中；
+第二天的发送任务直接使用这些结果，不再在发信时等待 API。
+
+每条预取结果只使用一次，用过即删除，保证例句每次复习都会更新。
+
+用法:
+    python vocab/prefetch.py [--days N] [--rate 每秒请求数]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+
+# 允许直接运行本脚本时导入项目根目录下的 common / vocab 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import (
+    VOCAB_DB_PATH, NEW_WORDS_PER_DAY, PREFETCH_DAYS, PREFETCH_RATE_PER_SEC, PREFETCH_MAX_AGE_DAYS,
+)
+from common import metrics
+from vocab import db, learners
+
+PREFETCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS word_prefetch (
+    word TEXT PRIMARY KEY,
+    details TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_schema_ready = False
+
+
+def _conn():
+    global _schema_ready
+    conn = db.get_connection()
+    if not _schema_ready:
+        conn.executescript(PREFETCH_SCHEMA)
+        _schema_ready = True
+    return conn
+
+
+def ensure_schema():
+    """建表（并发使用前先在主线程调用一次）"""
+    _conn()
+
+
+def _cutoff(today=None):
+    today = today or datetime.date.today()
+    return (today - datetime.timedelta(days=PREFETCH_MAX_AGE_DAYS)).isoformat()
+
+
+# ---------- 读写预取结果 ----------
+
+def take(word):
+    """返回未过期的预取结果；没有时返回 None"""
+    if not os.path.exists(VOCAB_DB_PATH):
+        return None
+    row = _conn().execute(
+        "SELECT details FROM word_prefetch WHERE word=? AND fetched_at >= ?", (word, _cutoff()),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def discard(word):
+    _conn()
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM word_prefetch WHERE word=?", (word,))
+
+
+def store(word, details, today):
+    _conn()
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO word_prefetch (word, details, fetched_at) VALUES (?, ?, ?)",
+            (word, json.dumps(details, ensure_ascii=False), today),
+        )
+
+
+def purge_expired(today):
+    _conn()
+    with db.transaction() as conn:
+        return conn.execute("DELETE FROM word_prefetch WHERE fetched_at < ?", (_cutoff(today),)).rowcount
+
+
+# ---------- 选出要预取的单词 ----------
+
+def upcoming_words(today, days):
+    """未来 days 天内到期的复习词 + 接下来的新词（包括所有学习者），去重后保持顺序"""
+    horizon = (today + datetime.timedelta(days=days)).isoformat()
+    rows = db.due_reviews(horizon) + db.new_words(NEW_WORDS_PER_DAY)
+    for member in learners.list_learners():
+        limit = member["new_words_per_day"] or NEW_WORDS_PER_DAY
+        rows += learners.due_reviews(member["user_id"], horizon)
+        rows += learners.new_words(member["user_id"], limit)
+
+    prefetched = {w for (w,) in _conn().execute(
+        "SELECT word FROM word_prefetch WHERE fetched_at >= ?", (_cutoff(today),),
+    )}
+    unique = {}
+    for row in rows:
+        if row["word"] not in prefetched:
+            unique.setdefault(row["word"], row)
+    return list(unique.values())
+
+
+def run_prefetch(days=PREFETCH_DAYS, rate=PREFETCH_RATE_PER_SEC):
+    # 延迟导入：vocab.main 在发送时也会导入本模块
+    from common.clients import get_http_session
+    from common.llm import create_gateway
+    from vocab.main import fetch_word_details_deepseek
+
+    today = datetime.date.today()
+    expired = purge_expired(today)
+    if expired:
+        print(f"🧹 已清理 {expired} 条过期的预取结果")
+
+    pending = upcoming_words(today, days)
+    if not pending:
+        print("✅ 未来的单词都已经预取，无需调用 API。")
+        return 0
+
+    print(f"🔮 预取未来 {days} 天内的 {len(pending)} 个单词 (限流 {rate}/秒)...")
+    # 独立的低限流网关，单线程顺序请求，不与白天的任务抢配额
+    llm = create_gateway(get_http_session(), rate_per_sec=rate, burst=1)
+    start = time.perf_counter()
+    done = failed = 0
+    for item in pending:
+        # 例句的使用在第二天发送时才记录（见 vocab/main.py get_word_details），丢弃的预取结果不会占用轮换
+        details = fetch_word_details_deepseek(item["word"], item, llm=llm, tag="prefetch", mark_used=False)
+        if details.get("fallback"):
+            failed += 1
+            continue
+        store(item["word"], details, today.isoformat())
+        done += 1
+
+    print(f"✅ 预取完成: 成功 {done} / 失败 {failed}，耗时 {time.perf_counter() - start:.1f} 秒")
+    print(llm.format_stats())
+    return done
+
+
+@metrics.stage("vocab-prefetch")
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="为未来几天的单词预先生成解析")
+    parser.add_argument("--days", type=int, default=PREFETCH_DAYS, help=f"预取未来几天内到期的单词（默认 {PREFETCH_DAYS}）")
+    parser.add_argument("--rate", type=float, default=PREFETCH_RATE_PER_SEC, help=f"每秒请求数（默认 {PREFETCH_RATE_PER_SEC}）")
+    # 作为流水线阶段运行时不读取 sys.argv（那是流水线自己的参数）
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(VOCAB_DB_PATH):
+        print(f"❌ 未找到数据库文件: {VOCAB_DB_PATH}")
+        return
+    run_prefetch(args.days, args.rate)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
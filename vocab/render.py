@@ -0,0 +1,249 @@
+"""
+单词邮件渲染
+
+- 模板在导入时编译一次，渲染时只做 str.format，结果放进列表最后 join，耗时与单词数成线性
+- 样式集中在 <style> 中，卡片只引用 class（EMAIL_INLINE_STYLES=1 时改回内联样式，兼容不支持 <style> 的邮箱）
+- 单封邮件的 HTML 不超过 EMAIL_MAX_BYTES（Gmail 超过约 102KB 会截断邮件），
+  放不下的单词按 EMAIL_OVERFLOW 处理：
+    paginate  分成多封后续邮件，每封都是完整卡片
+    table     改为紧凑表格（单词 / 读音 / 词性 / 第一条释义），表格也放不下时再分页
+"""
+from functools import lru_cache
+from html import escape
+
+from common.config import EMAIL_MAX_BYTES, EMAIL_OVERFLOW, EMAIL_INLINE_STYLES
+
+STYLES = {
+    "wrap": "font-family:'Helvetica Neue',Helvetica,Arial,sans-serif;max-width:800px;margin:0 auto;color:#333",
+    "title": "color:#2c3e50;border-bottom:2px solid #3498db;padding-bottom:10px",
+    "card": "border:1px solid #e0e0e0;border-radius:8px;padding:10px;margin-bottom:15px;background-color:#fafafa",
+    "head": "display:flex;align-items:center;margin-bottom:5px",
+    "word": "margin:0;color:#2c3e50;margin-right:10px",
+    "new": "background-color:#e74c3c;color:white;padding:2px 6px;border-radius:4px;font-size:0.8em;margin-left:5px",
+    "dot1": "display:inline-block;width:10px;height:10px;border-radius:50%;margin-left:5px;background-color:#e74c3c",
+    "dot2": "display:inline-block;width:10px;height:10px;border-radius:50%;margin-left:5px;background-color:#f1c40f",
+    "dot3": "display:inline-block;width:10px;height:10px;border-radius:50%;margin-left:5px;background-color:#1abc9c",
+    "dot4": "display:inline-block;width:10px;height:10px;border-radius:50%;margin-left:5px;background-color:#2ecc71",
+    "tags": "margin-left:auto",
+    "jlpt": "background-color:#3498db;color:white;padding:2px 6px;border-radius:4px;font-size:0.7em;margin-right:5px",
+    "common": "background-color:#27ae60;color:white;padding:2px 6px;border-radius:4px;font-size:0.7em;margin-right:5px",
+    "line": "margin:2px 0;color:#555",
+    "reading": "color:#d35400;font-family:'Hiragino Sans',sans-serif",
+    "pos": "background-color:#e8f4f8;padding:2px 5px;border-radius:3px;color:#2980b9;font-size:0.9em",
+    "var": "color:#7f8c8d;font-size:0.9em",
+    "meaning": "margin:5px 0;padding:5px;background-color:#fff;border-left:4px solid #3498db;border-radius:4px",
+    "mline": "margin:2px 0",
+    "cn": "margin:2px 0;color:#888",
+    "table": "width:100%;border-collapse:collapse;font-size:0.9em;margin-bottom:15px",
+    "th": "text-align:left;border-bottom:2px solid #3498db;padding:4px",
+    "td": "border-bottom:1px solid #eee;padding:4px;vertical-align:top",
+    "footer": "text-align:center;color:#999;font-size:12px",
+    "grades": "margin:6px 0 0 0;font-size:0.85em",
+    "again": "color:#e74c3c;margin-right:10px;text-decoration:none",
+    "hard": "color:#e67e22;margin-right:10px;text-decoration:none",
+    "good": "color:#27ae60;margin-right:10px;text-decoration:none",
+    "easy": "color:#3498db;margin-right:10px;text-decoration:none",
+}
+
+# {{字段}} 在编译时保留为 {字段}，{样式名} 在编译时替换为 class / style 属性
+PAGE_HEAD = """<html><head><meta charset="utf-8">{style_block}</head><body><div {wrap}>
+<h2 {title}>📅 日语记忆曲线复习表 ({{today}}){{page_label}}</h2>
+<p>今日任务：<b>{{total}}</b> 个单词 (🆕 新词: {{new_count}} / 🔄 复习: {{review_count}}){{page_note}}</p>
+"""
+PAGE_FOOT = """<p {footer}>Generated by DeepSeek AI (Ref: SQLite)</p></div></body></html>"""
+
+CARD = """<div {card}><div {head}><h3 {word}>{{word}}</h3>{{stage}}<div {tags}>{{tags}}</div></div>
+<p {line}><b>读音:</b> <span {reading}>{{readings}}</span></p>
+<p {line}><b>词性:</b> <span {pos}>{{pos}}</span></p>
+<p {line}><b>变形:</b> <span {var}>{{variations}}</span></p>
+{{meanings}}{{grades}}</div>
+"""
+MEANING = """<div {meaning}><p {mline}><b>释义:</b> {{meaning}}</p><p {mline}><b>例句(日):</b> {{example_jp}}</p><p {cn}><b>例句(中):</b> {{example_cn}}</p></div>
+"""
+NEW_BADGE = """<span {new}>NEW</span>"""
+STAGE_DOT = """<span {dot}></span>"""
+TAG_JLPT = """<span {jlpt}>{{level}}</span>"""
+TAG_COMMON = """<span {common}>常用</span>"""
+GRADE_BAR = """<p {grades}>{{links}}</p>"""
+GRADE_LINK = """<a {cls} href="{{url}}">{{label}}</a>"""
+
+TABLE_HEAD = """<table {table}><tr><th {th}>单词</th><th {th}>读音</th><th {th}>词性</th><th {th}>释义</th><th {th}></th></tr>
+"""
+TABLE_ROW = """<tr><td {td}><b>{{word}}</b>{{stage}}</td><td {td}>{{readings}}</td><td {td}>{{pos}}</td><td {td}>{{meaning}}</td><td {td}>{{grades}}</td></tr>
+"""
+TABLE_FOOT = "</table>\n"
+
+# 页眉中的数字 / 页码留出的余量
+_HEAD_SLACK = 256
+
+
+@lru_cache(maxsize=2)
+def compile_templates(inline):
+    """按样式模式把样式名编译进模板，返回 {模板名: 模板字符串}"""
+    if inline:
+        attrs = {name: f'style="{css}"' for name, css in STYLES.items()}
+        style_block = ""
+    else:
+        attrs = {name: f'class="{name}"' for name in STYLES}
+        css_rules = "".join(f".{name}{{{css}}}" for name, css in STYLES.items())
+        # 页眉模板渲染时还要 format 一次，CSS 的花括号需要转义
+        style_block = "<style>" + css_rules.replace("{", "{{").replace("}", "}}") + "</style>"
+
+    templates = {
+        "page_head": PAGE_HEAD.format(style_block=style_block, **attrs),
+        "page_foot": PAGE_FOOT.format(**attrs),
+        "card": CARD.format(**attrs),
+        "meaning": MEANING.format(**attrs),
+        "new": NEW_BADGE.format(**attrs),
+        "tag_jlpt": TAG_JLPT.format(**attrs),
+        "tag_common": TAG_COMMON.format(**attrs),
+        "grade_bar": GRADE_BAR.format(**attrs),
+        "table_head": TABLE_HEAD.format(**attrs),
+        "table_row": TABLE_ROW.format(**attrs),
+        "table_foot": TABLE_FOOT,
+    }
+    for level in range(1, 5):
+        templates[f"dot{level}"] = STAGE_DOT.format(dot=attrs[f"dot{level}"])
+    for grade in ("again", "hard", "good", "easy"):
+        templates[f"grade_{grade}"] = GRADE_LINK.format(cls=attrs[grade])
+    return templates
+
+
+def _stage_html(t, stage):
+    if stage == 0:
+        return t["new"]
+    # 与原来的熟练度颜色一致: 1 红 / 2-3 黄 / 4-5 青 / 6+ 绿
+    level = 4 if stage > 5 else 3 if stage > 3 else 2 if stage > 1 else 1
+    return t[f"dot{level}"]
+
+
+def _fields(details):
+    variations = details.get("variations") or []
+    return {
+        "readings": escape(" / ".join(details.get("readings") or [])),
+        "pos": escape(str(details.get("pos") or "暂无词性")),
+        "variations": escape("、".join(variations)) if variations else "无常见变形",
+    }
+
+
+def _grade_links(t, links):
+    return "".join(
+        t[f"grade_{grade}"].format(url=escape(url), label=label)
+        for grade, label, url in links
+    )
+
+
+def render_card(t, word, stage, details, links=()):
+    tags = "".join(
+        t["tag_jlpt"].format(level=escape(str(lvl).replace("jlpt-", "").upper()))
+        for lvl in details.get("jlpt") or []
+    )
+    if details.get("is_common"):
+        tags += t["tag_common"]
+    meanings = "".join(
+        t["meaning"].format(
+            meaning=escape(str(m.get("meaning", ""))),
+            example_jp=escape(str(m.get("example_jp", ""))),
+            example_cn=escape(str(m.get("example_cn", ""))),
+        )
+        for m in details.get("meanings") or []
+    )
+    grades = t["grade_bar"].format(links=_grade_links(t, links)) if links else ""
+    return t["card"].format(
+        word=escape(word), stage=_stage_html(t, stage), tags=tags, meanings=meanings, grades=grades, **_fields(details),
+    )
+
+
+def render_row(t, word, stage, details, links=()):
+    meanings = details.get("meanings") or []
+    first = escape(str(meanings[0].get("meaning", ""))) if meanings else ""
+    return t["table_row"].format(
+        word=escape(word), stage=_stage_html(t, stage), meaning=first, grades=_grade_links(t, links), **_fields(details),
+    )
+
+
+def paginate(entries, t, budget, overflow):
+    """
+    entries: [(单词, stage, 解析结果, 评分链接)]
+    返回每页的 HTML 片段列表；每页片段的总字节数不超过 budget（单个卡片本身超过 budget 时独占一页）
+    """
+    pages = [[]]
+    used = 0
+    table_open = False
+    table_cost = len(t["table_head"].encode()) + len(t["table_foot"].encode())
+
+    def new_page():
+        nonlocal used, table_open
+        if table_open:
+            pages[-1].append(t["table_foot"])
+        pages.append([])
+        used = 0
+        table_open = False
+
+    use_table = False
+    for word, stage, details, links in entries:
+        if not use_table:
+            card = render_card(t, word, stage, details, links)
+            size = len(card.encode())
+            if used + size <= budget or not pages[-1]:
+                pages[-1].append(card)
+                used += size
+                continue
+            if overflow == "table":
+                # 卡片放不下之后，剩下的单词全部改为表格行
+                use_table = True
+            else:
+                new_page()
+                pages[-1].append(card)
+                used = size
+                continue
+
+        row = render_row(t, word, stage, details, links)
+        size = len(row.encode()) + (0 if table_open else table_cost)
+        if used + size > budget and pages[-1]:
+            new_page()
+            size = len(row.encode()) + table_cost
+        if not table_open:
+            pages[-1].append(t["table_head"])
+            table_open = True
+        pages[-1].append(row)
+        used += size
+
+    if table_open:
+        pages[-1].append(t["table_foot"])
+    return pages
+
+
+def render_pages(entries, today_str, max_bytes=None, overflow=None, inline=None):
+    """
+    entries: [(单词, stage, 解析结果, 评分链接)]，按邮件中的顺序排列；
+             评分链接为 [(评分, 显示文字, URL)]，可以为空
+    返回 [{"subject": ..., "html": ...}]，至少一封
+    """
+    max_bytes = EMAIL_MAX_BYTES if max_bytes is None else max_bytes
+    overflow = overflow or EMAIL_OVERFLOW
+    t = compile_templates(EMAIL_INLINE_STYLES if inline is None else inline)
+
+    new_count = sum(1 for entry in entries if entry[1] == 0)
+    review_count = len(entries) - new_count
+    fixed = len(t["page_head"].encode()) + len(t["page_foot"].encode()) + _HEAD_SLACK
+    pages = paginate(entries, t, max(1, max_bytes - fixed), overflow)
+
+    subject = f'【记忆曲线】{today_str} 任务: {new_count}新词 + {review_count}复习'
+    total_pages = len(pages)
+    rendered = []
+    for index, body in enumerate(pages, 1):
+        multi = total_pages > 1
+        head = t["page_head"].format(
+            today=today_str,
+            page_label=f" {index}/{total_pages}" if multi else "",
+            total=len(entries),
+            new_count=new_count,
+            review_count=review_count,
+            page_note=f"<br>内容较多，已分为 {total_pages} 封邮件发送。" if multi and index == 1 else "",
+        )
+        rendered.append({
+            "subject": f"{subject} ({index}/{total_pages})" if multi else subject,
+            "html": "".join([head, *body, t["page_foot"]]),
+        })
+    return rendered
@@ -0,0 +1,346 @@
+"""
+单词库搜索索引
+
+为 vocab_progress 中的每个单词建立归一化的检索键：
+- word:    全半角折叠 + 片假名转平假名后的写法
+- reading: 平假名读音
+- romaji:  读音的罗马字（Hepburn）
+再加上读音 / 写法的 2-gram 表，用于模糊匹配。
+
+索引在 db.insert_word / db.delete_word 中增量维护；
+第一次搜索时如果发现索引与单词表不一致，会自动整体重建。
+
+用法 (database_cmd):
+    search よる / search yoru / search 食べた
+"""
+import unicodedata
+from collections import Counter
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vocab_search (
+    key TEXT,
+    kind TEXT,
+    word TEXT,
+    PRIMARY KEY (key, kind, word)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_vocab_search_word ON vocab_search (word);
+CREATE TABLE IF NOT EXISTS vocab_ngrams (
+    gram TEXT,
+    word TEXT,
+    PRIMARY KEY (gram, word)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_vocab_ngrams_word ON vocab_ngrams (word);
+"""
+
+# 匹配等级（越小越靠前）
+RANK_EXACT = 0        # 与写法完全一致
+RANK_NORMALIZED = 1   # 归一化后一致 / 读音一致 / 罗马字一致
+RANK_DEINFLECTED = 2  # 还原活用形后一致
+RANK_PREFIX = 3       # 前缀
+RANK_FUZZY = 4        # 模糊
+
+# ---------- 假名 / 罗马字 ----------
+
+_ROMAJI = {
+    "あ": "a", "い": "i", "う": "u", "え": "e", "お": "o",
+    "か": "ka", "き": "ki", "く": "ku", "け": "ke", "こ": "ko",
+    "さ": "sa", "し": "shi", "す": "su", "せ": "se", "そ": "so",
+    "た": "ta", "ち": "chi", "つ": "tsu", "て": "te", "と": "to",
+    "な": "na", "に": "ni", "ぬ": "nu", "ね": "ne", "の": "no",
+    "は": "ha", "ひ": "hi", "ふ": "fu", "へ": "he", "ほ": "ho",
+    "ま": "ma", "み": "mi", "む": "mu", "め": "me", "も": "mo",
+    "や": "ya", "ゆ": "yu", "よ": "yo",
+    "ら": "ra", "り": "ri", "る": "ru", "れ": "re", "ろ": "ro",
+    "わ": "wa", "ゐ": "wi", "ゑ": "we", "を": "wo", "ん": "n",
+    "が": "ga", "ぎ": "gi", "ぐ": "gu", "げ": "ge", "ご": "go",
+    "ざ": "za", "じ": "ji", "ず": "zu", "ぜ": "ze", "ぞ": "zo",
+    "だ": "da", "ぢ": "ji", "づ": "zu", "で": "de", "ど": "do",
+    "ば": "ba", "び": "bi", "ぶ": "bu", "べ": "be", "ぼ": "bo",
+    "ぱ": "pa", "ぴ": "pi", "ぷ": "pu", "ぺ": "pe", "ぽ": "po",
+    "ゔ": "vu",
+    "ぁ": "a", "ぃ": "i", "ぅ": "u", "ぇ": "e", "ぉ": "o",
+    "ゃ": "ya", "ゅ": "yu", "ょ": "yo", "ゎ": "wa",
+}
+_YOON = {"ゃ": "a", "ゅ": "u", "ょ": "o"}
+_SPECIAL_YOON = {"し": "sh", "ち": "ch", "じ": "j", "ぢ": "j"}
+
+# 罗马字 → 平假名（同时接受 Hepburn 和训令式的写法）
+_KANA_FROM_ROMAJI = {}
+for _kana, _roma in _ROMAJI.items():
+    if _kana not in "ぁぃぅぇぉゃゅょゎゐゑ":
+        _KANA_FROM_ROMAJI.setdefault(_roma, _kana)
+for _kana in "きしちにひみりぎじぢびぴ":
+    _stem = _SPECIAL_YOON.get(_kana, _ROMAJI[_kana][:-1] + "y")
+    for _small, _vowel in _YOON.items():
+        _KANA_FROM_ROMAJI.setdefault(_stem + _vowel, _kana + _small)
+_KANA_FROM_ROMAJI.update({
+    "si": "し", "ti": "ち", "tu": "つ", "hu": "ふ", "zi": "じ", "di": "ぢ", "du": "づ",
+    "sya": "しゃ", "syu": "しゅ", "syo": "しょ", "tya": "ちゃ", "tyu": "ちゅ", "tyo": "ちょ",
+    "zya": "じゃ", "zyu": "じゅ", "zyo": "じょ", "jya": "じゃ", "jyu": "じゅ", "jyo": "じょ",
+    "nn": "ん", "n'": "ん", "-": "ー",
+})
+_MAX_ROMAJI = max(len(k) for k in _KANA_FROM_ROMAJI)
+
+
+def katakana_to_hiragana(text):
+    return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in text)
+
+
+def normalize(text):
+    """全半角折叠、片假名转平假名、小写化"""
+    return katakana_to_hiragana(unicodedata.normalize("NFKC", text or "")).strip().lower()
+
+
+def is_romaji(text):
+    return bool(text) and all(c.isascii() for c in text)
+
+
+def to_romaji(kana):
+    """平假名 → Hepburn 罗马字"""
+    kana = normalize(kana)
+    out = []
+    i = 0
+    while i < len(kana):
+        c = kana[i]
+        nxt = kana[i + 1] if i + 1 < len(kana) else ""
+        if nxt in _YOON and c in _ROMAJI and c not in _YOON:
+            stem = _SPECIAL_YOON.get(c, _ROMAJI[c][:-1] + "y")
+            out.append(stem + _YOON[nxt])
+            i += 2
+        elif c == "っ":
+            # 促音：重复下一个音的首个辅音
+            following = to_romaji(kana[i + 1:i + 3])[:1] if nxt else ""
+            out.append("t" if following == "c" else following)
+            i += 1
+        elif c == "ー":
+            prev = out[-1][-1:] if out else ""
+            out.append(prev if prev in "aeiou" else "")
+            i += 1
+        else:
+            out.append(_ROMAJI.get(c, c))
+            i += 1
+    return "".join(out)
+
+
+def romaji_to_kana(text):
+    """罗马字 → 平假名（贪婪匹配，支持促音和 n 的各种写法）"""
+    text = text.lower().replace("ā", "aa").replace("ī", "ii").replace("ū", "uu").replace("ē", "ee").replace("ō", "ou")
+    out = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        nxt = text[i + 1] if i + 1 < len(text) else ""
+        if c == nxt and c not in "aeioun":
+            out.append("っ")
+            i += 1
+            continue
+        if c == "n" and nxt == "n":
+            # nn + 元音（konnichiha）只消耗一个 n，否则 nn 表示 ん
+            after = text[i + 2] if i + 2 < len(text) else ""
+            out.append("ん")
+            i += 1 if after and after in "aeiouy" else 2
+            continue
+        if c == "n" and nxt and nxt not in "aeiouy'":
+            out.append("ん")
+            i += 1
+            continue
+        for size in range(min(_MAX_ROMAJI, len(text) - i), 0, -1):
+            kana = _KANA_FROM_ROMAJI.get(text[i:i + size])
+            if kana:
+                out.append(kana)
+                i += size
+                break
+        else:
+            if c == "n":
+                out.append("ん")
+            else:
+                out.append(c)
+            i += 1
+    return "".join(out)
+
+
+# ---------- 活用还原 ----------
+
+# (活用词尾, 辞书形词尾)，按顺序尝试
+_DEINFLECT_RULES = [
+    # 敬体
+    ("ませんでした", "る"), ("ました", "る"), ("ません", "る"), ("ましょう", "る"), ("ます", "る"),
+    ("きませんでした", "く"), ("きました", "く"), ("きません", "く"), ("きます", "く"),
+    ("ぎました", "ぐ"), ("ぎません", "ぐ"), ("ぎます", "ぐ"),
+    ("しました", "す"), ("しません", "す"), ("します", "す"),
+    ("ちました", "つ"), ("ちません", "つ"), ("ちます", "つ"),
+    ("にました", "ぬ"), ("にません", "ぬ"), ("にます", "ぬ"),
+    ("びました", "ぶ"), ("びません", "ぶ"), ("びます", "ぶ"),
+    ("みました", "む"), ("みません", "む"), ("みます", "む"),
+    ("りました", "る"), ("りません", "る"), ("ります", "る"),
+    ("いました", "う"), ("いません", "う"), ("います", "う"),
+    # 过去 / て形
+    ("いた", "く"), ("いて", "く"), ("いだ", "ぐ"), ("いで", "ぐ"),
+    ("した", "す"), ("して", "す"),
+    ("った", "う"), ("った", "つ"), ("った", "る"), ("って", "う"), ("って", "つ"), ("って", "る"),
+    ("んだ", "む"), ("んだ", "ぶ"), ("んだ", "ぬ"), ("んで", "む"), ("んで", "ぶ"), ("んで", "ぬ"),
+    ("た", "る"), ("て", "る"),
+    # 否定
+    ("かない", "く"), ("がない", "ぐ"), ("さない", "す"), ("たない", "つ"), ("なない", "ぬ"),
+    ("ばない", "ぶ"), ("まない", "む"), ("らない", "る"), ("わない", "う"), ("ない", "る"),
+    # 可能 / 被动 / 愿望 / 意志
+    ("られる", "る"), ("れる", "る"), ("たい", "る"), ("よう", "る"),
+    ("きたい", "く"), ("ぎたい", "ぐ"), ("したい", "す"), ("ちたい", "つ"), ("にたい", "ぬ"),
+    ("びたい", "ぶ"), ("みたい", "む"), ("りたい", "る"), ("いたい", "う"),
+    ("こう", "く"), ("ごう", "ぐ"), ("そう", "す"), ("とう", "つ"), ("のう", "ぬ"),
+    ("ぼう", "ぶ"), ("もう", "む"), ("ろう", "る"), ("おう", "う"),
+    # い形容词
+    ("かった", "い"), ("くなかった", "い"), ("くない", "い"), ("くて", "い"), ("ければ", "い"), ("く", "い"),
+    # な形容词 / 名词 + だ
+    ("だった", ""), ("でした", ""), ("です", ""), ("だ", ""), ("な", ""),
+]
+
+
+def deinflect(text):
+    """返回可能的辞书形候选（不含原词），最多还原两层活用"""
+    candidates = []
+    frontier = [text]
+    for _ in range(2):
+        next_frontier = []
+        for form in frontier:
+            for suffix, replacement in _DEINFLECT_RULES:
+                if form.endswith(suffix) and len(form) > len(suffix):
+                    base = form[:-len(suffix)] + replacement
+                    if base not in candidates and base != text:
+                        candidates.append(base)
+                        next_frontier.append(base)
+        frontier = next_frontier
+    return candidates
+
+
+# ---------- 索引维护 ----------
+
+def _bigrams(text):
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def search_keys(word, reading):
+    keys = {(normalize(word), "word")}
+    if reading:
+        kana = normalize(reading)
+        keys.add((kana, "reading"))
+        keys.add((to_romaji(kana), "romaji"))
+    return keys
+
+
+def index_word(conn, word, reading):
+    """为单个单词写入检索键（需在事务中调用）"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO vocab_search (key, kind, word) VALUES (?, ?, ?)",
+        [(key, kind, word) for key, kind in search_keys(word, reading) if key],
+    )
+    grams = _bigrams(normalize(word)) | _bigrams(normalize(reading))
+    conn.executemany("INSERT OR IGNORE INTO vocab_ngrams (gram, word) VALUES (?, ?)", [(g, word) for g in grams])
+
+
+def unindex_word(conn, word):
+    conn.execute("DELETE FROM vocab_search WHERE word=?", (word,))
+    conn.execute("DELETE FROM vocab_ngrams WHERE word=?", (word,))
+
+
+def rebuild_index(conn):
+    """整体重建索引（需在事务中调用）"""
+    conn.execute("DELETE FROM vocab_search")
+    conn.execute("DELETE FROM vocab_ngrams")
+    for word, reading in conn.execute("SELECT word, reading FROM vocab_progress").fetchall():
+        index_word(conn, word, reading)
+
+
+def index_in_sync(conn):
+    indexed = conn.execute("SELECT COUNT(DISTINCT word) FROM vocab_search").fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM vocab_progress").fetchone()[0]
+    return indexed == total
+
+
+# ---------- 搜索 ----------
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _shared_grams(conn, text, cap=2000):
+    """
+    统计每个单词与 text 共享的 2-gram 数。
+    出现在太多单词里的 gram（超过 cap）区分度很低，只要还有其他 gram 就跳过它们。
+    """
+    postings = {}
+    for gram in _bigrams(text):
+        postings[gram] = [w for (w,) in conn.execute("SELECT word FROM vocab_ngrams WHERE gram=? LIMIT ?", (gram, cap))]
+    selective = [words for words in postings.values() if len(words) < cap]
+    counter = Counter()
+    for words in selective or postings.values():
+        counter.update(words)
+    return counter
+
+
+def search(conn, query, limit=10, fuzzy=True):
+    """
+    返回按相关度排序的候选: [(rank, score, word), ...]
+    rank 见 RANK_* 常量；同一 rank 内 score 越小越靠前。
+    """
+    query = query.strip()
+    if not query:
+        return []
+    norm = normalize(query)
+    kana = romaji_to_kana(norm) if is_romaji(norm) else norm
+
+    best = {}
+
+    def hit(word, rank, score=0):
+        if word not in best or (rank, score) < best[word]:
+            best[word] = (rank, score)
+
+    # 1. 完全一致
+    for (word,) in conn.execute("SELECT word FROM vocab_progress WHERE word=?", (query,)):
+        hit(word, RANK_EXACT)
+
+    # 2. 归一化 / 读音 / 罗马字一致
+    lookup_keys = {norm, kana}
+    if is_romaji(norm):
+        lookup_keys.add(to_romaji(kana))
+    for key in lookup_keys:
+        for (word,) in conn.execute("SELECT word FROM vocab_search WHERE key=?", (key,)):
+            hit(word, RANK_NORMALIZED)
+
+    # 3. 还原活用形
+    for candidate in deinflect(kana):
+        for (word,) in conn.execute("SELECT word FROM vocab_search WHERE key=? AND kind IN ('word', 'reading')", (candidate,)):
+            hit(word, RANK_DEINFLECTED)
+
+    # 4. 前缀
+    prefix_key = to_romaji(kana) if is_romaji(norm) else kana
+    for (word, key) in conn.execute(
+        "SELECT word, key FROM vocab_search WHERE key >= ? AND key < ? LIMIT ?",
+        (prefix_key, prefix_key + "\uffff", limit * 5),
+    ):
+        hit(word, RANK_PREFIX, len(key) - len(prefix_key))
+
+    # 5. 模糊：共享 2-gram 最多的候选，再按编辑距离排序
+    if fuzzy and len(best) < limit:
+        shared = _shared_grams(conn, kana)
+        if shared:
+            words = [w for w, _ in shared.most_common(limit * 20)]
+            readings = dict(conn.execute(
+                f"SELECT word, reading FROM vocab_progress WHERE word IN ({','.join('?' * len(words))})", words,
+            ).fetchall())
+            max_distance = max(1, len(kana) // 2)
+            for word in words:
+                distance = min(edit_distance(kana, normalize(word)), edit_distance(kana, normalize(readings.get(word))))
+                if distance <= max_distance:
+                    hit(word, RANK_FUZZY, distance)
+
+    ranked = sorted((rank, score, word) for word, (rank, score) in best.items())
+    return ranked[:limit]
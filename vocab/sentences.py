@@ -0,0 +1,235 @@
+"""
+例句库
+
+LLM 生成的例句（日文 + 中文）和阅读文章、听力转写中的日文句子（收词时加入，见 vocab/harvest.py）都保存在 sentences 表中，
+并建立 FTS5 全文索引（trigram 分词，适合没有空格的日文）。
+
+解析单词时先在例句库中查找包含该单词（或其活用形）的句子：
+    - 足够 EXAMPLE_MIN_SENTENCES 句时，只让 LLM 写释义，例句直接取自例句库
+    - 不够时照常让 LLM 写例句，新例句存入例句库
+同一个单词用过的句子 EXAMPLE_ROTATION_DAYS 天内不会再次出现，优先使用从未用过、带中文翻译的句子。
+
+用法:
+    python vocab/sentences.py stats
+    python vocab/sentences.py search 食べる
+"""
+import os
+import re
+import json
+import sys
+import datetime
+
+# 允许直接运行本脚本时导入项目根目录下的 common / vocab 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import VOCAB_DB_PATH, EXAMPLE_MIN_SENTENCES, EXAMPLE_ROTATION_DAYS
+from common import metrics
+from vocab import db, inflect
+
+SENTENCE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sentences (
+    id INTEGER PRIMARY KEY,
+    jp TEXT NOT NULL UNIQUE,
+    cn TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sentence_usage (
+    word TEXT,
+    sentence_id INTEGER,
+    last_used TEXT NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (word, sentence_id)
+) WITHOUT ROWID;
+"""
+# 外部内容表：索引只保存 trigram，句子本身在 sentences 表中
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS sentences_fts USING fts5(
+    jp, content='sentences', content_rowid='id', tokenize='trigram'
+);
+"""
+
+# trigram 索引只能匹配 3 个字及以上的字符串，更短的活用形直接扫描 sentences 表
+MIN_FTS_LENGTH = 3
+# 每个单词最多取几句（多于 EXAMPLE_MIN_SENTENCES 时义项较多的单词也能每条都有例句）
+EXAMPLES_PER_WORD = max(3, EXAMPLE_MIN_SENTENCES)
+MIN_SENTENCE_LENGTH = 6
+MAX_SENTENCE_LENGTH = 80
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?])")
+_KANA = re.compile(r"[぀-ヿ]")
+
+_schema_ready = False
+_fts = True
+
+
+def _conn():
+    global _schema_ready, _fts
+    conn = db.get_connection()
+    if not _schema_ready:
+        conn.executescript(SENTENCE_SCHEMA)
+        try:
+            conn.executescript(FTS_SCHEMA)
+        except Exception as e:
+            # 编译时没有 FTS5 / trigram（SQLite < 3.34）时退化为逐行查找
+            print(f"⚠️ 无法创建例句全文索引，将使用逐行查找: {e}")
+            _fts = False
+        _schema_ready = True
+    return conn
+
+
+def ensure_schema():
+    """建表（并发使用前先在主线程调用一次）"""
+    _conn()
+
+
+# ---------- 写入 ----------
+
+@metrics.timed("sqlite_query", op="add_sentences")
+def add_sentences(pairs, source, today=None):
+    """pairs: [(日文, 中文)]；已有的句子只在原来没有中文时补上翻译。返回 {日文: id}"""
+    today = today or datetime.date.today().isoformat()
+    pairs = [(jp.strip(), (cn or "").strip()) for jp, cn in pairs if jp and jp.strip()]
+    if not pairs:
+        return {}
+    _conn()
+    with db.transaction() as conn:
+        last_id = conn.execute("SELECT coalesce(max(id), 0) FROM sentences").fetchone()[0]
+        conn.executemany(
+            "INSERT OR IGNORE INTO sentences (jp, cn, source, added_at) VALUES (?, ?, ?, ?)",
+            [(jp, cn, source, today) for jp, cn in pairs],
+        )
+        conn.executemany(
+            "UPDATE sentences SET cn = ? WHERE jp = ? AND cn = '' AND ? != ''",
+            [(cn, jp, cn) for jp, cn in pairs],
+        )
+        if _fts:
+            conn.execute("INSERT INTO sentences_fts (rowid, jp) SELECT id, jp FROM sentences WHERE id > ?", (last_id,))
+        jps = [jp for jp, _ in pairs]
+        return dict(conn.execute(f"SELECT jp, id FROM sentences WHERE jp IN ({','.join('?' * len(jps))})", jps))
+
+
+def split_sentences(text):
+    """按句号等切分，只保留长度合适、含假名的日文句子"""
+    sentences = []
+    for line in text.splitlines():
+        for sentence in _SENTENCE_END.split(line):
+            sentence = sentence.strip()
+            if MIN_SENTENCE_LENGTH <= len(sentence) <= MAX_SENTENCE_LENGTH and _KANA.search(sentence):
+                sentences.append(sentence)
+    return sentences
+
+
+def add_text(text, source):
+    """文章 / 转写的日文正文切分成句子存入例句库（没有逐句对应的中文翻译，使用时再让 LLM 翻译）"""
+    return len(add_sentences([(s, "") for s in split_sentences(text)], source))
+
+
+def add_from_details(details, source="llm"):
+    """LLM 解析结果中的例句存入例句库，返回 [句子 id]"""
+    pairs = [(m.get("example_jp", ""), m.get("example_cn", "")) for m in details.get("meanings") or []]
+    return list(add_sentences(pairs, source).values())
+
+
+# ---------- 查找 ----------
+
+def search_forms(word, pos_list=()):
+    """查找时使用的写法：单词本身 + 活用形（去重，保持顺序）"""
+    forms = [word] + [form for _, form in inflect.conjugate(word, pos_list)]
+    return list(dict.fromkeys(f for f in forms if f))
+
+
+def _fts_phrase(form):
+    return '"' + form.replace('"', '""') + '"'
+
+
+@metrics.timed("sqlite_query", op="pick_examples")
+def pick_examples(word, pos_list=(), limit=EXAMPLE_MIN_SENTENCES, today=None, rotate=True):
+    """
+    返回最多 limit 个可用的例句 [{"id", "jp", "cn"}]：
+    排除这个单词最近 EXAMPLE_ROTATION_DAYS 天内用过的句子（rotate=False 时不排除），
+    从未用过的、有中文翻译的优先。
+    """
+    if not os.path.exists(VOCAB_DB_PATH):
+        return []
+    today = today or datetime.date.today()
+    cutoff = (today - datetime.timedelta(days=EXAMPLE_ROTATION_DAYS)).isoformat() if rotate else "9999-12-31"
+    conn = _conn()
+
+    forms = search_forms(word, pos_list)
+    long_forms = [f for f in forms if len(f) >= MIN_FTS_LENGTH] if _fts else []
+    short_forms = [f for f in forms if f not in long_forms]
+    candidates = []
+    params = []
+    if long_forms:
+        candidates.append("SELECT rowid AS id FROM sentences_fts WHERE sentences_fts MATCH ?")
+        params.append(" OR ".join(_fts_phrase(f) for f in long_forms))
+    if short_forms:
+        candidates.append(f"SELECT id FROM sentences WHERE {' OR '.join('instr(jp, ?) > 0' for _ in short_forms)}")
+        params.extend(short_forms)
+
+    rows = conn.execute(f"""
+        SELECT s.id, s.jp, s.cn FROM sentences s
+        JOIN ({' UNION '.join(candidates)}) c ON c.id = s.id
+        LEFT JOIN sentence_usage u ON u.word = ? AND u.sentence_id = s.id
+        WHERE u.last_used IS NULL OR u.last_used <= ?
+        ORDER BY u.last_used IS NOT NULL, u.last_used, s.cn = '', random()
+        LIMIT ?
+    """, (*params, word, cutoff, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def mark_used(word, sentence_ids, today=None):
+    if not sentence_ids:
+        return
+    today = today or datetime.date.today().isoformat()
+    _conn()
+    with db.transaction() as conn:
+        conn.executemany("""
+            INSERT INTO sentence_usage (word, sentence_id, last_used) VALUES (?, ?, ?)
+            ON CONFLICT (word, sentence_id) DO UPDATE SET last_used = excluded.last_used, uses = uses + 1
+        """, [(word, sentence_id, today) for sentence_id in sentence_ids])
+
+
+def corpus_stats():
+    conn = _conn()
+    total, with_cn = conn.execute("SELECT count(*), count(nullif(cn, '')) FROM sentences").fetchone()
+    sources = conn.execute("""
+        SELECT CASE WHEN source LIKE 'read:%' THEN 'read' ELSE source END AS kind, count(*)
+        FROM sentences GROUP BY kind ORDER BY count(*) DESC
+    """).fetchall()
+    return total, with_cn, sources
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="例句库")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="例句数量")
+    p_search = sub.add_parser("search", help="查找包含某个单词的例句（不计入轮换）")
+    p_search.add_argument("word")
+    p_search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(VOCAB_DB_PATH):
+        print(f"❌ 未找到数据库文件: {VOCAB_DB_PATH}")
+        return
+    try:
+        if args.command == "stats":
+            total, with_cn, sources = corpus_stats()
+            print(f"📚 例句库共 {total} 句，其中 {with_cn} 句有中文翻译")
+            for kind, count in sources:
+                print(f"   {kind}: {count}")
+        else:
+            row = db.get_word(args.word)
+            pos_list = json.loads(row["part_of_speech"] or "[]") if row else []
+            for example in pick_examples(args.word, pos_list, args.limit, rotate=False):
+                print(f"   {example['jp']}" + (f"\n      {example['cn']}" if example["cn"] else ""))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+多用户分发
+
+vocab_progress 本身的进度属于默认用户（RECEIVER_EMAIL），其他学习者登记在 learners 表中。
+每天先为每个人选出今日单词，再把所有人的单词合并去重，每个单词只调用一次 API 解析，
+最后分别为每个人生成并发送邮件、更新各自的进度。
+
+用法:
+    python vocab/team.py add <用户ID> <邮箱> [--name 名字] [--daily N]
+    python vocab/team.py enroll <用户ID> (--all | --where 条件 | --file words.txt)
+    python vocab/team.py list
+    python vocab/team.py remove <用户ID>
+"""
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 允许直接运行本脚本时导入项目根目录下的 common / vocab 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import RECEIVER_EMAIL, NEW_WORDS_PER_DAY, TEAM_WORKERS
+from vocab import db, learners, bulk, sentences, prefetch, grading
+from vocab.main import build_plan, plan_today, get_word_details, render_email, send_pages, apply_updates
+
+# ---------- 每日分发 ----------
+
+def team_members():
+    """默认用户在前，其余为登记的学习者"""
+    members = [{"user_id": learners.DEFAULT_USER, "email": RECEIVER_EMAIL, "new_words_per_day": None}]
+    members += learners.list_learners()
+    return members
+
+
+def plan_member(member, today):
+    if member["user_id"] == learners.DEFAULT_USER:
+        return plan_today(today)
+    limit = member["new_words_per_day"] or NEW_WORDS_PER_DAY
+    return build_plan(
+        today,
+        learners.new_words(member["user_id"], limit),
+        learners.due_reviews(member["user_id"], today),
+    )
+
+
+def enrich_all(plans, journal):
+    """合并所有人的今日单词，每个单词只解析一次"""
+    unique = {}
+    for plan in plans.values():
+        for item in plan["new_words"] + plan["due_reviews"]:
+            unique.setdefault(item["word"], item)
+
+    print(f"🧩 {len(plans)} 位学习者共需解析 {len(unique)} 个不同的单词")
+    # 各线程使用自己的数据库连接（见 vocab/db.py）；表在并发之前建好
+    for module in (sentences, prefetch, grading):
+        module.ensure_schema()
+    with ThreadPoolExecutor(max_workers=TEAM_WORKERS) as pool:
+        results = pool.map(lambda item: get_word_details(item["word"], item, journal), unique.values())
+        return dict(zip(unique, results))
+
+
+def deliver_member(member, plan, details_map, journal):
+    """为一位学习者生成并发送邮件，返回是否已送达"""
+    user_id = member["user_id"]
+    if journal.has("deliver", user_id):
+        return True
+
+    rendered = journal.get("render", user_id)
+    if rendered is None:
+        review_queue = plan["new_words"] + plan["due_reviews"]
+        email_data_list = [
+            {"word": item["word"], "stage": item["stage"], "db_raw_info": item}
+            for item in review_queue
+        ]
+        rendered = render_email(email_data_list, journal, journal.run_date, details_map, user_id)
+        journal.record("render", user_id, rendered)
+
+    if not send_pages(rendered, member["email"], journal, user_id):
+        return False
+    journal.record("deliver", user_id)
+    return True
+
+
+def update_member(member, plan):
+    if member["user_id"] == learners.DEFAULT_USER:
+        return apply_updates(plan["updates"])
+    try:
+        with db.transaction() as conn:
+            learners.update_progress(conn, member["user_id"], plan["updates"])
+        print(f"✅ {member['user_id']} 的进度已更新 {len(plan['updates'])} 条记录。")
+        return True
+    except Exception as e:
+        print(f"❌ {member['user_id']} 的进度更新失败: {e}")
+        return False
+
+
+def run_team(journal):
+    today = journal.run_date
+    if journal.finished:
+        print(f"✅ {today} 的单词任务已经完成 (run: {journal.run_id})，跳过。")
+        return
+
+    # 每个人的今日计划只在第一次运行时选出
+    members = team_members()
+    plans = {}
+    for member in members:
+        user_id = member["user_id"]
+        plan = journal.get("plan", user_id)
+        if plan is None:
+            plan = plan_member(member, today)
+            journal.record("plan", user_id, plan)
+        plans[user_id] = plan
+        print(f"👤 {user_id}: 新词 {len(plan['new_words'])} / 复习 {len(plan['due_reviews'])}")
+
+    active = [m for m in members if plans[m["user_id"]]["updates"]]
+    pending = [m for m in active if not journal.has("deliver", m["user_id"])]
+    details_map = enrich_all({m["user_id"]: plans[m["user_id"]] for m in pending}, journal) if pending else {}
+
+    # 邮件并发发送（连接池复用 SMTP 连接）
+    with ThreadPoolExecutor(max_workers=TEAM_WORKERS) as pool:
+        delivered = list(pool.map(
+            lambda m: deliver_member(m, plans[m["user_id"]], details_map, journal), active,
+        ))
+
+    # 进度更新只在主线程中进行，已送达的人才推进 stage
+    all_done = True
+    for member, ok in zip(active, delivered):
+        user_id = member["user_id"]
+        if not ok:
+            print(f"⚠️ {user_id} 的邮件未发送，进度保持不变，重新运行将从断点继续。")
+            all_done = False
+        elif not journal.has("update", user_id):
+            if update_member(member, plans[user_id]):
+                journal.record("update", user_id, len(plans[user_id]["updates"]))
+            else:
+                all_done = False
+
+    if all_done:
+        journal.finish()
+
+
+# ---------- 命令行 ----------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="管理单词学习者")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_add = sub.add_parser("add", help="登记学习者（已存在时更新）")
+    p_add.add_argument("user_id")
+    p_add.add_argument("email")
+    p_add.add_argument("--name")
+    p_add.add_argument("--daily", type=int, help=f"每日新词数量（默认 {NEW_WORDS_PER_DAY}）")
+
+    p_enroll = sub.add_parser("enroll", help="为学习者加入词库中的单词")
+    p_enroll.add_argument("user_id")
+    group = p_enroll.add_mutually_exclusive_group(required=True)
+    group.add_argument("--all", action="store_true", help="词库中的全部单词")
+    group.add_argument("--where", help="条件，例如 \"jlpt=n5 is_common=1\"")
+    group.add_argument("--file", help="单词文件（每行一个）")
+
+    sub.add_parser("list", help="列出学习者")
+
+    p_remove = sub.add_parser("remove", help="删除学习者及其进度")
+    p_remove.add_argument("user_id")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "add":
+            learners.add_learner(args.user_id, args.email, args.name, args.daily)
+            print(f"✓ 已登记学习者 {args.user_id} <{args.email}>")
+
+        elif args.command == "enroll":
+            if not any(m["user_id"] == args.user_id for m in learners.list_learners()):
+                print(f"❌ 未找到学习者: {args.user_id}")
+                return
+            if args.all:
+                where_sql, params = "1", []
+            elif args.where:
+                try:
+                    where_sql, params = bulk.parse_where(args.where)
+                except ValueError as e:
+                    print(f"❌ {e}")
+                    return
+            else:
+                # 分批生成 IN 条件，避免超过 SQLite 的参数数量上限
+                words = bulk.read_word_file(args.file)
+                added = 0
+                for i in range(0, len(words), 500):
+                    chunk = words[i:i + 500]
+                    added += learners.enroll(args.user_id, f"word IN ({','.join('?' * len(chunk))})", chunk)
+                print(f"✓ 已为 {args.user_id} 加入 {added} 个单词")
+                return
+            added = learners.enroll(args.user_id, where_sql, params)
+            print(f"✓ 已为 {args.user_id} 加入 {added} 个单词")
+
+        elif args.command == "list":
+            rows = learners.list_learners()
+            if not rows:
+                print("还没有登记其他学习者（默认用户使用 RECEIVER_EMAIL）。")
+            for row in rows:
+                stats = learners.learner_stats(row["user_id"])
+                daily = row["new_words_per_day"] or NEW_WORDS_PER_DAY
+                print(f"  {row['user_id']:<12} {row['email']:<30} 每日新词 {daily:<3} "
+                      f"词库 {stats['total']} (未学习 {stats['unlearned']})")
+
+        elif args.command == "remove":
+            if learners.remove_learner(args.user_id):
+                print(f"✓ 已删除学习者 {args.user_id}")
+            else:
+                print(f"❌ 未找到学习者: {args.user_id}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,564 @@
+"""
+词库导入 / 导出（Anki .apkg、CSV / TSV）
+
+- 导入时逐块读取源文件（CSV 按行读取，Anki 包解压出集合数据库后用游标分批读取），
+  每 CHUNK_SIZE 个单词在一个事务中写入，内存占用与文件大小无关
+- 字段按列名映射（Expression / Reading / Meaning ... 都能识别），Anki 的复习状态换算为 stage 和复习日期
+- 缺少读音或释义的单词只查本地 JMdict（如果已导入），不联网
+- 已存在的单词默认跳过；--update 时用源文件中的复习状态覆盖
+- 导出同样用生成器逐行写出
+
+用法:
+    python vocab/transfer.py import deck.apkg [--update] [--no-dict]
+    python vocab/transfer.py import words.csv           # .tsv / .txt 按制表符分隔
+    python vocab/transfer.py export backup.csv          # 或 .tsv / .apkg
+"""
+import os
+import re
+import csv
+import sys
+import json
+import time
+import html
+import shutil
+import sqlite3
+import zipfile
+import hashlib
+import argparse
+import datetime
+import tempfile
+from bisect import bisect_right
+from itertools import islice
+
+# 允许直接运行本脚本时导入项目根目录下的 common / vocab 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from common.config import REVIEW_INTERVALS as INTERVALS
+from vocab import db
+from vocab.jmdict import get_dictionary
+
+CHUNK_SIZE = 2000
+EXPORT_FIELDS = ["word", "reading", "definitions", "part_of_speech", "is_common", "jlpt",
+                 "stage", "first_seen", "last_review", "next_review"]
+
+# 列名 / Anki 字段名 -> vocab_progress 字段（比较时忽略大小写、空格、下划线和连字符）
+FIELD_ALIASES = {
+    "word": ["word", "expression", "vocab", "vocabulary", "kanji", "front", "term", "単語", "单词", "表記"],
+    "reading": ["reading", "kana", "furigana", "hiragana", "読み", "读音", "假名"],
+    "definitions": ["definitions", "definition", "meaning", "meanings", "english", "back", "glossary",
+                    "意味", "释义", "意思"],
+    "part_of_speech": ["partofspeech", "pos", "品詞", "词性"],
+    "is_common": ["iscommon", "common"],
+    "jlpt": ["jlpt", "level", "tags"],
+    "stage": ["stage"],
+    "first_seen": ["firstseen"],
+    "last_review": ["lastreview"],
+    "next_review": ["nextreview"],
+}
+_ALIAS_LOOKUP = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+
+_TAG = re.compile(r"<[^>]+>")
+_BR = re.compile(r"<br\s*/?>|</div>|</p>", re.IGNORECASE)
+_SOUND = re.compile(r"\[sound:[^\]]*\]")
+_FURIGANA = re.compile(r"\s?([^\s\[\]]+)\[[^\]]*\]")
+_SPLIT = re.compile(r"\s*(?:[;；\n]|\d+\.\s)\s*")
+_JLPT = re.compile(r"(?:jlpt)?[\s_:\-]*n([1-5])\b", re.IGNORECASE)
+
+SQL_UPDATE_STATE = """
+    UPDATE vocab_progress
+    SET stage = :stage, last_review = :last_review, next_review = :next_review,
+        first_seen = CASE WHEN first_seen = '' THEN :first_seen ELSE first_seen END
+    WHERE word = :word
+"""
+
+
+# ---------- 字段清洗 ----------
+
+def _header_key(name):
+    return re.sub(r"[\s_\-]", "", name.strip().lower())
+
+
+def map_header(names):
+    """列名列表 -> {列序号: 字段}；无法识别的列忽略"""
+    mapping = {}
+    for index, name in enumerate(names):
+        field = _ALIAS_LOOKUP.get(_header_key(name))
+        if field and field not in mapping.values():
+            mapping[index] = field
+    return mapping
+
+
+def clean_text(value):
+    """去掉 HTML 标签、[sound:...] 和多余空白"""
+    value = _SOUND.sub("", value or "")
+    value = _BR.sub("\n", value)
+    value = html.unescape(_TAG.sub("", value))
+    return "\n".join(line.strip() for line in value.splitlines() if line.strip())
+
+
+def clean_word(value):
+    # Anki 注音写法 漢字[かんじ] 只保留汉字
+    return _FURIGANA.sub(r"\1", clean_text(value)).replace("\n", " ").strip()
+
+
+def _json_list(value, split=True):
+    value = (value or "").strip()
+    if not value:
+        return []
+    if value.startswith("["):
+        try:
+            items = json.loads(value)
+            if isinstance(items, list):
+                return [str(item) for item in items if str(item).strip()]
+        except json.JSONDecodeError:
+            pass
+    if not split:
+        return [value]
+    return [item for item in _SPLIT.split(value) if item]
+
+
+def parse_jlpt(*values):
+    levels = []
+    for value in values:
+        for level in _JLPT.findall(value or ""):
+            tag = f"jlpt-n{level}"
+            if tag not in levels:
+                levels.append(tag)
+    return levels
+
+
+def stage_for_interval(days):
+    """Anki 的间隔（天）-> stage：stage s 的上一次间隔为 INTERVALS[s-1]"""
+    return max(1, bisect_right(INTERVALS, days))
+
+
+def interval_for_stage(stage):
+    return INTERVALS[min(max(stage, 1), len(INTERVALS)) - 1]
+
+
+def make_row(fields, tags=""):
+    """把 {字段: 原始文本} 整理为 vocab_progress 的一行；没有单词时返回 None"""
+    word = clean_word(fields.get("word", ""))
+    if not word:
+        return None
+    definitions = _json_list(clean_text(fields.get("definitions", "")))
+    part_of_speech = _json_list(clean_text(fields.get("part_of_speech", "")))
+    jlpt = parse_jlpt(fields.get("jlpt", ""), tags)
+    try:
+        stage = int(fields.get("stage") or 0)
+    except ValueError:
+        stage = 0
+    is_common = (str(fields.get("is_common", "")).strip().lower() in ("1", "true", "yes", "是", "常用")
+                 or "common" in tags.lower().split())
+    return {
+        "word": word,
+        "stage": stage,
+        "first_seen": (fields.get("first_seen") or "").strip(),
+        "last_review": (fields.get("last_review") or "").strip(),
+        "next_review": (fields.get("next_review") or "").strip(),
+        "reading": clean_word(fields.get("reading", "")),
+        "definitions": json.dumps(definitions) if definitions else "",
+        "part_of_speech": json.dumps(part_of_speech) if part_of_speech else "",
+        "is_common": int(is_common),
+        "jlpt": json.dumps(jlpt) if jlpt else "",
+    }
+
+
+def fill_from_dictionary(row, dictionary):
+    """读音 / 释义为空时用本地词典补全"""
+    if dictionary is None or (row["reading"] and row["definitions"]):
+        return
+    info = dictionary.word_info(row["word"])
+    if not info:
+        return
+    if not row["reading"]:
+        row["reading"] = info["reading"]
+    if not row["definitions"] and info["definitions"]:
+        row["definitions"] = json.dumps(info["definitions"])
+    if not row["part_of_speech"] and info["part_of_speech"]:
+        row["part_of_speech"] = json.dumps(info["part_of_speech"])
+    row["is_common"] = row["is_common"] or int(bool(info["is_common"]))
+
+
+# ---------- 读取源文件（生成器） ----------
+
+def iter_delimited(path, delimiter):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        mapping = map_header(header)
+        if "word" not in mapping.values():
+            # 没有可识别的表头：第一列为单词，第二列为释义，表头行本身也是数据
+            mapping = {0: "word", 1: "definitions"}
+            reader = _prepend(header, reader)
+        for record in reader:
+            row = make_row({field: record[i] for i, field in mapping.items() if i < len(record)})
+            if row:
+                yield row
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def _anki_collection(zf):
+    names = set(zf.namelist())
+    if "collection.anki21" in names:
+        return "collection.anki21"
+    if "collection.anki21b" in names:
+        raise ValueError("新版 Anki 包（collection.anki21b）不支持，请导出时勾选“兼容旧版本 Anki”")
+    if "collection.anki2" in names:
+        return "collection.anki2"
+    raise ValueError("不是有效的 Anki 包：找不到 collection.anki2")
+
+
+def _model_mappings(conn):
+    """每个笔记类型的 {字段序号: vocab 字段}；识别不出单词字段时第一个字段为单词、第二个为释义"""
+    models = json.loads(conn.execute("SELECT models FROM col").fetchone()[0])
+    mappings = {}
+    for mid, model in models.items():
+        names = [f["name"] for f in sorted(model["flds"], key=lambda f: f["ord"])]
+        mapping = map_header(names)
+        if "word" not in mapping.values():
+            mapping = {0: "word", 1: "definitions"} if len(names) > 1 else {0: "word"}
+        mappings[int(mid)] = mapping
+    return mappings
+
+
+# 每个笔记取间隔最长的一张卡片（正反面卡片只算一个单词）
+SQL_ANKI_NOTES = """
+    SELECT n.mid, n.flds, n.tags, c.id, c.type, c.queue, c.ivl, c.due
+    FROM notes n JOIN cards c ON c.id = (
+        SELECT id FROM cards WHERE nid = n.id ORDER BY ivl DESC, id LIMIT 1
+    )
+"""
+
+
+def iter_anki_collection(collection_path, today=None):
+    today = today or datetime.date.today()
+    conn = sqlite3.connect(collection_path)
+    try:
+        crt = datetime.date.fromtimestamp(conn.execute("SELECT crt FROM col").fetchone()[0])
+        mappings = _model_mappings(conn)
+        cursor = conn.execute(SQL_ANKI_NOTES)
+        while True:
+            batch = cursor.fetchmany(CHUNK_SIZE)
+            if not batch:
+                break
+            for mid, flds, tags, card_id, card_type, queue, ivl, due in batch:
+                values = flds.split("\x1f")
+                mapping = mappings.get(mid, {0: "word"})
+                row = make_row({field: values[i] for i, field in mapping.items() if i < len(values)}, tags)
+                if row is None:
+                    continue
+                if card_type == 2 and ivl > 0:
+                    # 复习卡片：due 为相对集合创建日的天数
+                    next_review = crt + datetime.timedelta(days=due)
+                    row["stage"] = stage_for_interval(ivl)
+                    row["next_review"] = next_review.isoformat()
+                    row["last_review"] = (next_review - datetime.timedelta(days=ivl)).isoformat()
+                    row["first_seen"] = datetime.date.fromtimestamp(card_id / 1000).isoformat()
+                elif card_type in (1, 3):
+                    # 学习中 / 重新学习：明天开始按第 1 级复习
+                    row["stage"] = 1
+                    row["next_review"] = (today + datetime.timedelta(days=1)).isoformat()
+                    row["last_review"] = today.isoformat()
+                    row["first_seen"] = datetime.date.fromtimestamp(card_id / 1000).isoformat()
+                yield row
+    finally:
+        conn.close()
+
+
+def iter_anki(path):
+    """.apkg / .colpkg：把集合数据库分块解压到临时文件（SQLite 只能读取文件）后逐批读取"""
+    if not zipfile.is_zipfile(path):
+        # 直接给出的 collection.anki2 文件
+        yield from iter_anki_collection(path)
+        return
+    with zipfile.ZipFile(path) as zf, tempfile.TemporaryDirectory() as tmp:
+        member = _anki_collection(zf)
+        collection_path = os.path.join(tmp, "collection.anki2")
+        with zf.open(member) as src, open(collection_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        yield from iter_anki_collection(collection_path)
+
+
+def iter_source(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".apkg", ".colpkg", ".anki2", ".anki21"):
+        return iter_anki(path)
+    if ext in (".tsv", ".txt"):
+        return iter_delimited(path, "\t")
+    if ext == ".csv":
+        return iter_delimited(path, ",")
+    raise ValueError(f"不支持的文件类型: {ext}（支持 .apkg / .csv / .tsv / .txt）")
+
+
+# ---------- 导入 ----------
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_rows(rows, update=False, use_dictionary=True, progress=None):
+    """分块写入，返回 {"added", "updated", "skipped"}"""
+    dictionary = get_dictionary() if use_dictionary else None
+    counts = {"added": 0, "updated": 0, "skipped": 0}
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        # 同一块中重复的单词只保留第一次出现
+        unique = {}
+        for row in chunk:
+            if row["word"] in unique:
+                counts["skipped"] += 1
+            else:
+                unique[row["word"]] = row
+        existing = db.existing_words(unique)
+        new_rows = [row for word, row in unique.items() if word not in existing]
+        for row in new_rows:
+            fill_from_dictionary(row, dictionary)
+        state_rows = [unique[word] for word in existing if unique[word]["stage"] > 0] if update else []
+
+        with db.transaction() as conn:
+            db.insert_words(conn, new_rows)
+            if state_rows:
+                conn.executemany(SQL_UPDATE_STATE, state_rows)
+
+        counts["added"] += len(new_rows)
+        counts["updated"] += len(state_rows)
+        counts["skipped"] += len(existing) - len(state_rows)
+        if progress:
+            progress(counts)
+    return counts
+
+
+def import_file(path, update=False, use_dictionary=True, progress=None):
+    return import_rows(iter_source(path), update, use_dictionary, progress)
+
+
+# ---------- 导出 ----------
+
+def iter_deck():
+    cursor = db.get_connection().execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM vocab_progress ORDER BY rowid")
+    while True:
+        batch = cursor.fetchmany(CHUNK_SIZE)
+        if not batch:
+            return
+        for row in batch:
+            yield dict(row)
+
+
+def _readable(row):
+    """CSV 中的列表字段用 "; " 连接，JLPT 写成 N5，方便在表格软件中查看（导入时可以解析回来）"""
+    out = dict(row)
+    out["definitions"] = "; ".join(_json_list(row["definitions"], split=False))
+    out["part_of_speech"] = "; ".join(_json_list(row["part_of_speech"], split=False))
+    out["jlpt"] = " ".join(level.replace("jlpt-", "").upper() for level in _json_list(row["jlpt"], split=False))
+    return out
+
+
+def export_delimited(path, delimiter):
+    count = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(EXPORT_FIELDS)
+        for row in iter_deck():
+            row = _readable(row)
+            writer.writerow([row[field] for field in EXPORT_FIELDS])
+            count += 1
+    return count
+
+
+# Anki 2.1 旧版集合格式（schema 11），导出的 .apkg 可以被所有版本的 Anki 导入
+ANKI_SCHEMA = """
+CREATE TABLE col (id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+    ver integer not null, dty integer not null, usn integer not null, ls integer not null, conf text not null,
+    models text not null, decks text not null, dconf text not null, tags text not null);
+CREATE TABLE notes (id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null, csum integer not null,
+    flags integer not null, data text not null);
+CREATE TABLE cards (id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null, due integer not null,
+    ivl integer not null, factor integer not null, reps integer not null, lapses integer not null,
+    left integer not null, odue integer not null, odid integer not null, flags integer not null, data text not null);
+CREATE TABLE revlog (id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null, type integer not null);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+ANKI_MODEL_ID = 1718000000000
+ANKI_DECK_ID = 1718000000001
+ANKI_FIELDS = ["Word", "Reading", "Meaning", "PartOfSpeech"]
+
+
+def _anki_col_row(now):
+    fields = [{"name": name, "ord": i, "sticky": False, "rtl": False, "font": "Arial", "size": 20, "media": []}
+              for i, name in enumerate(ANKI_FIELDS)]
+    model = {
+        "id": ANKI_MODEL_ID, "name": "Daily-Japanese", "type": 0, "mod": now, "usn": -1, "sortf": 0,
+        "did": ANKI_DECK_ID, "flds": fields, "tags": [], "vers": [], "req": [[0, "any", [0]]],
+        "tmpls": [{
+            "name": "Card 1", "ord": 0, "did": None, "bqfmt": "", "bafmt": "",
+            "qfmt": "<div class=word>{{Word}}</div>",
+            "afmt": "{{FrontSide}}<hr id=answer><div>{{Reading}}</div><div>{{Meaning}}</div><div class=pos>{{PartOfSpeech}}</div>",
+        }],
+        "css": ".card{font-family:sans-serif;font-size:22px;text-align:center}.word{font-size:40px}.pos{color:#888;font-size:16px}",
+        "latexPre": "\\documentclass[12pt]{article}\\begin{document}", "latexPost": "\\end{document}", "latexsvg": False,
+    }
+
+    def deck(deck_id, name):
+        return {
+            "id": deck_id, "name": name, "desc": "", "mod": now, "usn": -1, "dyn": 0, "conf": 1, "collapsed": False,
+            "browserCollapsed": False, "extendNew": 10, "extendRev": 50,
+            "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+        }
+
+    dconf = {
+        "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True, "timer": 0,
+        "replayq": True, "dyn": False,
+        "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500, "order": 1, "perDay": 20, "bury": True, "separate": True},
+        "rev": {"perDay": 200, "ease4": 1.3, "fuzz": 0.05, "maxIvl": 36500, "ivlFct": 1, "bury": True, "minSpace": 1},
+        "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 0},
+    }
+    conf = {"nextPos": 1, "estTimes": True, "activeDecks": [1], "sortType": "noteFld", "timeLim": 0,
+            "sortBackwards": False, "addToCur": True, "curDeck": 1, "newSpread": 0, "dueCounts": True,
+            "curModel": str(ANKI_MODEL_ID), "collapseTime": 1200}
+    return (1, 0, now, now * 1000, 11, 0, 0, 0, json.dumps(conf), json.dumps({str(ANKI_MODEL_ID): model}),
+            json.dumps({"1": deck(1, "Default"), str(ANKI_DECK_ID): deck(ANKI_DECK_ID, "Daily-Japanese")}),
+            json.dumps({"1": dconf}), "{}")
+
+
+def _day_millis(date):
+    return int(datetime.datetime.combine(date, datetime.time()).timestamp()) * 1000
+
+
+def _anki_records(crt_date, now):
+    """
+    生成 (note, card)。Anki 的 id 是创建时间的毫秒时间戳，这里取 first_seen 当天零点 + 序号
+    （序号全局唯一，不同日期相差一整天的毫秒数，不会冲突），导入时可以从 id 还原 first_seen；
+    没有 first_seen 的单词用今天。常用词打上 common 标签。
+    """
+    today = datetime.date.fromtimestamp(now)
+    for index, row in enumerate(iter_deck()):
+        readable = _readable(row)
+        flds = "\x1f".join(html.escape(readable[f]) for f in ("word", "reading", "definitions", "part_of_speech"))
+        tags = " ".join([f"JLPT_{level}" for level in readable["jlpt"].split()] + (["common"] if row["is_common"] else []))
+        first_seen = datetime.date.fromisoformat(row["first_seen"]) if row["first_seen"] else today
+        note_id = card_id = _day_millis(first_seen) + index
+        csum = int(hashlib.sha1(row["word"].encode("utf-8")).hexdigest()[:8], 16)
+        guid = hashlib.sha1(("daily-japanese:" + row["word"]).encode("utf-8")).hexdigest()[:10]
+        note = (note_id, guid, ANKI_MODEL_ID, now, -1, f" {tags} " if tags else "", flds, row["word"], csum, 0, "")
+
+        if row["stage"] > 0 and row["next_review"]:
+            due = (datetime.date.fromisoformat(row["next_review"]) - crt_date).days
+            card = (card_id, note_id, ANKI_DECK_ID, 0, now, -1, 2, 2, due, interval_for_stage(row["stage"]),
+                    2500, row["stage"], 0, 0, 0, 0, 0, "")
+        else:
+            card = (card_id, note_id, ANKI_DECK_ID, 0, now, -1, 0, 0, index + 1, 0, 0, 0, 0, 0, 0, 0, 0, "")
+        yield note, card
+
+
+def export_anki(path):
+    now = int(time.time())
+    # 集合创建日固定为很早的日期，使所有复习卡片的 due 都为正数
+    crt_date = datetime.date(2000, 1, 1)
+    crt = int(datetime.datetime.combine(crt_date, datetime.time()).timestamp())
+    count = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        collection_path = os.path.join(tmp, "collection.anki2")
+        conn = sqlite3.connect(collection_path)
+        try:
+            conn.executescript(ANKI_SCHEMA)
+            col = list(_anki_col_row(now))
+            col[1] = crt
+            conn.execute("INSERT INTO col VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", col)
+            for chunk in _chunks(_anki_records(crt_date, now), CHUNK_SIZE):
+                with conn:
+                    conn.executemany("INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [n for n, _ in chunk])
+                    conn.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                     [c for _, c in chunk])
+                count += len(chunk)
+        finally:
+            conn.close()
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(collection_path, "collection.anki2")
+            zf.writestr("media", "{}")
+    return count
+
+
+def export_file(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".apkg":
+        return export_anki(path)
+    if ext in (".tsv", ".txt"):
+        return export_delimited(path, "\t")
+    if ext == ".csv":
+        return export_delimited(path, ",")
+    raise ValueError(f"不支持的文件类型: {ext}（支持 .apkg / .csv / .tsv / .txt）")
+
+
+# ---------- 命令行 ----------
+
+def print_counts(counts):
+    done = counts["added"] + counts["updated"] + counts["skipped"]
+    sys.stdout.write(f"\r  已处理 {done} 个单词 (新增 {counts['added']}, 更新 {counts['updated']}, 跳过 {counts['skipped']})")
+    sys.stdout.flush()
+
+
+def run_import(path, update=False, use_dictionary=True):
+    start = time.perf_counter()
+    counts = import_file(path, update, use_dictionary, progress=print_counts)
+    print(f"\n✓ 导入完成: 新增 {counts['added']} / 更新复习状态 {counts['updated']} / 跳过 {counts['skipped']}，"
+          f"耗时 {time.perf_counter() - start:.1f} 秒")
+    return counts
+
+
+def run_export(path):
+    start = time.perf_counter()
+    count = export_file(path)
+    print(f"✓ 已导出 {count} 个单词到 {path}，耗时 {time.perf_counter() - start:.1f} 秒")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="词库导入 / 导出（Anki .apkg、CSV、TSV）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="从文件导入单词")
+    p_import.add_argument("path")
+    p_import.add_argument("--update", action="store_true", help="已存在的单词用文件中的复习状态覆盖")
+    p_import.add_argument("--no-dict", action="store_true", help="不使用本地词典补全读音和释义")
+    p_export = sub.add_parser("export", help="导出整个词库")
+    p_export.add_argument("path")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "import":
+            if not os.path.exists(args.path):
+                print(f"❌ 未找到文件: {args.path}")
+                return
+            run_import(args.path, args.update, not args.no_dict)
+        else:
+            run_export(args.path)
+    except ValueError as e:
+        print(f"❌ {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()